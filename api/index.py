@@ -1,18 +1,26 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
 import os
 import sys
 
 # Add backend to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
+from app.metrics import TimingMiddleware
+
 app = FastAPI()
+app.add_middleware(TimingMiddleware)  # X-Response-Time-Ms / Server-Timing headers
 
+# No defer_ai / insight polling here: the deferred AI section runs as a task in
+# the serving process, which a serverless invocation does not outlive, and polls
+# land on other instances. /api/analyze/stream sends the report before the AI
+# section within one response instead.
 @app.get("/api/analyze")
-def analyze_channel(url: str, days: int = 30):
+async def analyze_channel(url: str, days: int = 30):
     try:
-        from app.public_analysis import get_channel_report
-        return get_channel_report(url, days)
+        from app.public_analysis import get_channel_report_async
+        return await get_channel_report_async(url, days)
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -24,12 +32,56 @@ def analyze_channel(url: str, days: int = 30):
             }
         )
 
+@app.get("/api/analyze/stream")
+async def analyze_stream(url: str, days: int = 30):
+    from app.public_analysis import stream_channel_report
+    return StreamingResponse(stream_channel_report(url, days), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Same body as app.jobqueue.AnalyzeJobRequest, declared here so a cold start
+# does not import the job queue (and SQLAlchemy) for every endpoint.
+class AnalyzeJobRequest(BaseModel):
+    url: str
+    days: int = 30
+
+# Jobs are only queued here: threads cannot outlive a serverless invocation, so
+# they are run by `python -m app.jobqueue` workers sharing DATABASE_URL.
+@app.post("/api/jobs/analyze", status_code=202)
+async def enqueue_analysis(req: AnalyzeJobRequest):
+    import asyncio
+    from app import jobqueue
+    from sqlalchemy.exc import SQLAlchemyError
+    try:
+        job = await asyncio.to_thread(jobqueue.enqueue, req.url, req.days)
+    except SQLAlchemyError as e:
+        return JSONResponse(status_code=503, content={
+            "error": "Job queue unavailable",
+            "message": "Set DATABASE_URL to a shared database and run `python -m app.jobqueue` workers.",
+            "detail": str(e).splitlines()[0],
+        })
+    return {"job_id": job["job_id"], "status": job["status"], "coalesced": job["coalesced"]}
+
+@app.get("/api/jobs/{job_id}")
+async def get_analysis_job(job_id: str, wait: float = 0.0):
+    from app import jobqueue
+    job = await jobqueue.wait_for(job_id, min(max(wait, 0.0), 30.0))
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown job id"})
+    return job
+
 @app.get("/health")
 def health_check():
+    from app import etag, quota, singleflight
+    from app.public_analysis import insight_cache, report_cache
     return {
         "status": "healthy",
         "openai_configured": bool(os.getenv("OPENAI_API_KEY")),
-        "youtube_configured": bool(os.getenv("YOUTUBE_API_KEY"))
+        "youtube_configured": bool(os.getenv("YOUTUBE_API_KEY")),
+        "report_cache": report_cache.stats(),
+        "insight_cache": insight_cache.stats(),
+        "youtube_quota": quota.stats(),
+        "youtube_etag_cache": etag.stats(),
+        "singleflight": singleflight.stats(),
     }
 
 @app.get("/test")
@@ -1,13 +1,12 @@
-import os, json, datetime as _dt
-from google_auth_oauthlib.flow import Flow
+import os, json, threading, datetime as _dt
+from concurrent.futures import ThreadPoolExecutor
 from google.oauth2.credentials import Credentials
 from fastapi import Depends, HTTPException
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
-from .db import SessionLocal
+from .db import ReadSessionLocal, SessionLocal
 from .models import ChannelCredentials
-from dotenv import load_dotenv
-
-load_dotenv(".env")
+from .config import REDIRECT_URI
 
 SCOPES = [
     "https://www.googleapis.com/auth/youtube.readonly",
@@ -17,9 +16,13 @@ SCOPES = [
 ]
 
 CLIENT_SECRETS_FILE = "client_secret.json"
-REDIRECT_URI        = os.getenv("REDIRECT_URI", "http://localhost:8000/oauth2callback")
+
+TOKEN_REFRESH_MARGIN      = int(os.getenv("TOKEN_REFRESH_MARGIN_SECONDS", "600"))  # renew this long before expiry
+TOKEN_REFRESH_BATCH       = int(os.getenv("TOKEN_REFRESH_BATCH", "50"))
+TOKEN_REFRESH_CONCURRENCY = int(os.getenv("TOKEN_REFRESH_CONCURRENCY", "8"))
 
 def get_flow():
+    from google_auth_oauthlib.flow import Flow
     return Flow.from_client_secrets_file(
         CLIENT_SECRETS_FILE,
         scopes=SCOPES,
@@ -34,6 +37,14 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    """Read-only session for dashboard queries (separate pool, writes are rejected)."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 def save_credentials(channel_id: str, creds: Credentials, db: Session):
     row = (
         db.query(ChannelCredentials)
@@ -47,9 +58,43 @@ def save_credentials(channel_id: str, creds: Credentials, db: Session):
     row.client_secret = creds.client_secret
     row.scopes        = " ".join(creds.scopes)
     row.expiry        = creds.expiry
+    row.access_token  = creds.token
 
     db.add(row)
     db.commit()
+    _forget(channel_id)
+
+# ---------- live credentials ----------
+# One Credentials object per channel and process, so a token refreshed by the
+# background refresher (or by another worker, via the DB row) is picked up by
+# every cached API client holding that object.
+_live: dict = {}
+_live_lock = threading.Lock()
+_token_request = None
+
+def _forget(channel_id: str):
+    with _live_lock:
+        _live.pop(channel_id, None)
+
+def _from_row(row: ChannelCredentials) -> Credentials:
+    return Credentials(
+        row.access_token,
+        refresh_token=row.refresh_token,
+        token_uri=row.token_uri,
+        client_id=row.client_id,
+        client_secret=row.client_secret,
+        scopes=row.scopes.split(),
+        expiry=row.expiry,
+    )
+
+def _credentials_for(row: ChannelCredentials) -> Credentials:
+    with _live_lock:
+        creds = _live.get(row.channel_id)
+        if creds is None or creds.refresh_token != row.refresh_token:
+            creds = _live[row.channel_id] = _from_row(row)
+        elif row.access_token and row.expiry and (creds.expiry is None or row.expiry > creds.expiry):
+            creds.token, creds.expiry = row.access_token, row.expiry  # refreshed elsewhere
+        return creds
 
 def load_credentials(channel_id: str, db: Session) -> Credentials | None:
     row = (
@@ -58,12 +103,79 @@ def load_credentials(channel_id: str, db: Session) -> Credentials | None:
         .first()
     )
     if not row:
+        _forget(channel_id)
         return None
-    return Credentials(
-        None,
-        refresh_token=row.refresh_token,
-        token_uri=row.token_uri,
-        client_id=row.client_id,
-        client_secret=row.client_secret,
-        scopes=row.scopes.split(),
-    ) 
\ No newline at end of file
+    return _credentials_for(row)
+
+def _refresh(creds: Credentials):
+    """One round trip to the token endpoint over a shared keep-alive session."""
+    global _token_request
+    if _token_request is None:
+        import requests
+        from google.auth.transport.requests import Request
+        _token_request = Request(session=requests.Session())
+    creds.refresh(_token_request)
+
+def persist_token(channel_id: str, creds: Credentials, db: Session):
+    """Writes the current access token and expiry back to the row (does not commit)."""
+    db.query(ChannelCredentials).filter(ChannelCredentials.channel_id == channel_id).update(
+        {ChannelCredentials.access_token: creds.token, ChannelCredentials.expiry: creds.expiry},
+        synchronize_session=False,
+    )
+
+def ensure_fresh(channel_id: str, creds: Credentials, db: Session) -> bool:
+    """
+    Refreshes inline only if the background refresher has not kept the token
+    valid. Returns True if a token request was made (the caller commits).
+    """
+    if creds.valid or not creds.refresh_token:
+        return False
+    _refresh(creds)
+    persist_token(channel_id, creds, db)
+    return True
+
+def refresh_expiring(margin_seconds: int = TOKEN_REFRESH_MARGIN, batch_size: int = TOKEN_REFRESH_BATCH,
+                     session_factory=SessionLocal) -> dict:
+    """
+    Renews every stored token that is missing or expires within margin_seconds,
+    batch_size rows at a time with token requests issued in parallel.
+    """
+    summary = {"refreshed": 0, "failed": 0, "failures": []}
+    attempted: set = set()
+    while True:
+        db = session_factory()
+        try:
+            deadline = _dt.datetime.utcnow() + _dt.timedelta(seconds=margin_seconds)
+            query = db.query(ChannelCredentials).filter(or_(
+                ChannelCredentials.access_token.is_(None),
+                ChannelCredentials.expiry.is_(None),
+                ChannelCredentials.expiry <= deadline,
+            ))
+            if attempted:
+                query = query.filter(ChannelCredentials.channel_id.notin_(attempted))
+            rows = query.order_by(ChannelCredentials.expiry).limit(batch_size).all()
+            if not rows:
+                return summary
+
+            batch = [(row.channel_id, _credentials_for(row)) for row in rows]
+            attempted.update(cid for cid, _ in batch)
+
+            def refresh(item):
+                cid, creds = item
+                try:
+                    _refresh(creds)
+                    return cid, creds, None
+                except Exception as e:
+                    return cid, creds, f"{type(e).__name__}: {e}"
+
+            with ThreadPoolExecutor(max_workers=max(1, TOKEN_REFRESH_CONCURRENCY)) as pool:
+                for cid, creds, error in pool.map(refresh, batch):
+                    if error:
+                        summary["failed"] += 1
+                        summary["failures"].append({"channel_id": cid, "error": error})
+                    else:
+                        persist_token(cid, creds, db)
+                        summary["refreshed"] += 1
+            db.commit()
+        finally:
+            db.close()
@@ -0,0 +1,147 @@
+"""
+Batch screening of many channels in one pass.
+
+Run with:  cd backend && python -m app.batch urls.txt [--days 30] > results.ndjson
+(or pass URLs as arguments / on stdin with "-"). Prints one JSON object per line.
+
+Inputs are resolved and de-duplicated by channel id, channels.list and
+videos.list requests are packed up to the API's 50-id limit across channels,
+and each channel is yielded as soon as all of its recent uploads are priced.
+No AI insight is generated here; use /api/analyze for a full report.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, Iterable, Iterator, List
+from . import quota, youtube_public
+from .youtube_public import (
+    MAX_BATCH, batched, resolve_channel_id, upload_pages, recent_upload_ids,
+    _window_start, _metrics,
+)
+from .public_analysis import _analyze, _channel_features
+
+def _result(cid: str, queries: List[str], channel: Dict, recent: int, days: int) -> Dict:
+    try:
+        metrics = _metrics(channel["statistics"], recent, days)
+        est_rev, financial_report = _analyze(metrics, days, _channel_features(cid))
+        return {
+            "channel_id": cid,
+            "queries": queries,
+            "metrics": metrics,
+            "estimated_revenue_usd": est_rev,
+            "financial_analysis": financial_report,
+        }
+    except Exception as e:
+        return {"channel_id": cid, "queries": queries, "error": str(e)}
+
+def analyze_batch(queries: Iterable[str], days: int = 30) -> Iterator[Dict]:
+    """Yields one result (or error) per distinct channel as each completes."""
+    yt = youtube_public.get_youtube()
+    if not yt:
+        raise EnvironmentError("YouTube API key not configured. Please add YOUTUBE_API_KEY to your environment variables.")
+
+    # 1) resolve + dedupe
+    owners: Dict[str, List[str]] = {}
+    for q in queries:
+        q = q.strip()
+        if not q:
+            continue
+        try:
+            owners.setdefault(resolve_channel_id(q), []).append(q)
+        except Exception as e:
+            yield {"queries": [q], "error": str(e)}
+
+    # 2) channels.list, 50 ids per call
+    channels: Dict[str, Dict] = {}
+    for ids in batched(owners):
+        resp = quota.execute(yt.channels().list(id=",".join(ids), part="statistics,contentDetails"),
+                             "channels.list")
+        channels.update({item["id"]: item for item in resp.get("items", [])})
+    for cid in owners:
+        if cid not in channels:
+            yield {"channel_id": cid, "queries": owners[cid], "error": "Channel not found."}
+
+    # 3) walk each channel's uploads, pricing ids 50 at a time across channels
+    cutoff      = _window_start(days)
+    recent      = {cid: 0 for cid in channels}
+    outstanding = {cid: 0 for cid in channels}
+    walked: List[str] = []
+    pending: List[tuple] = []  # (video id, channel id)
+
+    def price(pairs):
+        resp  = quota.execute(yt.videos().list(id=",".join(v for v, _ in pairs), part="statistics"),
+                              "videos.list")
+        views = {it["id"]: int(it["statistics"].get("viewCount", 0)) for it in resp.get("items", [])}
+        for vid, cid in pairs:
+            recent[cid]      += views.get(vid, 0)
+            outstanding[cid] -= 1
+
+    def failed(pairs, e):
+        """Error lines for every channel with ids in a batch that could not be priced."""
+        for cid in dict.fromkeys(c for _, c in pairs):
+            dropped.add(cid)
+            outstanding[cid] = 0
+            if cid in walked:
+                walked.remove(cid)
+            yield {"channel_id": cid, "queries": owners[cid], "error": str(e)}
+
+    def price_pending():
+        nonlocal pending
+        batch, pending = pending, []
+        try:
+            price(batch)
+        except Exception as e:
+            yield from failed(batch, e)
+            # other ids of the failed channels are no longer needed
+            pending = [p for p in pending if p[1] not in dropped]
+
+    def finished():
+        while walked and outstanding[walked[0]] == 0:
+            cid = walked.pop(0)
+            yield _result(cid, owners[cid], channels[cid], recent[cid], days)
+
+    dropped = set()
+    for cid, channel in channels.items():
+        try:
+            pl = channel["contentDetails"]["relatedPlaylists"]["uploads"]
+            for vid in recent_upload_ids(upload_pages(pl), cutoff):
+                pending.append((vid, cid))
+                outstanding[cid] += 1
+                if len(pending) == MAX_BATCH:
+                    yield from price_pending()
+                    if cid in dropped:
+                        break
+                    yield from finished()
+        except Exception as e:
+            # drop the channel's unpriced ids so it doesn't hold up the others
+            pending = [p for p in pending if p[1] != cid]
+            outstanding[cid] = 0
+            yield {"channel_id": cid, "queries": owners[cid], "error": str(e)}
+            continue
+        if cid in dropped:
+            continue
+        walked.append(cid)
+        yield from finished()
+    if pending:
+        yield from price_pending()
+    yield from finished()
+
+def _read_queries(inputs: List[str]) -> Iterator[str]:
+    """Each input is "-" (stdin), a file with one query per line, or a query itself."""
+    for item in inputs:
+        if item == "-":
+            yield from sys.stdin
+        elif os.path.isfile(item):
+            with open(item) as f:
+                yield from f
+        else:
+            yield item
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Screen many YouTube channels, NDJSON out")
+    parser.add_argument("inputs", nargs="+", help="channel URLs/handles, files of them, or - for stdin")
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+    for result in analyze_batch(_read_queries(args.inputs), args.days):
+        print(json.dumps(result), flush=True)
@@ -0,0 +1,183 @@
+"""
+Small TTL caches with hit/miss counters.
+
+MemoryCache keeps entries in-process (size-bounded LRU). SQLCache stores them
+in the app database so every uvicorn worker shares the same hits. Use
+make_cache() to pick a backend from configuration.
+"""
+import datetime as _dt
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from sqlalchemy.exc import IntegrityError
+from .bulk import upsert_rows
+from .db import SessionLocal, engine
+from .models import CacheEntry
+
+_MISSING = object()
+
+class MemoryCache:
+    backend = "memory"
+
+    def __init__(self, name: str, maxsize: int = 512, ttl: float = 900):
+        self.name    = name
+        self.maxsize = maxsize
+        self.ttl     = ttl
+        self.hits    = 0
+        self.misses  = 0
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock   = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING and item[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+class SQLCache(MemoryCache):
+    """
+    Shared cache in the cache_entries table. Values must be JSON-serialisable.
+
+    LRU order is approximate: a hit only rewrites accessed_at once it is more
+    than touch_interval seconds old, so most reads stay read-only. Expired and
+    overflowing rows are evicted every evict_every writes, so the table can
+    briefly hold up to evict_every entries beyond maxsize.
+    """
+    backend = "sql"
+
+    def __init__(self, name: str, maxsize: int = 512, ttl: float = 900, session_factory=SessionLocal,
+                 touch_interval: Optional[float] = None, evict_every: Optional[int] = None):
+        super().__init__(name, maxsize, ttl)
+        self._session = session_factory
+        self.touch_interval = min(60.0, ttl / 10) if touch_interval is None else touch_interval
+        self.evict_every    = max(1, min(100, maxsize // 20)) if evict_every is None else evict_every
+        self._writes = 0
+        CacheEntry.__table__.create(bind=session_factory.kw.get("bind") or engine, checkfirst=True)
+
+    def _key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = _dt.datetime.utcnow()
+        db = self._session()
+        try:
+            row = db.get(CacheEntry, self._key(key))
+            if row and row.expires_at > now:
+                if (now - row.accessed_at).total_seconds() >= self.touch_interval:
+                    row.accessed_at = now
+                    db.commit()
+                with self._lock:
+                    self.hits += 1
+                return json.loads(row.value)
+            if row:
+                db.delete(row)
+                db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        now = _dt.datetime.utcnow()
+        expires = now + _dt.timedelta(seconds=self.ttl if ttl is None else ttl)
+        entry = {"key": self._key(key), "value": json.dumps(value), "expires_at": expires, "accessed_at": now}
+        db = self._session()
+        try:
+            try:
+                # INSERT ... ON CONFLICT, so concurrent writers of one key don't collide
+                upsert_rows(db, CacheEntry, [entry], keys=("key",), columns=("value", "expires_at", "accessed_at"))
+                db.flush()
+            except IntegrityError:
+                # dialects without ON CONFLICT: another worker inserted it first, last write wins
+                db.rollback()
+                db.query(CacheEntry).filter(CacheEntry.key == entry["key"]).update(
+                    {k: v for k, v in entry.items() if k != "key"}, synchronize_session=False)
+            with self._lock:
+                self._writes += 1
+                evict = self._writes % self.evict_every == 0
+            if evict:
+                self._evict(db, now)
+            db.commit()
+        finally:
+            db.close()
+
+    def _evict(self, db, now: _dt.datetime):
+        mine = db.query(CacheEntry).filter(CacheEntry.key.like(f"{self.name}:%"))
+        mine.filter(CacheEntry.expires_at <= now).delete(synchronize_session=False)
+        overflow = mine.count() - self.maxsize
+        if overflow > 0:
+            stale = [k for (k,) in mine.with_entities(CacheEntry.key)
+                                       .order_by(CacheEntry.accessed_at).limit(overflow)]
+            db.query(CacheEntry).filter(CacheEntry.key.in_(stale)).delete(synchronize_session=False)
+
+    def delete(self, key: str):
+        db = self._session()
+        try:
+            db.query(CacheEntry).filter(CacheEntry.key == self._key(key)).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    def clear(self):
+        db = self._session()
+        try:
+            db.query(CacheEntry).filter(CacheEntry.key.like(f"{self.name}:%")).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def __len__(self) -> int:
+        db = self._session()
+        try:
+            return db.query(CacheEntry).filter(CacheEntry.key.like(f"{self.name}:%")).count()
+        finally:
+            db.close()
+
+_BACKENDS = {"memory": MemoryCache, "sql": SQLCache}
+
+def make_cache(name: str, backend: str = "memory", maxsize: int = 512, ttl: float = 900):
+    try:
+        cls = _BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown cache backend {backend!r}; expected one of {sorted(_BACKENDS)}")
+    return cls(name, maxsize=maxsize, ttl=ttl)
@@ -0,0 +1,88 @@
+"""
+Factory for googleapiclient service objects.
+
+build() parses a discovery document (hundreds of KB for youtube v3) and opens
+a fresh HTTP transport on every call. get_service() instead
+  * parses each bundled static discovery document once per process (no
+    network at build time),
+  * caches the constructed service per cache_key (a channel id, "public", ...)
+    so its keep-alive httplib2 connection and refreshed access token are reused,
+  * rebuilds the entry when the credential behind a key changes (re-connected
+    channel with a new refresh token).
+
+Services are not thread-safe: use one cache_key per concurrent caller (the
+ingest job uses the channel id, and each channel runs on one thread).
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+CLIENT_CACHE_SIZE = int(os.getenv("GOOGLE_CLIENT_CACHE_SIZE", "256"))
+HTTP_TIMEOUT      = float(os.getenv("GOOGLE_HTTP_TIMEOUT", "30"))
+API_ROOT_URL      = os.getenv("GOOGLE_API_ROOT_URL")  # e.g. the offline benchmark's fake server
+
+_services: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (service, refresh_token)
+_lock = threading.Lock()
+counters = {"built": 0, "reused": 0}
+
+@lru_cache(maxsize=None)
+def discovery_doc(name: str, version: str) -> Dict:
+    """Parsed discovery document from the copy bundled with google-api-python-client."""
+    from googleapiclient.discovery_cache import get_static_doc
+
+    doc = get_static_doc(name, version)
+    if doc is None:
+        raise ValueError(f"No bundled discovery document for {name} {version}")
+    return json.loads(doc)
+
+def _http(credentials=None, wrap: Optional[Callable] = None):
+    import httplib2
+
+    http = httplib2.Http(timeout=HTTP_TIMEOUT)
+    if credentials is not None:
+        from google_auth_httplib2 import AuthorizedHttp
+        http = AuthorizedHttp(credentials, http=http)
+    return wrap(http) if wrap else http
+
+def build_service(name: str, version: str, credentials=None, developer_key: Optional[str] = None,
+                  wrap: Optional[Callable] = None):
+    """Uncached build from the static document; wrap() can decorate the transport."""
+    from googleapiclient.discovery import build_from_document
+
+    counters["built"] += 1
+    options = {"api_endpoint": API_ROOT_URL} if API_ROOT_URL else None
+    return build_from_document(discovery_doc(name, version), http=_http(credentials, wrap),
+                               developerKey=developer_key, client_options=options)
+
+def get_service(name: str, version: str, credentials=None, developer_key: Optional[str] = None,
+                cache_key: Optional[str] = None, wrap: Optional[Callable] = None):
+    """Cached service for (name, version, cache_key); without a cache_key this is build_service()."""
+    if cache_key is None:
+        return build_service(name, version, credentials, developer_key, wrap)
+
+    key   = (name, version, cache_key)
+    token = getattr(credentials, "refresh_token", None)
+    with _lock:
+        entry = _services.get(key)
+        if entry and entry[1] == token:
+            _services.move_to_end(key)
+            counters["reused"] += 1
+            return entry[0]
+
+    service = build_service(name, version, credentials, developer_key, wrap)
+    with _lock:
+        _services[key] = (service, token)
+        _services.move_to_end(key)
+        while len(_services) > CLIENT_CACHE_SIZE:
+            _services.popitem(last=False)
+    return service
+
+def clear():
+    with _lock:
+        _services.clear()
+
+def stats() -> Dict:
+    return {"cached": len(_services), "maxsize": CLIENT_CACHE_SIZE, **counters}
@@ -0,0 +1,15 @@
+"""
+Process-wide settings. .env is loaded exactly once, here; other modules import
+their keys from this module (or read os.getenv after importing it) instead of
+calling load_dotenv themselves.
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv(".env")  # pulls DATABASE_URL, API keys etc.
+
+DATABASE_URL      = os.getenv("DATABASE_URL", "sqlite:///./data.db")
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")  # optional replica for dashboard reads
+YOUTUBE_API_KEY   = os.getenv("YOUTUBE_API_KEY")
+OPENAI_API_KEY    = os.getenv("OPENAI_API_KEY")
+REDIRECT_URI      = os.getenv("REDIRECT_URI", "http://localhost:8000/oauth2callback")
@@ -1,12 +1,109 @@
+"""
+Engines and sessions.
+
+make_engine() tunes the engine for its dialect:
+  * Postgres: a QueuePool sized by DB_POOL_SIZE/DB_MAX_OVERFLOW, pre-ping so
+    connections dropped by the server or a proxy are replaced instead of
+    failing a request, and recycling older than DB_POOL_RECYCLE seconds.
+  * SQLite: WAL journal (readers no longer block the ingest job's writes and
+    vice versa), synchronous=NORMAL (safe under WAL, fsyncs only at
+    checkpoints) and a busy timeout so a second writer waits instead of
+    failing with "database is locked".
+
+SessionLocal is for code that writes. ReadSessionLocal is for dashboard
+queries: it uses its own pool (DATABASE_READ_URL if set, e.g. a replica) and
+its connections are read-only, so a slow dashboard can't take the writers'
+connections and a stray write fails loudly.
+"""
 import os
-from sqlalchemy import create_engine
+from typing import Dict
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
+from .config import DATABASE_URL, DATABASE_READ_URL
+
+DB_POOL_SIZE      = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW   = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT   = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE   = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # below typical proxy idle timeouts
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000"))  # long enough to queue behind an ingest commit
+
+def is_memory_sqlite(url) -> bool:
+    url = make_url(url)
+    return (url.get_backend_name() == "sqlite"
+            and (url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"))
+
+def _sqlite_pragmas(read_only: bool):
+    def on_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")  # persistent in the file; in-memory DBs keep "memory"
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        if read_only:
+            cur.execute("PRAGMA query_only=ON")
+        cur.close()
+    return on_connect
+
+def _postgres_read_only(dbapi_conn, _record):
+    cur = dbapi_conn.cursor()
+    cur.execute("SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY")
+    cur.close()
 
-load_dotenv(".env")  # pulls DATABASE_URL etc.
+def make_engine(url: str = DATABASE_URL, read_only: bool = False, **overrides):
+    """An engine with pool and connection settings for the URL's dialect."""
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        kw = {"connect_args": {"check_same_thread": False}}  # busy timeout is set by the PRAGMA below
+    else:
+        kw = {
+            "pool_size":     DB_POOL_SIZE,
+            "max_overflow":  DB_MAX_OVERFLOW,
+            "pool_timeout":  DB_POOL_TIMEOUT,
+            "pool_recycle":  DB_POOL_RECYCLE,
+            "pool_pre_ping": True,
+            "pool_use_lifo": True,  # idle extras age out instead of being kept warm round-robin
+        }
+    kw.update(overrides)
+    eng = create_engine(url, **kw)
+    if backend == "sqlite":
+        event.listen(eng, "connect", _sqlite_pragmas(read_only))
+    elif read_only and backend == "postgresql":
+        event.listen(eng, "connect", _postgres_read_only)
+    return eng
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data.db")
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = make_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base() 
\ No newline at end of file
+
+# An in-memory SQLite database exists only inside its own engine, so reads share it.
+read_engine = (engine if not DATABASE_READ_URL and is_memory_sqlite(DATABASE_URL)
+               else make_engine(DATABASE_READ_URL or DATABASE_URL, read_only=True))
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+Base = declarative_base()
+
+def stats() -> Dict:
+    out = {"dialect": engine.dialect.name, "pool": engine.pool.status()}
+    if read_engine is not engine:
+        out["read_pool"] = read_engine.pool.status()
+    return out
+
+def add_missing_columns(bind=engine, metadata=None):
+    """
+    create_all() never alters existing tables, so columns added to a model later
+    are appended here (nullable, no default) on tables that already exist.
+    """
+    from sqlalchemy import inspect, text
+
+    metadata = metadata or Base.metadata
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in present:
+                    ddl = column.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl}'))
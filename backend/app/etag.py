@@ -0,0 +1,131 @@
+"""
+ETag revalidation for YouTube Data API GETs.
+
+channels/playlistItems/videos responses carry an ETag. The first response for
+a request is stored with its ETag; later identical requests send
+If-None-Match, and a 304 is answered from the stored body, so unchanged
+channels cost a few hundred bytes instead of a full payload.
+
+ETagHttp wraps the httplib2 transport used by googleapiclient; conditional_get()
+does the same for the shared httpx client. Both use one store keyed by resource
+and query parameters, minus the API key, so the sync and async paths share
+entries. ETAG_CACHE_BACKEND is "memory" by default; "sql" lets every worker
+revalidate against the same bodies, at the cost of a database read and write
+per call (run in a thread on the async path).
+"""
+import asyncio
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from sqlalchemy.exc import SQLAlchemyError
+from .cache import MemoryCache, make_cache
+
+ETAG_CACHE_BACKEND = os.getenv("ETAG_CACHE_BACKEND", "memory")
+ETAG_CACHE_SIZE    = int(os.getenv("ETAG_CACHE_SIZE", "20000"))
+ETAG_CACHE_TTL     = float(os.getenv("ETAG_CACHE_TTL", str(7 * 86400)))
+
+_IGNORED_PARAMS = {"key", "alt", "prettyPrint"}
+
+_store = None
+_store_lock = threading.Lock()
+counters = {"revalidated": 0, "stored": 0, "bytes_saved": 0}
+
+def _cache():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = make_cache("etag", ETAG_CACHE_BACKEND, ETAG_CACHE_SIZE, ETAG_CACHE_TTL)
+                except SQLAlchemyError:
+                    _store = MemoryCache("etag", ETAG_CACHE_SIZE, ETAG_CACHE_TTL)
+    return _store
+
+def cache_key(url: str, params: Optional[Dict] = None) -> str:
+    """Resource name + sorted query parameters, without credentials."""
+    parts = urlsplit(url)
+    query = [(k, str(v)) for k, v in parse_qsl(parts.query) + list((params or {}).items())
+             if k not in _IGNORED_PARAMS and v is not None]
+    canonical = parts.path.rstrip("/").rsplit("/", 1)[-1] + "?" + urlencode(sorted(query))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def lookup(key: str) -> Optional[Dict]:
+    try:
+        return _cache().get(key)
+    except SQLAlchemyError:
+        return None
+
+def remember(key: str, etag: Optional[str], body: str):
+    if not etag:
+        return
+    try:
+        _cache().set(key, {"etag": etag, "body": body})
+        counters["stored"] += 1
+    except SQLAlchemyError:
+        pass  # revalidation is an optimisation; never fail the call over it
+
+async def _in_thread(fn, *args):
+    """Runs a store call off the event loop unless the store is in-process."""
+    if _cache().backend == "memory":
+        return fn(*args)
+    return await asyncio.to_thread(fn, *args)
+
+def _served(entry: Dict):
+    counters["revalidated"] += 1
+    counters["bytes_saved"] += len(entry["body"])
+
+class ETagHttp:
+    """httplib2.Http stand-in that revalidates GETs with If-None-Match."""
+
+    def __init__(self, http=None):
+        if http is None:
+            import httplib2
+            http = httplib2.Http()
+        self.http = http
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs) -> Tuple:
+        if method != "GET":
+            return self.http.request(uri, method, body, headers, *args, **kwargs)
+        import httplib2
+
+        key   = cache_key(uri)
+        entry = lookup(key)
+        headers = dict(headers or {})
+        if entry:
+            headers["if-none-match"] = entry["etag"]
+        resp, content = self.http.request(uri, method, body, headers, *args, **kwargs)
+
+        if resp.status == 304 and entry:
+            _served(entry)
+            cached = httplib2.Response({"status": "200", "etag": entry["etag"],
+                                        "content-type": "application/json; charset=UTF-8"})
+            return cached, entry["body"].encode()
+        if resp.status == 200:
+            remember(key, resp.get("etag"), content.decode() if isinstance(content, bytes) else content)
+        return resp, content
+
+async def conditional_get(client, url: str, params: Dict):
+    """httpx GET that sends If-None-Match and turns a 304 into the cached 200."""
+    import httpx
+
+    key   = cache_key(url, params)
+    entry = await _in_thread(lookup, key)
+    headers = {"If-None-Match": entry["etag"]} if entry else None
+    resp = await client.get(url, params=params, headers=headers)
+
+    if resp.status_code == 304 and entry:
+        _served(entry)
+        return httpx.Response(200, content=entry["body"].encode(), request=resp.request,
+                              headers={"etag": entry["etag"], "content-type": "application/json"})
+    if resp.status_code == 200:
+        await _in_thread(remember, key, resp.headers.get("etag"), resp.text)
+    return resp
+
+def stats() -> Dict:
+    store = _store.stats() if _store is not None else {"backend": ETAG_CACHE_BACKEND}
+    return {**store, **counters}
@@ -0,0 +1,149 @@
+"""
+Time-series features for connected channels, materialized in channel_features.
+
+update_features() runs after each ingest write. Rolling windows (7/30/90-day
+views, least-squares slopes, 30-day volatility) only need the last 90 days, so
+they come from one bounded indexed range read. Seasonality, calendar-month
+totals and lifetime sums are accumulators: each run folds in just the days that
+became settled (older than the late-data re-fetch window) since the last run.
+Scoring then reads a single row via get_features().
+"""
+import datetime as _dt
+import json
+from typing import Dict, List, Optional
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from .models import ChannelDailyStats, ChannelFeatures
+
+WINDOWS     = (7, 30, 90)
+MONTHS_KEPT = 36
+
+def _daily_series(db: Session, channel_id: str, start: _dt.date, end: _dt.date) -> List[tuple]:
+    return (
+        db.query(ChannelDailyStats.date, ChannelDailyStats.views)
+          .filter(ChannelDailyStats.channel_id == channel_id,
+                  ChannelDailyStats.date >= start,
+                  ChannelDailyStats.date <= end)
+          .order_by(ChannelDailyStats.date)
+          .all()
+    )
+
+def _dense(rows: List[tuple], start: _dt.date, days: int) -> np.ndarray:
+    """Calendar-aligned daily views; days without a row count as zero."""
+    out = np.zeros(days)
+    for date, views in rows:
+        out[(date - start).days] = views or 0
+    return out
+
+def _slope(y: np.ndarray) -> float:
+    if len(y) < 2:
+        return 0.0
+    return float(np.polyfit(np.arange(len(y)), y, 1)[0])
+
+def _fold_settled(db: Session, row: ChannelFeatures, until: _dt.date):
+    """Adds days in (settled_through, until] to the seasonal/monthly/lifetime accumulators."""
+    start = row.settled_through + _dt.timedelta(days=1) if row.settled_through else _dt.date.min
+    weekday_views = json.loads(row.weekday_views or "[0, 0, 0, 0, 0, 0, 0]")
+    weekday_days  = json.loads(row.weekday_days or "[0, 0, 0, 0, 0, 0, 0]")
+    monthly       = json.loads(row.monthly_views or "{}")
+
+    for date, views in _daily_series(db, row.channel_id, start, until):
+        views = views or 0
+        row.first_date = row.first_date or date
+        row.lifetime_views = (row.lifetime_views or 0) + views
+        row.lifetime_days  = (row.lifetime_days or 0) + 1
+        weekday_views[date.weekday()] += views
+        weekday_days[date.weekday()]  += 1
+        month = date.strftime("%Y-%m")
+        monthly[month] = monthly.get(month, 0) + views
+
+    row.weekday_views   = json.dumps(weekday_views)
+    row.weekday_days    = json.dumps(weekday_days)
+    row.monthly_views   = json.dumps(dict(sorted(monthly.items())[-MONTHS_KEPT:]))
+    row.settled_through = until
+
+def update_features(db: Session, channel_id: str, settle_lag_days: int = 3,
+                    rebuild: bool = False) -> Optional[ChannelFeatures]:
+    """
+    Refreshes a channel's feature row after new days were written (does not commit).
+    rebuild=True resets the accumulators, e.g. after a full backfill rewrote history.
+    """
+    latest = (
+        db.query(func.max(ChannelDailyStats.date))
+          .filter(ChannelDailyStats.channel_id == channel_id)
+          .scalar()
+    )
+    if latest is None:
+        return None
+
+    row = db.query(ChannelFeatures).filter_by(channel_id=channel_id).first()
+    if row is None or rebuild:
+        if row is not None:
+            db.delete(row)
+            db.flush()
+        row = ChannelFeatures(channel_id=channel_id)
+
+    # rolling windows from the last 90 days only
+    span  = max(WINDOWS)
+    start = latest - _dt.timedelta(days=span - 1)
+    daily = _dense(_daily_series(db, channel_id, start, latest), start, span)
+    row.as_of          = latest
+    row.views_7d       = int(daily[-7:].sum())
+    row.views_30d      = int(daily[-30:].sum())
+    row.views_90d      = int(daily.sum())
+    row.slope_30d      = _slope(daily[-30:])
+    row.slope_90d      = _slope(daily)
+    mean_30d           = daily[-30:].mean()
+    row.volatility_30d = float(daily[-30:].std() / mean_30d) if mean_30d else 0.0
+
+    # accumulators: only days that can no longer be revised by the re-fetch window
+    settled = latest - _dt.timedelta(days=settle_lag_days)
+    if row.settled_through is None or row.settled_through < settled:
+        _fold_settled(db, row, settled)
+
+    row.updated_at = _dt.datetime.utcnow()
+    db.add(row)
+    return row
+
+def complete_months(row: ChannelFeatures) -> List[float]:
+    """Totals of settled calendar months, oldest first, skipping partial first/last months."""
+    monthly = json.loads(row.monthly_views or "{}")
+    if not monthly or not row.settled_through:
+        return []
+    last_day = row.settled_through
+    current  = last_day.strftime("%Y-%m")
+    if (last_day + _dt.timedelta(days=1)).month != last_day.month:
+        current = None  # settled through month end, so that month is complete
+    months = [m for m in sorted(monthly) if m != current]
+    if row.first_date and row.first_date.day != 1 and months and months[0] == row.first_date.strftime("%Y-%m"):
+        months = months[1:]
+    return [float(monthly[m]) for m in months]
+
+def to_dict(row: ChannelFeatures) -> Dict:
+    weekday_views = json.loads(row.weekday_views or "[0, 0, 0, 0, 0, 0, 0]")
+    weekday_days  = json.loads(row.weekday_days or "[0, 0, 0, 0, 0, 0, 0]")
+    overall = (row.lifetime_views or 0) / row.lifetime_days if row.lifetime_days else 0.0
+    seasonality = [
+        (v / d) / overall if d and overall else 1.0
+        for v, d in zip(weekday_views, weekday_days)
+    ]
+    return {
+        "channel_id": row.channel_id,
+        "as_of": row.as_of.isoformat(),
+        "views_7d": row.views_7d,
+        "views_30d": row.views_30d,
+        "views_90d": row.views_90d,
+        "slope_30d": row.slope_30d,
+        "slope_90d": row.slope_90d,
+        "volatility_30d": row.volatility_30d,
+        "weekday_seasonality": seasonality,  # Monday first, 1.0 = average day
+        "monthly_views": complete_months(row),
+        "lifetime_views": row.lifetime_views,
+        "lifetime_days": row.lifetime_days,
+    }
+
+def get_features(db: Session, channel_id: str) -> Optional[Dict]:
+    """Single indexed read of a channel's materialized features."""
+    row = db.query(ChannelFeatures).filter_by(channel_id=channel_id).first()
+    return to_dict(row) if row else None
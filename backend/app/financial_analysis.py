@@ -1,6 +1,6 @@
 import json
 import math
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
@@ -31,6 +31,7 @@ class LoanRecommendation:
     monthly_payment: float
     risk_level: str
     confidence_score: float
+    default_probability: Optional[float] = None
 
 class FinancialAnalyzer:
     def __init__(self):
@@ -62,12 +63,32 @@ class FinancialAnalyzer:
             }
         }
 
-    def calculate_sensitivity_analysis(self, metrics: FinancialMetrics) -> SensitivityAnalysis:
-        """Calculate revenue sensitivity under different scenarios"""
+    def calculate_sensitivity_analysis(self, metrics: FinancialMetrics, simulation: Optional[Dict] = None) -> SensitivityAnalysis:
+        """
+        Calculate revenue sensitivity under different scenarios. With a
+        simulate_revenue() result the scenarios come from its simulated
+        average monthly revenue (p95/p5) and observed growth instead of fixed factors.
+        """
         
         # Base revenue calculation
         base_revenue = metrics.estimated_revenue_usd
         
+        if simulation:
+            horizon = simulation['horizon_months']
+            optimistic_revenue  = simulation['total_revenue_bands']['p95'] / horizon
+            pessimistic_revenue = simulation['total_revenue_bands']['p5'] / horizon
+            revenue_volatility  = (optimistic_revenue - pessimistic_revenue) / base_revenue
+            # annualised from the simulated monthly log-growth
+            growth_rate = math.expm1(12 * simulation['monthly_growth_mu'])
+            return SensitivityAnalysis(
+                base_revenue=base_revenue,
+                optimistic_revenue=optimistic_revenue,
+                pessimistic_revenue=pessimistic_revenue,
+                revenue_volatility=revenue_volatility,
+                growth_rate=growth_rate,
+                risk_score=self._calculate_risk_score(metrics)
+            )
+
         # Optimistic scenario (higher RPM, growth)
         optimistic_revenue = base_revenue * (self.rpm_scenarios['optimistic'] / self.rpm_scenarios['base']) * 1.2
         
@@ -133,14 +154,20 @@ class FinancialAnalyzer:
         
         return min(1.0, risk_score)
 
-    def generate_loan_recommendation(self, metrics: FinancialMetrics, sensitivity: SensitivityAnalysis) -> LoanRecommendation:
-        """Generate comprehensive loan recommendation with risk adjustment"""
+    def generate_loan_recommendation(self, metrics: FinancialMetrics, sensitivity: SensitivityAnalysis,
+                                     default_probability: Optional[float] = None) -> LoanRecommendation:
+        """
+        Generate comprehensive loan recommendation with risk adjustment.
+        A simulated default_probability further scales the advance by (1 - p).
+        """
         
         # Base loan amount (12 months of revenue)
         base_loan_amount = metrics.estimated_revenue_usd * self.loan_terms['max_advance_multiplier']
         
         # Risk-adjusted amount
         risk_adjusted_amount = base_loan_amount * (1 - sensitivity.risk_score * self.loan_terms['risk_adjustment_factor'])
+        if default_probability is not None:
+            risk_adjusted_amount = risk_adjusted_amount * (1 - default_probability)
         
         # Determine risk level and interest rate
         if sensitivity.risk_score < 0.3:
@@ -169,7 +196,8 @@ class FinancialAnalyzer:
             interest_rate_percent=interest_rate * 100,
             monthly_payment=monthly_payment,
             risk_level=risk_level,
-            confidence_score=confidence_score
+            confidence_score=confidence_score,
+            default_probability=default_probability
         )
 
     def _calculate_confidence_score(self, metrics: FinancialMetrics, sensitivity: SensitivityAnalysis) -> float:
@@ -195,8 +223,16 @@ class FinancialAnalyzer:
         
         return min(1.0, max(0.5, confidence))
 
-    def generate_financial_report(self, metrics: FinancialMetrics) -> Dict:
-        """Generate comprehensive financial analysis report"""
+    def generate_financial_report(self, metrics: FinancialMetrics, simulate: bool = False,
+                                  daily_views: Optional[Sequence[float]] = None,
+                                  n_paths: int = 5000, seed: int = 0,
+                                  monthly_views: Optional[Sequence[float]] = None) -> Dict:
+        """
+        Generate comprehensive financial analysis report. With simulate=True the
+        scenarios and a default probability come from a Monte Carlo run over the
+        loan's repayment period (see simulation.simulate_revenue), using
+        monthly_views or daily_views history when given.
+        """
         
         # Create metrics object
         financial_metrics = FinancialMetrics(
@@ -210,8 +246,22 @@ class FinancialAnalyzer:
         # Perform sensitivity analysis
         sensitivity = self.calculate_sensitivity_analysis(financial_metrics)
         
+        simulation = None
+        if simulate:
+            from .simulation import simulate_revenue
+            # simulate against the deterministic recommendation's payment schedule
+            draft = self.generate_loan_recommendation(financial_metrics, sensitivity)
+            simulation = simulate_revenue(
+                financial_metrics.estimated_revenue_usd, self.rpm_scenarios, daily_views, monthly_views,
+                horizon_months=draft.repayment_period_months, n_paths=n_paths,
+                monthly_payment=draft.monthly_payment, seed=seed,
+            )
+            sensitivity = self.calculate_sensitivity_analysis(financial_metrics, simulation)
+        
         # Generate loan recommendation
-        loan_rec = self.generate_loan_recommendation(financial_metrics, sensitivity)
+        loan_rec = self.generate_loan_recommendation(
+            financial_metrics, sensitivity, simulation and simulation['default_probability']
+        )
         
         # Create comprehensive report
         report = {
@@ -238,7 +288,8 @@ class FinancialAnalyzer:
                 "interest_rate_percent": loan_rec.interest_rate_percent,
                 "monthly_payment": loan_rec.monthly_payment,
                 "risk_level": loan_rec.risk_level,
-                "confidence_score": loan_rec.confidence_score
+                "confidence_score": loan_rec.confidence_score,
+                "default_probability": loan_rec.default_probability
             },
             "scenarios": {
                 "optimistic": {
@@ -255,5 +306,84 @@ class FinancialAnalyzer:
                 }
             }
         }
+        if simulation:
+            report["simulation"] = simulation
         
-        return report 
\ No newline at end of file
+        return report
+
+    # ---------- portfolio-scale (columnar) scoring ----------
+    def score_batch(self, metrics: Dict) -> Dict:
+        """
+        Vectorized equivalent of calculate_sensitivity_analysis +
+        generate_loan_recommendation for many channels at once.
+
+        `metrics` maps FinancialMetrics field names (subscriber_count, total_views,
+        video_count, estimated_revenue_usd) to equal-length arrays. Returns a dict
+        of NumPy arrays whose values are identical to the scalar path, element by
+        element. (Channels with zero revenue make the scalar path raise
+        ZeroDivisionError; here they come out as nan/inf.)
+        """
+        import numpy as np
+
+        subs    = np.asarray(metrics['subscriber_count'])
+        views   = np.asarray(metrics['total_views'])
+        videos  = np.asarray(metrics['video_count'])
+        revenue = np.asarray(metrics['estimated_revenue_usd'], dtype=np.float64)
+
+        # Sensitivity (same operation order as calculate_sensitivity_analysis)
+        rpm = self.rpm_scenarios
+        with np.errstate(divide='ignore', invalid='ignore'):
+            optimistic  = revenue * (rpm['optimistic'] / rpm['base']) * 1.2
+            pessimistic = revenue * (rpm['pessimistic'] / rpm['base']) * 0.8
+            volatility  = (optimistic - pessimistic) / revenue
+            growth_rate = np.minimum(0.15, np.maximum(-0.05, (optimistic - revenue) / revenue))
+
+        # Risk score (same branch order as _calculate_risk_score)
+        avg_views = views / np.maximum(videos, 1)
+        risk = np.zeros(revenue.shape)
+        risk = risk + np.select([subs > 10000000, subs > 1000000], [0.1, 0.2], 0.4)
+        risk = risk + np.select([avg_views > 1000000, avg_views > 100000], [0.1, 0.2], 0.4)
+        risk = risk + np.select([videos > 100, videos > 50], [0.1, 0.2], 0.3)
+        risk = risk + np.select([revenue > 100000, revenue > 10000], [0.1, 0.2], 0.4)
+        risk = np.minimum(1.0, risk)
+
+        # Loan terms per risk level; the amortisation factor only depends on the
+        # level, so it is computed once per level with the scalar formula.
+        terms   = self.loan_terms
+        levels  = ('low', 'medium', 'high')
+        periods = {'low': 24, 'medium': 18, 'high': 12}
+        rates   = {lvl: terms['base_interest_rate'] + terms['risk_premium'][lvl] for lvl in levels}
+        conds   = [risk < 0.3, risk < 0.6]
+
+        def per_level(values):
+            return np.select(conds, [values['low'], values['medium']], values['high'])
+
+        base_loan     = revenue * terms['max_advance_multiplier']
+        risk_adjusted = base_loan * (1 - risk * terms['risk_adjustment_factor'])
+        m             = {lvl: rates[lvl] / 12 for lvl in levels}
+        growth        = {lvl: (1 + m[lvl]) ** periods[lvl] for lvl in levels}
+        monthly_payment = (risk_adjusted * per_level(m) * per_level(growth)) / (per_level(growth) - 1)
+
+        # Confidence (same adjustments as _calculate_confidence_score)
+        confidence = np.full(revenue.shape, 0.8)
+        confidence = confidence + np.select([subs > 1000000, subs < 100000], [0.1, -0.1], 0.0)
+        confidence = confidence + np.select([volatility < 0.3, volatility > 0.7], [0.05, -0.05], 0.0)
+        confidence = confidence + np.where(videos > 50, 0.05, 0.0)
+        confidence = np.minimum(1.0, np.maximum(0.5, confidence))
+
+        return {
+            "base_revenue": revenue,
+            "optimistic_revenue": optimistic,
+            "pessimistic_revenue": pessimistic,
+            "revenue_volatility": volatility,
+            "growth_rate": growth_rate,
+            "risk_score": risk,
+            "recommended_advance": risk_adjusted,
+            "max_loan_amount": base_loan,
+            "risk_adjusted_amount": risk_adjusted,
+            "repayment_period_months": per_level(periods),
+            "interest_rate_percent": per_level({lvl: rates[lvl] * 100 for lvl in levels}),
+            "monthly_payment": monthly_payment,
+            "risk_level": per_level({lvl: lvl for lvl in levels}),
+            "confidence_score": confidence,
+        }
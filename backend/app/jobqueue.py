@@ -0,0 +1,265 @@
+"""
+SQL-backed job queue for channel analyses.
+
+enqueue() records a job in analysis_jobs and returns at once; worker threads
+(started with the API, or standalone via `python -m app.jobqueue`) claim
+queued jobs with a conditional UPDATE, run get_channel_report and store the
+report as JSON. Clients poll get_job(), or wait_for() to long-poll.
+
+A request for an analysis that is already queued or running (same channel and
+window) returns the existing job instead of adding another: the job's
+active_key is unique while it is live and cleared when it finishes. Channels
+are keyed by their resolved id, so a URL, UC id and @handle for one channel
+share a job.
+Jobs left running by a dead worker are re-queued after JOB_TIMEOUT seconds.
+"""
+import argparse
+import asyncio
+import datetime as _dt
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from .db import SessionLocal, engine
+from .models import AnalysisJob
+from .youtube_public import normalize_query, resolve_channel_id
+
+JOB_WORKERS       = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+JOB_TIMEOUT       = float(os.getenv("JOB_TIMEOUT", "300"))
+JOB_MAX_ATTEMPTS  = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+JOB_RETENTION     = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+
+FINISHED = ("done", "error")
+
+_table_ready = False
+_workers: List[threading.Thread] = []
+_stop = threading.Event()
+_wakeup = threading.Event()  # set on enqueue so idle local workers start at once
+
+class AnalyzeJobRequest(BaseModel):
+    """Body of POST /api/jobs/analyze (api/index.py mirrors it to keep its imports light)."""
+    url: str
+    days: int = 30
+
+def _session(session_factory=None):
+    global _table_ready
+    factory = session_factory or SessionLocal
+    if not _table_ready:
+        AnalysisJob.__table__.create(bind=factory.kw.get("bind") or engine, checkfirst=True)
+        _table_ready = True
+    return factory()
+
+def _active_key(query: str, days: int) -> str:
+    # resolutions are cached, so this costs at most the lookup the job would make;
+    # queries that do not resolve fall back to their text (the job reports the error)
+    try:
+        channel = resolve_channel_id(query)
+    except Exception:
+        channel = normalize_query(query)
+    return f"{channel}:{days}"
+
+def to_dict(job: AnalysisJob) -> Dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "query": job.query,
+        "days": job.days,
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at and job.started_at.isoformat(),
+        "finished_at": job.finished_at and job.finished_at.isoformat(),
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+    }
+
+def enqueue(query: str, days: int = 30, session_factory=None) -> Dict:
+    """Returns the live job for this analysis, creating it if there is none."""
+    key = _active_key(query, days)
+    db = _session(session_factory)
+    try:
+        live = db.query(AnalysisJob).filter_by(active_key=key).first()
+        if live:
+            return dict(to_dict(live), coalesced=True)
+        job = AnalysisJob(id=uuid.uuid4().hex, query=query, days=days, active_key=key,
+                          status="queued", attempts=0, created_at=_dt.datetime.utcnow())
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:  # another request created it first
+            db.rollback()
+            live = db.query(AnalysisJob).filter_by(active_key=key).first()
+            if live:
+                return dict(to_dict(live), coalesced=True)
+            raise
+        _wakeup.set()
+        return dict(to_dict(job), coalesced=False)
+    finally:
+        db.close()
+
+def get_job(job_id: str, session_factory=None) -> Optional[Dict]:
+    db = _session(session_factory)
+    try:
+        job = db.get(AnalysisJob, job_id)
+        return to_dict(job) if job else None
+    finally:
+        db.close()
+
+async def wait_for(job_id: str, timeout: float = 0.0) -> Optional[Dict]:
+    """Long-poll: returns once the job has finished or `timeout` seconds passed."""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = await asyncio.to_thread(get_job, job_id)
+        if job is None or job["status"] in FINISHED or time.monotonic() >= deadline:
+            return job
+        await asyncio.sleep(min(JOB_POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+def _requeue_stale(db):
+    """Running jobs whose worker went away go back to the queue (or fail for good)."""
+    cutoff = _dt.datetime.utcnow() - _dt.timedelta(seconds=JOB_TIMEOUT)
+    stale = db.query(AnalysisJob).filter(AnalysisJob.status == "running",
+                                         AnalysisJob.started_at < cutoff)
+    for job in stale:
+        if job.attempts >= JOB_MAX_ATTEMPTS:
+            job.status, job.active_key = "error", None
+            job.error = f"Worker {job.worker} timed out after {JOB_TIMEOUT:.0f}s"
+            job.finished_at = _dt.datetime.utcnow()
+        else:
+            job.status, job.worker = "queued", None
+    db.commit()
+
+def claim(worker: str, session_factory=None) -> Optional[AnalysisJob]:
+    """Atomically moves the oldest queued job to running for this worker."""
+    db = _session(session_factory)
+    try:
+        _requeue_stale(db)
+        while True:
+            job_id = (
+                db.query(AnalysisJob.id)
+                  .filter(AnalysisJob.status == "queued")
+                  .order_by(AnalysisJob.created_at)
+                  .limit(1)
+                  .scalar()
+            )
+            if job_id is None:
+                return None
+            claimed = (
+                db.query(AnalysisJob)
+                  .filter(AnalysisJob.id == job_id, AnalysisJob.status == "queued")
+                  .update({AnalysisJob.status: "running",
+                           AnalysisJob.worker: worker,
+                           AnalysisJob.started_at: _dt.datetime.utcnow(),
+                           AnalysisJob.attempts: AnalysisJob.attempts + 1},
+                          synchronize_session=False)
+            )
+            db.commit()
+            if claimed:  # otherwise another worker won the race; try the next job
+                job = db.get(AnalysisJob, job_id)
+                db.expunge(job)
+                return job
+    finally:
+        db.close()
+
+def finish(job_id: str, report: Optional[Dict] = None, error: Optional[str] = None, session_factory=None):
+    db = _session(session_factory)
+    try:
+        job = db.get(AnalysisJob, job_id)
+        if report is not None:
+            job.result = json.dumps(report)
+        if error is None and report is not None and "error" in report:
+            error = report["error"]
+        job.status      = "error" if error else "done"
+        job.error       = error
+        job.active_key  = None
+        job.finished_at = _dt.datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+def purge(session_factory=None) -> int:
+    """Deletes finished jobs older than JOB_RETENTION_HOURS."""
+    cutoff = _dt.datetime.utcnow() - _dt.timedelta(hours=JOB_RETENTION)
+    db = _session(session_factory)
+    try:
+        n = (db.query(AnalysisJob)
+               .filter(AnalysisJob.status.in_(FINISHED), AnalysisJob.finished_at < cutoff)
+               .delete(synchronize_session=False))
+        db.commit()
+        return n
+    finally:
+        db.close()
+
+def run_one(worker: str, session_factory=None) -> bool:
+    """Claims and runs a single job. Returns False if the queue was empty."""
+    from .public_analysis import get_channel_report
+
+    job = claim(worker, session_factory)
+    if job is None:
+        return False
+    try:
+        report = get_channel_report(job.query, job.days)
+        report.pop("timings_ms", None)
+        finish(job.id, report, session_factory=session_factory)
+    except Exception as e:
+        finish(job.id, error=f"{type(e).__name__}: {e}", session_factory=session_factory)
+    return True
+
+def _worker_loop(name: str):
+    last_purge = 0.0
+    while not _stop.is_set():
+        try:
+            if run_one(name):
+                continue
+            if time.monotonic() - last_purge > 3600:
+                purge()
+                last_purge = time.monotonic()
+        except Exception as e:
+            print(f"❌  Job worker {name} error: {e}")
+        _wakeup.wait(JOB_POLL_INTERVAL)
+        _wakeup.clear()
+
+def start_workers(n: int = JOB_WORKERS) -> List[threading.Thread]:
+    """Starts n daemon worker threads in this process (idempotent)."""
+    _stop.clear()
+    alive = [t for t in _workers if t.is_alive()]
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    for i in range(len(alive), n):
+        t = threading.Thread(target=_worker_loop, args=(f"{prefix}:{i}",), daemon=True,
+                             name=f"analysis-worker-{i}")
+        t.start()
+        alive.append(t)
+    _workers[:] = alive
+    return alive
+
+def stop_workers(timeout: float = 5.0):
+    _stop.set()
+    _wakeup.set()
+    for t in _workers:
+        t.join(timeout)
+    _workers.clear()
+
+def stats() -> Dict:
+    from sqlalchemy import func
+    db = _session()
+    try:
+        counts = dict(db.query(AnalysisJob.status, func.count()).group_by(AnalysisJob.status).all())
+    finally:
+        db.close()
+    return {"workers": sum(t.is_alive() for t in _workers), **counts}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run analysis job workers")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS)
+    args = parser.parse_args()
+    start_workers(args.workers)
+    print(f"⚙️  {args.workers} analysis workers polling analysis_jobs")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stop_workers()
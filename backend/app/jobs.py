@@ -1,83 +1,265 @@
 """
 Run with:  PYTHONPATH=./backend python backend/app/jobs.py
-It will pull the last-30-days stats for every connected channel once a day.
+It will pull new daily stats for every connected channel once a day.
+
+Each run only asks YouTube Analytics for the days after the channel's
+watermark (plus a short re-fetch window for late-arriving data). Pass
+--full-backfill to re-pull the whole history from 2010 once and exit.
+
+Every ChannelDailyStats metric comes from one reports.query per date range,
+mapped by the response's columnHeaders. Ranges longer than INGEST_CHUNK_DAYS
+are split into sub-ranges fetched in parallel. Channels refused revenue are
+queried without it (and their stored revenue left alone) for
+INGEST_MONETARY_RECHECK_HOURS before revenue is tried again.
 """
+import argparse
 import datetime as _dt
 import sys
 import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Tuple
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from apscheduler.schedulers.blocking import BlockingScheduler
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
 from sqlalchemy.orm import Session
 
-from app.db import SessionLocal, engine
-from app.models import Base, ChannelCredentials, ChannelDailyStats
-from app.auth import load_credentials
+from app import quota
+from app.cache import MemoryCache
+from app.clients import get_service
+from app.db import SessionLocal, engine, add_missing_columns
+from app.models import Base, ChannelCredentials, IngestWatermark
+from app.auth import ensure_fresh, load_credentials, refresh_expiring
+from app.bulk import upsert_daily_stats
+from app.features import update_features
+from app.rollups import ensure_schema as ensure_rollup_schema, update_rollups
 
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
+ensure_rollup_schema(engine)
+
+# Analytics metric -> ChannelDailyStats column
+METRIC_COLUMNS = {
+    "views":                   "views",
+    "estimatedMinutesWatched": "minutes_watched",
+    "estimatedRevenue":        "revenue",
+    "subscribersGained":       "subs_gained",
+    "subscribersLost":         "subs_lost",
+}
+METRICS = ",".join(METRIC_COLUMNS)
+# Needs the monetary scope and a monetised channel; others get 403 for the whole query.
+MONETARY_METRICS = ("estimatedRevenue",)
+BASIC_METRICS    = ",".join(m for m in METRIC_COLUMNS if m not in MONETARY_METRICS)
+MONETARY_DENIED_REASONS = {"forbidden", "insufficientPermissions", "PERMISSION_DENIED"}
+
+HISTORY_START  = _dt.date(2010, 1, 1)  # YouTube Analytics started around 2010
+LATE_DATA_DAYS = int(os.getenv("INGEST_LATE_DATA_DAYS", "3"))  # days re-fetched behind the watermark
+CONCURRENCY    = int(os.getenv("INGEST_CONCURRENCY", "4"))     # channels ingested in parallel
+CHUNK_DAYS        = int(os.getenv("INGEST_CHUNK_DAYS", "365"))       # longest range in one query
+CHUNK_CONCURRENCY = int(os.getenv("INGEST_CHUNK_CONCURRENCY", "8"))  # sub-ranges in flight per channel
+TOKEN_REFRESH_MINUTES = int(os.getenv("TOKEN_REFRESH_INTERVAL_MINUTES", "5"))
+MONETARY_RECHECK_HOURS = float(os.getenv("INGEST_MONETARY_RECHECK_HOURS", "24"))
+
+# Channels refused monetary metrics; queried without them until the entry
+# expires, then revenue is tried again (the channel may have been monetised).
+_no_monetary = MemoryCache("no_monetary", maxsize=100_000, ttl=MONETARY_RECHECK_HOURS * 3600)
+
+def ingest_range(db: Session, channel_id: str, full_backfill: bool = False):
+    """Returns the (start, end) dates still missing for a channel."""
+    end = _dt.date.today()
+    if full_backfill:
+        return HISTORY_START, end
+    wm = db.query(IngestWatermark).filter_by(channel_id=channel_id).first()
+    if not wm:
+        return HISTORY_START, end
+    start = wm.last_date + _dt.timedelta(days=1 - LATE_DATA_DAYS)
+    return max(HISTORY_START, min(start, end)), end
+
+def advance_watermark(db: Session, channel_id: str, last_date: _dt.date):
+    wm = (
+        db.query(IngestWatermark).filter_by(channel_id=channel_id).first()
+        or IngestWatermark(channel_id=channel_id, last_date=last_date)
+    )
+    wm.last_date  = max(wm.last_date, last_date)
+    wm.updated_at = _dt.datetime.utcnow()
+    db.add(wm)
+
+def date_chunks(start: _dt.date, end: _dt.date, days: int = CHUNK_DAYS) -> List[Tuple[_dt.date, _dt.date]]:
+    """Splits [start, end] into consecutive ranges of at most `days` days."""
+    chunks = []
+    while start <= end:
+        stop = min(end, start + _dt.timedelta(days=max(1, days) - 1))
+        chunks.append((start, stop))
+        start = stop + _dt.timedelta(days=1)
+    return chunks
+
+def parse_report(resp: Dict, channel_id: str) -> List[Dict]:
+    """
+    ChannelDailyStats rows from a reports.query response, by column name.
+    Metrics the response lacks (revenue when it was not queried) are left out
+    of the rows, so the upsert keeps whatever is stored for them.
+    """
+    names = [h["name"] for h in resp.get("columnHeaders", [])]
+    if "day" not in names:
+        raise ValueError(f"Analytics response has no 'day' column: {names}")
+    day = names.index("day")
+    columns = [(i, METRIC_COLUMNS[n]) for i, n in enumerate(names) if n in METRIC_COLUMNS]
+    rows = []
+    for values in resp.get("rows") or []:
+        row = {"channel_id": channel_id, "date": _dt.date.fromisoformat(values[day])}
+        for i, column in columns:
+            if column == "revenue":
+                row[column] = float(values[i] or 0)
+            else:
+                row[column] = int(values[i] or 0)
+        rows.append(row)
+    return rows
+
+def _monetary_denied(e) -> bool:
+    status, reason = quota._error_info(e.resp.status, e.content)
+    return status == 403 and reason in MONETARY_DENIED_REASONS
+
+def _query_range(yt, channel_id: str, start: _dt.date, end: _dt.date) -> Tuple[Dict, int]:
+    """One reports.query for all metrics; returns (response, API calls made)."""
+    from googleapiclient.errors import HttpError
+
+    def query(metrics):
+        return quota.execute(yt.reports().query(
+            ids=f"channel=={channel_id}",
+            startDate=start.isoformat(),
+            endDate=end.isoformat(),
+            dimensions="day",
+            metrics=metrics,
+        ), "reports.query", api="youtubeAnalytics")
 
-METRICS = (
-    "views"
-)
-
-def fetch_all_time_stats(db: Session, channel_id: str, creds):
-    yt = build("youtubeAnalytics", "v2", credentials=creds)
-    end   = _dt.date.today()
-    start = _dt.date(2010, 1, 1)  # YouTube Analytics started around 2010
-
-    resp = yt.reports().query(
-        ids=f"channel=={channel_id}",
-        startDate=start.isoformat(),
-        endDate=end.isoformat(),
-        dimensions="day",
-        metrics=METRICS,
-    ).execute()
-
-    import pprint
-    print(f"\n📊 FULL API RESPONSE for {channel_id}:")
-    pprint.pprint(resp)
-    print(f"   Rows returned: {len(resp.get('rows', []))}")
-    print(f"   Response keys: {list(resp.keys())}")
-    if 'rows' in resp and resp['rows']:
-        print(f"   Sample row: {resp['rows'][0]}")
-    else:
-        print(f"   No rows returned")
-
-    for row in resp.get("rows", []):
-        date_str, views = row
-        date = _dt.date.fromisoformat(date_str)
-
-        stat = (
-            db.query(ChannelDailyStats)
-              .filter_by(channel_id=channel_id, date=date)
-              .first()
-        ) or ChannelDailyStats(channel_id=channel_id, date=date)
-
-        stat.views           = int(views)
-        stat.minutes_watched = 0
-        stat.revenue         = 0.0
-        stat.subs_gained     = 0
-        stat.subs_lost       = 0
-
-        db.add(stat)
+    if _no_monetary.get(channel_id):
+        return query(BASIC_METRICS), 1
+    try:
+        return query(METRICS), 1
+    except HttpError as e:
+        if not _monetary_denied(e):
+            raise
+    # not monetised / no monetary scope: everything else still fits in one query
+    _no_monetary.set(channel_id, True)
+    return query(BASIC_METRICS), 2
+
+def fetch_daily_rows(channel_id: str, creds, start: _dt.date, end: _dt.date) -> Tuple[List[Dict], int]:
+    """
+    Daily rows for [start, end], one query per CHUNK_DAYS sub-range. Sub-ranges
+    run CHUNK_CONCURRENCY at a time, each slot on its own cached service since
+    services are not thread-safe. Returns (rows, API calls made).
+    """
+    chunks = date_chunks(start, end)
+    slots  = max(1, min(CHUNK_CONCURRENCY, len(chunks)))
+
+    def run_slot(slot: int):
+        key = channel_id if slot == 0 else f"{channel_id}#{slot}"
+        yt = get_service("youtubeAnalytics", "v2", credentials=creds, cache_key=key)
+        rows, calls = [], 0
+        for a, b in chunks[slot::slots]:
+            resp, n = _query_range(yt, channel_id, a, b)
+            rows.extend(parse_report(resp, channel_id))
+            calls += n
+        return rows, calls
+
+    if slots == 1:
+        return run_slot(0)
+    with ThreadPoolExecutor(max_workers=slots) as pool:
+        results = list(pool.map(run_slot, range(slots)))
+    return [r for rows, _ in results for r in rows], sum(calls for _, calls in results)
+
+def fetch_all_time_stats(db: Session, channel_id: str, creds, full_backfill: bool = False):
+    start, end = ingest_range(db, channel_id, full_backfill)
+    rows, api_calls = fetch_daily_rows(channel_id, creds, start, end)
+    print(f"📊  {channel_id}: {len(rows)} rows for {start}..{end} in {api_calls} queries")
+
+    written = upsert_daily_stats(db, rows)
+    print(f"   Upserted {written['rows']} rows in {written['seconds']:.2f}s "
+          f"({written['rows_per_sec']:,.0f} rows/s, {written['method']})")
+    if rows:
+        advance_watermark(db, channel_id, max(r["date"] for r in rows))
+        update_rollups(db, channel_id, min(r["date"] for r in rows), max(r["date"] for r in rows))
+        update_features(db, channel_id, LATE_DATA_DAYS, rebuild=full_backfill)
     db.commit()
+    written["api_calls"] = api_calls
+    return written
 
-def daily_job():
+def ingest_channel(channel_id: str, full_backfill: bool = False) -> dict:
+    """Ingests one channel in its own session; never raises, failures are returned."""
+    result = {"channel_id": channel_id, "ok": False, "rows": 0, "api_calls": 0, "error": None}
+    started = time.perf_counter()
     db = SessionLocal()
-    for row in db.query(ChannelCredentials).all():
-        creds = load_credentials(row.channel_id, db)
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-            db.commit()
-        fetch_all_time_stats(db, row.channel_id, creds)
+    try:
+        creds = load_credentials(channel_id, db)
+        if creds and ensure_fresh(channel_id, creds, db):
+            result["api_calls"] += 1
+            db.commit()  # persist the token even if the ingest below fails
+        written = fetch_all_time_stats(db, channel_id, creds, full_backfill)
+        result["rows"]       = written["rows"]
+        result["api_calls"] += written["api_calls"]
+        result["ok"]         = True
+    except Exception as e:
+        db.rollback()
+        result["error"] = f"{type(e).__name__}: {e}"
+        print(f"❌  Ingest failed for {channel_id}: {result['error']}")
+        traceback.print_exc()
+    finally:
+        db.close()
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+def daily_job(full_backfill: bool = False, concurrency: int = CONCURRENCY) -> dict:
+    started = time.perf_counter()
+    db = SessionLocal()
+    channel_ids = [cid for (cid,) in db.query(ChannelCredentials.channel_id).all()]
     db.close()
-    print(f"✅  Ingest finished at {_dt.datetime.utcnow():%Y-%m-%d %H:%M}Z")
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(ingest_channel, cid, full_backfill) for cid in channel_ids]
+        for fut in as_completed(futures):
+            results.append(fut.result())
+
+    failed = [r for r in results if not r["ok"]]
+    summary = {
+        "channels_ok":     len(results) - len(failed),
+        "channels_failed": len(failed),
+        "failures":        [{"channel_id": r["channel_id"], "error": r["error"]} for r in failed],
+        "rows":            sum(r["rows"] for r in results),
+        "api_calls":       sum(r["api_calls"] for r in results),
+        "wall_seconds":    time.perf_counter() - started,
+        "concurrency":     concurrency,
+    }
+    print(f"✅  Ingest finished at {_dt.datetime.utcnow():%Y-%m-%d %H:%M}Z – "
+          f"{summary['channels_ok']} ok, {summary['channels_failed']} failed, "
+          f"{summary['rows']} rows, {summary['api_calls']} API calls "
+          f"in {summary['wall_seconds']:.1f}s")
+    return summary
+
+def refresh_tokens() -> dict:
+    summary = refresh_expiring(session_factory=SessionLocal)
+    if summary["refreshed"] or summary["failed"]:
+        print(f"🔑  Refreshed {summary['refreshed']} access tokens, {summary['failed']} failed")
+    return summary
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="YouTube Analytics daily ingest")
+    parser.add_argument("--full-backfill", action="store_true",
+                        help="re-pull every channel's full history once and exit")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="number of channels ingested in parallel")
+    args = parser.parse_args()
+    if args.full_backfill:
+        summary = daily_job(full_backfill=True, concurrency=args.concurrency)
+        sys.exit(1 if summary["channels_failed"] else 0)
+
     sched = BlockingScheduler(timezone="UTC")
     # run immediately on startup, then every 24 h
-    sched.add_job(daily_job, "interval", days=1, next_run_time=_dt.datetime.utcnow())
-    print("⏰  Scheduler started – pulling all-time YouTube Analytics every 24 h")
+    sched.add_job(daily_job, "interval", days=1, next_run_time=_dt.datetime.utcnow(),
+                  kwargs={"concurrency": args.concurrency})
+    # keep access tokens renewed ahead of expiry so ingest never waits on OAuth
+    sched.add_job(refresh_tokens, "interval", minutes=TOKEN_REFRESH_MINUTES,
+                  next_run_time=_dt.datetime.utcnow())
+    print("⏰  Scheduler started – pulling new YouTube Analytics days every 24 h")
     sched.start() 
\ No newline at end of file
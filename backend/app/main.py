@@ -1,20 +1,56 @@
-import os, json, requests
-from fastapi import FastAPI, Depends, Response, Request as FastAPIRequest
-from fastapi.responses import RedirectResponse, HTMLResponse
+import os, json, asyncio, requests
+from fastapi import FastAPI, Depends, HTTPException, Response, Request as FastAPIRequest
+from fastapi.responses import RedirectResponse, HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from googleapiclient.discovery import build
 from google.auth.transport.requests import Request as GoogleRequest
 from google_auth_oauthlib.flow import Flow
-from .auth import get_flow, save_credentials, get_db
+from .auth import get_flow, save_credentials, get_db, get_read_db, refresh_expiring
 from .models import ChannelCredentials, Base
-from .db import engine
+from .db import engine, add_missing_columns, stats as db_stats
 from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from typing import List
 # Public analysis import
-from .public_analysis import get_channel_report
+from .public_analysis import (
+    get_channel_report_async, get_insight_async, stream_channel_report, report_cache, insight_cache,
+)
+from . import clients, etag, jobqueue, metrics, quota, rollups, singleflight, youtube_async
+from .batch import analyze_batch
+from .jobqueue import AnalyzeJobRequest
 
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
+rollups.ensure_schema(engine)
 app = FastAPI(title="Creator Funding API")
+app.add_middleware(metrics.TimingMiddleware)
+
+# Optional in-process token refresher, for deployments that don't run jobs.py.
+# Only enable it in one worker.
+TOKEN_REFRESHER = os.getenv("TOKEN_REFRESHER", "0") == "1"
+_token_scheduler = None
+
+@app.on_event("startup")
+def start_token_refresher():
+    global _token_scheduler
+    if TOKEN_REFRESHER:
+        from apscheduler.schedulers.background import BackgroundScheduler
+        _token_scheduler = BackgroundScheduler(timezone="UTC")
+        _token_scheduler.add_job(refresh_expiring, "interval",
+                                 minutes=int(os.getenv("TOKEN_REFRESH_INTERVAL_MINUTES", "5")))
+        _token_scheduler.start()
+
+@app.on_event("startup")
+def start_job_workers():
+    if jobqueue.JOB_WORKERS > 0:
+        jobqueue.start_workers(jobqueue.JOB_WORKERS)
+
+@app.on_event("shutdown")
+async def close_http_pool():
+    await youtube_async.aclose()
+    jobqueue.stop_workers()
+    if _token_scheduler is not None:
+        _token_scheduler.shutdown(wait=False)
 
 # Mount static files - adjust path for Vercel
 static_dir = "public" if os.path.exists("public") else "../public"
@@ -41,9 +77,21 @@ def health_check():
         "status": "healthy",
         "openai_configured": bool(os.getenv("OPENAI_API_KEY")),
         "youtube_configured": bool(os.getenv("YOUTUBE_API_KEY")),
-        "database_configured": bool(os.getenv("DATABASE_URL"))
+        "database_configured": bool(os.getenv("DATABASE_URL")),
+        "database": db_stats(),
+        "report_cache": report_cache.stats(),
+        "insight_cache": insight_cache.stats(),
+        "youtube_quota": quota.stats(),
+        "youtube_etag_cache": etag.stats(),
+        "analysis_jobs": jobqueue.stats(),
+        "singleflight": singleflight.stats(),
     }
 
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus scrape endpoint (per-process counters and histograms)"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/login")
 def login():
     flow = get_flow()
@@ -56,11 +104,10 @@ def oauth2callback(code: str, db: Session = Depends(get_db)):
     flow.fetch_token(code=code)
 
     creds = flow.credentials
-    youtube = build("youtube", "v3", credentials=creds)
-    channel_resp = (
-        youtube.channels()
-        .list(part="id", mine=True)
-        .execute()
+    youtube = clients.build_service("youtube", "v3", credentials=creds)
+    channel_resp = quota.execute(
+        youtube.channels().list(part="id", mine=True),
+        "channels.list",
     )
     channel_id = channel_resp["items"][0]["id"]
 
@@ -73,27 +120,92 @@ def oauth2callback(code: str, db: Session = Depends(get_db)):
 
 # ---------- Public-URL lookup ----------
 @app.get("/public/analyze")
-def public_analyze(url: str, days: int = 30):
+async def public_analyze(url: str, days: int = 30):
     """
     Paste any YouTube channel URL/handle/name → get public stats,
     GPT-generated summary, and an estimated advance.
     """
     try:
-        return get_channel_report(url, days)
+        return await get_channel_report_async(url, days)
     except Exception as e:
         return {"error": str(e)}
 
 # ---------- Dashboard API endpoints ----------
 @app.get("/api/channels")
-def get_connected_channels(db: Session = Depends(get_db)):
+def get_connected_channels(db: Session = Depends(get_read_db)):
     """Get all connected channels"""
     channels = db.query(ChannelCredentials).all()
     return [{"channel_id": c.channel_id} for c in channels]
 
+@app.get("/api/channels/{channel_id}/stats")
+def get_channel_stats(channel_id: str, start: str, end: str, grain: str = "auto",
+                      db: Session = Depends(get_read_db)):
+    """
+    Stats for a connected channel over [start, end] (YYYY-MM-DD): totals from the
+    coarsest rollups that fit, plus a series at `grain` (day/week/month, or auto)
+    """
+    import datetime as _dt
+    try:
+        start_d, end_d = _dt.date.fromisoformat(start), _dt.date.fromisoformat(end)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be YYYY-MM-DD")
+    if grain not in ("auto", "day", "week", "month") or start_d > end_d:
+        raise HTTPException(status_code=400, detail="Invalid grain or date range")
+    used, rows = rollups.series(db, channel_id, start_d, end_d, None if grain == "auto" else grain)
+    return {
+        "channel_id": channel_id,
+        "totals": rollups.totals(db, channel_id, start_d, end_d),
+        "grain": used,
+        "series": [dict(r, period_start=r["period_start"].isoformat()) for r in rows],
+    }
+
 @app.get("/api/analyze")
-def analyze_channel(url: str, days: int = 30):
-    """Analyze a channel via URL"""
+async def analyze_channel(url: str, days: int = 30, defer_ai: bool = False):
+    """
+    Analyze a channel via URL. With defer_ai=true the AI section is left
+    pending and can be polled from /api/analyze/insight.
+    """
     try:
-        return get_channel_report(url, days)
+        return await get_channel_report_async(url, days, defer_ai=defer_ai)
     except Exception as e:
-        return {"error": str(e)} 
\ No newline at end of file
+        return {"error": str(e)}
+
+@app.get("/api/analyze/insight")
+async def analyze_insight(channel_id: str, days: int = 30):
+    """Poll the AI section of a defer_ai analysis"""
+    return await get_insight_async(channel_id, days)
+
+@app.get("/api/analyze/stream")
+async def analyze_stream(url: str, days: int = 30):
+    """Server-sent events: the report first, then AI insight tokens as they arrive"""
+    return StreamingResponse(stream_channel_report(url, days), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/api/jobs/analyze", status_code=202)
+async def enqueue_analysis(req: AnalyzeJobRequest):
+    """Queue an analysis and return its job id at once; identical in-flight requests share one job"""
+    job = await asyncio.to_thread(jobqueue.enqueue, req.url, req.days)
+    return {"job_id": job["job_id"], "status": job["status"], "coalesced": job["coalesced"]}
+
+@app.get("/api/jobs/{job_id}")
+async def get_analysis_job(job_id: str, wait: float = 0.0):
+    """Job status and, once done, the report. wait=N long-polls up to N seconds (max 30)"""
+    job = await jobqueue.wait_for(job_id, min(max(wait, 0.0), 30.0))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job
+
+class BatchAnalyzeRequest(BaseModel):
+    urls: List[str]
+    days: int = 30
+
+@app.post("/api/analyze/batch")
+def analyze_batch_endpoint(req: BatchAnalyzeRequest):
+    """Screen many channel URLs at once; streams one NDJSON line per channel as it completes"""
+    def lines():
+        try:
+            for result in analyze_batch(req.urls, req.days):
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,210 @@
+"""
+In-process counters and histograms, rendered in the Prometheus text format at
+/metrics.
+
+Instruments are module-level and labelled: the report pipeline's stages (via
+timing.stage_timer), every YouTube / Analytics API call (quota.execute),
+OpenAI completions, bulk DB writes and HTTP requests (TimingMiddleware). An
+observation is a dict lookup and a bisect under one lock, a few microseconds,
+so instrumentation stays on in production. Values are per process; Prometheus
+sums them across workers.
+
+TimingMiddleware also adds per-request headers: X-Response-Time-Ms and a
+Server-Timing entry for every stage the request ran before its headers were
+sent (for streamed responses that is the time to first byte).
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: Dict[str, "_Metric"] = {}
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _number(v: float) -> str:
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name       = name
+        self.help       = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, object] = {}
+        self._lock      = threading.Lock()
+        _registry[name] = self
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self):
+        yield from super().render()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            yield f"{self.name}_total{_labels(self.labelnames, key)} {_number(v)}"
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # per-bucket (non-cumulative) counts + [+Inf], then sum and count
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._values.get(self._key(labels))
+        return series[2] if series else 0
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        yield from super().render()
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._values.items())
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = 'le="%s"' % ("+Inf" if bound == float("inf") else _number(bound))
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {n}"
+
+# ---------- instruments ----------
+stage_seconds = Histogram("report_stage_seconds", "Time spent in each report pipeline stage", ("stage",))
+stage_errors  = Counter("report_stage_errors", "Exceptions raised out of a report pipeline stage", ("stage",))
+api_seconds   = Histogram("google_api_request_seconds", "YouTube / Analytics API call latency, retries included",
+                          ("api", "method"))
+api_requests  = Counter("google_api_requests", "YouTube / Analytics API calls by outcome",
+                        ("api", "method", "outcome"))
+openai_seconds  = Histogram("openai_request_seconds", "OpenAI chat completion latency", ("mode",))
+openai_requests = Counter("openai_requests", "OpenAI chat completions by outcome", ("mode", "outcome"))
+db_write_seconds = Histogram("db_write_seconds", "Bulk database write latency", ("table",))
+db_rows_written  = Counter("db_rows_written", "Rows upserted by bulk writes", ("table",))
+http_seconds  = Histogram("http_request_seconds", "HTTP request latency until the response headers",
+                          ("method", "route", "status"))
+
+@contextmanager
+def track(histogram: Histogram, counter: Optional[Counter] = None, **labels):
+    """Times the block into `histogram` and counts it in `counter` with outcome=ok/error."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
+        if counter is not None:
+            counter.inc(outcome=outcome, **labels)
+
+# ---------- per-request stage timings ----------
+request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None)
+
+def record_stage(stage: str, seconds: float, failed: bool = False):
+    """Called by timing.stage_timer for every stage it times."""
+    stage_seconds.observe(seconds, stage=stage)
+    if failed:
+        stage_errors.inc(stage=stage)
+    timings = request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds * 1000
+
+def _server_timing(timings: Dict[str, float], total_ms: float) -> str:
+    entries = [f"{stage};dur={ms:.1f}" for stage, ms in timings.items()]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+class TimingMiddleware:
+    """ASGI middleware: http_request_seconds, X-Response-Time-Ms and Server-Timing."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        token = request_timings.set(timings)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                route = scope.get("route")
+                http_seconds.observe(elapsed, method=scope["method"],
+                                     route=getattr(route, "path", "unmatched"),
+                                     status=message["status"])
+                headers = list(message.get("headers", []))
+                headers.append((b"x-response-time-ms", f"{elapsed * 1000:.1f}".encode()))
+                headers.append((b"server-timing", _server_timing(timings, elapsed * 1000).encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timings.reset(token)
+
+# ---------- exposition ----------
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def render() -> str:
+    lines = []
+    for metric in list(_registry.values()):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def clear():
+    for metric in _registry.values():
+        metric.clear()
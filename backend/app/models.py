@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, String, Integer, Float, Date, DateTime, UniqueConstraint
+    Column, String, Integer, Float, Date, DateTime, Text, Index, UniqueConstraint
 )
 from .db import Base
 
@@ -12,12 +12,22 @@ class ChannelCredentials(Base):
     client_id     = Column(String, nullable=False)
     client_secret = Column(String, nullable=False)
     scopes        = Column(String, nullable=False)
-    expiry        = Column(DateTime, nullable=True)
+    expiry        = Column(DateTime, nullable=True)   # of access_token, naive UTC
+    access_token  = Column(String, nullable=True)
+
+class ChannelResolution(Base):
+    """Normalised URL/@handle/name query -> UC-id. channel_id is NULL for negative entries."""
+    __tablename__ = "channel_resolutions"
+    id          = Column(Integer, primary_key=True, index=True)
+    query_key   = Column(String, unique=True, index=True, nullable=False)
+    channel_id  = Column(String, nullable=True)
+    resolved_at = Column(DateTime, nullable=False)
+    expires_at  = Column(DateTime, nullable=True)  # NULL = never expires
 
 class ChannelDailyStats(Base):
     __tablename__ = "channel_daily_stats"
     id              = Column(Integer, primary_key=True, index=True)
-    channel_id      = Column(String, index=True, nullable=False)
+    channel_id      = Column(String, nullable=False)  # leading column of _channel_date_uc
     date            = Column(Date,  index=True, nullable=False)
     views           = Column(Integer)
     minutes_watched = Column(Integer)
@@ -27,4 +37,108 @@ class ChannelDailyStats(Base):
 
     __table_args__ = (
         UniqueConstraint("channel_id", "date", name="_channel_date_uc"),
-    ) 
\ No newline at end of file
+        # per-channel range reads of views (features, simulation) are index-only;
+        # on Postgres the remaining stats ride along as INCLUDE columns
+        Index("ix_channel_daily_cover", "channel_id", "date", "views",
+              postgresql_include=["minutes_watched", "revenue", "subs_gained", "subs_lost"]),
+    )
+
+class ChannelWeeklyStats(Base):
+    """ChannelDailyStats summed per Monday-start week (see app/rollups.py)."""
+    __tablename__ = "channel_weekly_stats"
+    id              = Column(Integer, primary_key=True, index=True)
+    channel_id      = Column(String, nullable=False)
+    period_start    = Column(Date, nullable=False)
+    days            = Column(Integer, nullable=False)  # daily rows present in the week
+    views           = Column(Integer)
+    minutes_watched = Column(Integer)
+    revenue         = Column(Float)
+    subs_gained     = Column(Integer)
+    subs_lost       = Column(Integer)
+
+    __table_args__ = (
+        UniqueConstraint("channel_id", "period_start", name="_channel_week_uc"),
+    )
+
+class ChannelMonthlyStats(Base):
+    """ChannelDailyStats summed per calendar month (see app/rollups.py)."""
+    __tablename__ = "channel_monthly_stats"
+    id              = Column(Integer, primary_key=True, index=True)
+    channel_id      = Column(String, nullable=False)
+    period_start    = Column(Date, nullable=False)
+    days            = Column(Integer, nullable=False)
+    views           = Column(Integer)
+    minutes_watched = Column(Integer)
+    revenue         = Column(Float)
+    subs_gained     = Column(Integer)
+    subs_lost       = Column(Integer)
+
+    __table_args__ = (
+        UniqueConstraint("channel_id", "period_start", name="_channel_month_uc"),
+    )
+
+class ChannelFeatures(Base):
+    """Materialized time-series features per connected channel (see app/features.py)."""
+    __tablename__ = "channel_features"
+    id               = Column(Integer, primary_key=True, index=True)
+    channel_id       = Column(String, unique=True, index=True, nullable=False)
+    as_of            = Column(Date, nullable=False)   # latest day in the rolling windows
+    views_7d         = Column(Integer)
+    views_30d        = Column(Integer)
+    views_90d        = Column(Integer)
+    slope_30d        = Column(Float)                  # views/day trend, least squares
+    slope_90d        = Column(Float)
+    volatility_30d   = Column(Float)                  # std / mean of daily views
+    # incremental accumulators over settled days (older than the late-data window)
+    settled_through  = Column(Date, nullable=True)
+    first_date       = Column(Date, nullable=True)
+    lifetime_views   = Column(Integer, default=0)
+    lifetime_days    = Column(Integer, default=0)
+    weekday_views    = Column(Text)                   # JSON [7] sums, Monday first
+    weekday_days     = Column(Text)                   # JSON [7] counts
+    monthly_views    = Column(Text)                   # JSON {"YYYY-MM": total}
+    updated_at       = Column(DateTime, nullable=True)
+
+class IngestWatermark(Base):
+    __tablename__ = "ingest_watermarks"
+    id          = Column(Integer, primary_key=True, index=True)
+    channel_id  = Column(String, unique=True, index=True, nullable=False)
+    last_date   = Column(Date, nullable=False)
+    updated_at  = Column(DateTime, nullable=True)
+
+class CacheEntry(Base):
+    __tablename__ = "cache_entries"
+    key         = Column(String, primary_key=True)
+    value       = Column(Text, nullable=False)
+    expires_at  = Column(DateTime, index=True, nullable=False)
+    accessed_at = Column(DateTime, nullable=False)
+
+class ApiQuotaUsage(Base):
+    """Quota units spent per API per quota day, shared by every worker."""
+    __tablename__ = "api_quota_usage"
+    id    = Column(Integer, primary_key=True, index=True)
+    day   = Column(Date, nullable=False)
+    api   = Column(String, nullable=False)
+    units = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("day", "api", name="_quota_day_api_uc"),
+    )
+
+class AnalysisJob(Base):
+    """Queued /api/analyze work (see app/jobqueue.py)."""
+    __tablename__ = "analysis_jobs"
+    id          = Column(String, primary_key=True)           # uuid4 hex
+    query       = Column(String, nullable=False)
+    days        = Column(Integer, nullable=False)
+    # normalised query + window while queued/running, NULL once finished, so
+    # the unique constraint lets at most one live job exist per analysis
+    active_key  = Column(String, unique=True, nullable=True)
+    status      = Column(String, index=True, nullable=False)  # queued | running | done | error
+    attempts    = Column(Integer, nullable=False, default=0)
+    worker      = Column(String, nullable=True)
+    result      = Column(Text, nullable=True)                 # JSON report
+    error       = Column(Text, nullable=True)
+    created_at  = Column(DateTime, index=True, nullable=False)
+    started_at  = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
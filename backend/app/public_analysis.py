@@ -1,39 +1,168 @@
-import os, json
-from dotenv import load_dotenv
-from openai import OpenAI
+import os, re, json, math, asyncio, hashlib
+from typing import AsyncIterator, Dict, Optional, Tuple
 from .youtube_public import resolve_channel_id, fetch_public_metrics
+from .youtube_async import resolve_channel_id_async, fetch_public_metrics_async, get_http_client
 from .financial_analysis import FinancialAnalyzer
+from .cache import MemoryCache, make_cache
+from .config import OPENAI_API_KEY
+from .singleflight import AsyncSingleFlight, SingleFlight
+from .metrics import openai_requests, openai_seconds, track
+from .timing import stage_timer
+from .db import SessionLocal
+from .models import ChannelCredentials
+from sqlalchemy.exc import SQLAlchemyError
 
-load_dotenv(".env")
+# OpenAI clients are created on first use: importing the SDK alone costs
+# most of a cold start, and many requests never reach the AI stage.
+openai_api_key = OPENAI_API_KEY
+_client = None
+_async_client = None
 
-# Check if OpenAI API key is available
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if openai_api_key:
-    client = OpenAI(api_key=openai_api_key)
-else:
-    client = None
+def get_client():
+    """Sync OpenAI client, or None if no API key is configured."""
+    global _client
+    if _client is None and openai_api_key:
+        from openai import OpenAI
+        _client = OpenAI(api_key=openai_api_key)
+    return _client
+
+def get_async_client():
+    """AsyncOpenAI sharing the process-wide httpx connection pool."""
+    global _async_client
+    if _async_client is None:
+        from openai import AsyncOpenAI
+        _async_client = AsyncOpenAI(api_key=openai_api_key, http_client=get_http_client())
+    return _async_client
 
 DEFAULT_RPM = 5.0  # USD revenue per 1k views (tuneable)
 
+# Monte Carlo scenarios + default probability instead of the fixed RPM factors
+REVENUE_SIMULATION = os.getenv("REVENUE_SIMULATION", "0").lower() in ("1", "true", "yes")
+SIMULATION_PATHS   = int(os.getenv("SIMULATION_PATHS", "5000"))
+SIMULATION_SEED    = int(os.getenv("SIMULATION_SEED", "0"))
+
+# Finished reports keyed by resolved channel id + window
+report_cache = make_cache(
+    "report",
+    backend=os.getenv("REPORT_CACHE_BACKEND", "memory"),
+    maxsize=int(os.getenv("REPORT_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("REPORT_CACHE_TTL", "900")),
+)
+
+# AI insights keyed by a hash of the prompt with its numbers bucketed, shared by
+# every channel and window whose numbers round to the same prompt
+INSIGHT_MODEL    = os.getenv("INSIGHT_MODEL", "gpt-4o-mini")
+INSIGHT_SIG_FIGS = int(os.getenv("INSIGHT_SIG_FIGS", "2"))
+insight_cache = make_cache(
+    "insight",
+    backend=os.getenv("INSIGHT_CACHE_BACKEND", "memory"),
+    maxsize=int(os.getenv("INSIGHT_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("INSIGHT_CACHE_TTL", str(7 * 86400))),
+)
+
 def estimate_revenue(views: int, rpm: float = DEFAULT_RPM) -> float:
     return (views / 1000.0) * rpm
 
 def get_channel_report(query: str, days: int = 30):
+    timings = {}
     try:
-        cid      = resolve_channel_id(query)
-        metrics  = fetch_public_metrics(cid, days)
-        est_rev  = estimate_revenue(metrics[f"views_last_{days}d"])
-        
-        # Update metrics with estimated revenue
-        metrics['estimated_revenue_usd'] = est_rev
-        
-        # Perform comprehensive financial analysis
-        analyzer = FinancialAnalyzer()
-        financial_report = analyzer.generate_financial_report(metrics)
-        
-        # Enhanced AI prompt with financial analysis
-        if client:
-            prompt = f"""
+        with stage_timer(timings, "resolve"):
+            cid = resolve_channel_id(query)
+    except Exception as e:
+        return _error_report(e)
+
+    key = f"{cid}:{days}"
+    report = report_cache.get(key)
+    if report is not None:
+        # copy so the cached report never carries one request's timings
+        return dict(report, cached=True, timings_ms=timings)
+    # concurrent requests for one channel wait on a single build
+    return _with_build_timings(_report_flight.do(key, _build_and_cache, key, cid, days, timings), timings)
+
+_report_flight = SingleFlight("report")
+
+def _build_and_cache(key: str, cid: str, days: int, timings: Dict[str, float]):
+    report = build_channel_report(cid, days, timings)
+    if "error" not in report:
+        report_cache.set(key, report)
+    return report, timings
+
+def _with_build_timings(built, timings: Dict[str, float], **extra):
+    """
+    The response for a single-flight build: (report, the leader's timings).
+    Requests that joined another's build report its stages, their own
+    resolve time, and coalesced=True.
+    """
+    report, build_timings = built
+    if build_timings is not timings:
+        timings.update({k: v for k, v in build_timings.items() if k not in timings})
+        extra["coalesced"] = True
+    return dict(report, cached=False, timings_ms=timings, **extra)
+
+def _error_report(e: Exception):
+    return {
+        "error": f"Failed to analyze channel: {str(e)}",
+        "message": "Please check the channel URL and try again. If the issue persists, the API keys may not be configured."
+    }
+
+def _channel_features(cid: str | None):
+    """
+    Materialized time-series features for connected channels (None otherwise).
+    Public channels stop at the credentials lookup, so the API path never
+    imports .features (and numpy, which the serverless deploy does not ship).
+    """
+    if not cid:
+        return None
+    db = SessionLocal()
+    try:
+        connected = (db.query(ChannelCredentials.channel_id)
+                       .filter(ChannelCredentials.channel_id == cid).first())
+        if connected is None:
+            return None
+        from .features import get_features
+        return get_features(db, cid)
+    except (SQLAlchemyError, ImportError):
+        return None
+    finally:
+        db.close()
+
+async def _channel_features_async(cid: str | None):
+    return await asyncio.to_thread(_channel_features, cid) if cid else None
+
+def _analyze(metrics: Dict, days: int, features: Dict | None = None):
+    """
+    Adds estimated revenue to metrics and runs the financial analysis.
+    features: the channel's _channel_features(), loaded by the caller so async
+    paths can read them off the event loop.
+    """
+    window_views = metrics[f"views_last_{days}d"]
+    est_rev = estimate_revenue(window_views)
+
+    # Update metrics with estimated revenue
+    metrics['estimated_revenue_usd'] = est_rev
+
+    # FinancialAnalyzer works in monthly terms, so other windows are scaled to 30 days
+    monthly = metrics
+    if days != 30:
+        monthly = dict(metrics, views_last_30d=round(window_views * 30 / days),
+                       estimated_revenue_usd=est_rev * 30 / days)
+
+    # Perform comprehensive financial analysis
+    analyzer = FinancialAnalyzer()
+    if REVENUE_SIMULATION:
+        financial_report = analyzer.generate_financial_report(
+            monthly, simulate=True, monthly_views=features and features["monthly_views"],
+            n_paths=SIMULATION_PATHS, seed=SIMULATION_SEED,
+        )
+    else:
+        financial_report = analyzer.generate_financial_report(monthly)
+    if features:
+        financial_report["time_series_features"] = features
+    return est_rev, financial_report
+
+def _insight_prompt(metrics: Dict, financial_report: Dict) -> str:
+    # Enhanced AI prompt with financial analysis
+    return f"""
 You are a senior creator-economy analyst and financial advisor.
 
 Channel metrics: {json.dumps(metrics, indent=2)}
@@ -58,16 +187,10 @@ opportunities (array of 3 short bullets including financial strategies),
 risk_factors (array of 2-3 key risk considerations),
 financial_recommendations (array of 2-3 specific financial actions).
 """
-            
-            res = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-            )
-            ai_response = res.choices[0].message.content
-        else:
-            # Fallback AI response when OpenAI is not available
-            ai_response = f"""```json
+
+def _fallback_insight(metrics: Dict, est_rev: float, financial_report: Dict) -> str:
+    # Fallback AI response when OpenAI is not available
+    return f"""```json
 {{
   "summary": "Channel analysis completed successfully. The channel has {metrics['subscriber_count']:,} subscribers and {metrics['total_views']:,} total views, with an estimated revenue of ${est_rev:,.0f}. Financial analysis shows a risk score of {financial_report['sensitivity_analysis']['risk_score']:.2f} with recommended advance of ${financial_report['loan_recommendation']['recommended_advance']:,.0f}.",
   "opportunities": [
@@ -85,16 +208,303 @@ financial_recommendations (array of 2-3 specific financial actions).
   ]
 }}
 ```"""
-        
-        return {
-            "channel_id": cid,
-            "metrics": metrics,
-            "estimated_revenue_usd": est_rev,
-            "financial_analysis": financial_report,
-            "ai": ai_response,
-        }
+
+def _completion_args(prompt: str) -> Dict:
+    return {
+        "model": INSIGHT_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.3,
+        "response_format": {"type": "json_object"},
+    }
+
+# ---------- insight cache ----------
+def _bucket(value, sig_figs: int = INSIGHT_SIG_FIGS):
+    """Rounds every number in a nested structure to sig_figs significant figures."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        if not value or not math.isfinite(value):
+            return value
+        digits = sig_figs - int(math.floor(math.log10(abs(value)))) - 1
+        rounded = round(value, digits)
+        return int(rounded) if isinstance(value, int) or digits <= 0 else rounded
+    if isinstance(value, dict):
+        return {k: _bucket(v, sig_figs) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_bucket(v, sig_figs) for v in value]
+    return value
+
+def _insight_request(metrics: Dict, financial_report: Dict):
+    """
+    (cache key, completion args). Only the key is built from bucketed inputs;
+    the model is always sent the channel's real figures.
+    """
+    bucketed = _completion_args(_insight_prompt(_bucket(metrics), _bucket(financial_report)))
+    key = hashlib.sha256(json.dumps(bucketed, sort_keys=True).encode()).hexdigest()
+    return key, _completion_args(_insight_prompt(metrics, financial_report))
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+def parse_insight(text: Optional[str]) -> Optional[Dict]:
+    """The model's JSON payload as a dict (markdown fences tolerated), or None."""
+    if not text:
+        return None
+    body = _FENCE.sub("", text)
+    try:
+        return json.loads(body)
+    except ValueError:
+        start, end = body.find("{"), body.rfind("}")
+        if start == -1 or end <= start:
+            return None
+        try:
+            return json.loads(body[start:end + 1])
+        except ValueError:
+            return None
+
+def _remember_insight(key: str, text: str):
+    if parse_insight(text) is not None:  # never pin malformed output
+        insight_cache.set(key, text)
+
+def _insight_sync(metrics: Dict, est_rev: float, financial_report: Dict) -> str:
+    if not get_client():
+        return _fallback_insight(metrics, est_rev, financial_report)
+    key, args = _insight_request(metrics, financial_report)
+    text = insight_cache.get(key)
+    if text is None:
+        text = _insight_flight.do(key, _complete_sync, key, args)
+    return text
+
+_insight_flight = SingleFlight("insight")
+
+def _complete_sync(key: str, args: Dict) -> str:
+    with track(openai_seconds, openai_requests, mode="sync"):
+        res = get_client().chat.completions.create(**args)
+    text = res.choices[0].message.content
+    _remember_insight(key, text)
+    return text
+
+def _report(cid: str, metrics: Dict, est_rev: float, financial_report: Dict, ai_response: str):
+    return {
+        "channel_id": cid,
+        "metrics": metrics,
+        "estimated_revenue_usd": est_rev,
+        "financial_analysis": financial_report,
+        "ai": ai_response,
+        "insight": parse_insight(ai_response),
+    }
+
+def build_channel_report(cid: str, days: int = 30, timings: Dict[str, float] | None = None):
+    timings = {} if timings is None else timings
+    try:
+        with stage_timer(timings, "youtube"):
+            metrics = fetch_public_metrics(cid, days, timings)
+        with stage_timer(timings, "financial_analysis"):
+            est_rev, financial_report = _analyze(metrics, days, _channel_features(cid))
+
+        with stage_timer(timings, "ai"):
+            ai_response = _insight_sync(metrics, est_rev, financial_report)
+
+        return _report(cid, metrics, est_rev, financial_report, ai_response)
+    except Exception as e:
+        return _error_report(e)
+
+# ---------- async path ----------
+# In-flight deferred AI sections, keyed like report_cache: (task, report without
+# the AI section). Finished sections land in report_cache as a full report;
+# failures are kept briefly for pollers.
+_insight_tasks: Dict[str, Tuple[asyncio.Task, Dict]] = {}
+_insight_errors = MemoryCache("insight_error", maxsize=256, ttl=300)
+
+async def _cache_get(key: str):
+    if report_cache.backend == "memory":
+        return report_cache.get(key)
+    return await asyncio.to_thread(report_cache.get, key)
+
+async def _cache_set(key: str, report: Dict):
+    if report_cache.backend == "memory":
+        report_cache.set(key, report)
+    else:
+        await asyncio.to_thread(report_cache.set, key, report)
+
+async def _insight_cache_get(key: str):
+    if insight_cache.backend == "memory":
+        return insight_cache.get(key)
+    return await asyncio.to_thread(insight_cache.get, key)
+
+async def _insight_cache_set(key: str, text: str):
+    if insight_cache.backend == "memory":
+        _remember_insight(key, text)
+    else:
+        await asyncio.to_thread(_remember_insight, key, text)
+
+async def _insight_async(metrics: Dict, est_rev: float, financial_report: Dict) -> str:
+    if not openai_api_key:
+        return _fallback_insight(metrics, est_rev, financial_report)
+    key, args = _insight_request(metrics, financial_report)
+    text = await _insight_cache_get(key)
+    if text is None:
+        text = await _insight_flight_async.do(key, _complete_async, key, args)
+    return text
+
+_insight_flight_async = AsyncSingleFlight("insight_async")
+
+async def _complete_async(key: str, args: Dict) -> str:
+    with track(openai_seconds, openai_requests, mode="async"):
+        res = await get_async_client().chat.completions.create(**args)
+    text = res.choices[0].message.content
+    await _insight_cache_set(key, text)
+    return text
+
+async def _insight_stream(metrics: Dict, est_rev: float, financial_report: Dict) -> AsyncIterator[str]:
+    """Yields the insight text as it is generated (all at once when cached)."""
+    if not openai_api_key:
+        yield _fallback_insight(metrics, est_rev, financial_report)
+        return
+    key, args = _insight_request(metrics, financial_report)
+    text = await _insight_cache_get(key)
+    if text is not None:
+        yield text
+        return
+    parts = []
+    with track(openai_seconds, openai_requests, mode="stream"):
+        stream = await get_async_client().chat.completions.create(**args, stream=True)
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+    await _insight_cache_set(key, "".join(parts))
+
+def _start_insight(key: str, report: Dict, metrics: Dict, est_rev: float, financial_report: Dict):
+    if key in _insight_tasks:
+        return
+
+    async def run():
+        try:
+            ai_response = await _insight_async(metrics, est_rev, financial_report)
+            await _cache_set(key, _report(report["channel_id"], metrics, est_rev, financial_report, ai_response))
+        except Exception as e:
+            _insight_errors.set(key, str(e))
+        finally:
+            _insight_tasks.pop(key, None)
+
+    _insight_tasks[key] = (asyncio.create_task(run()), report)
+
+async def get_channel_report_async(query: str, days: int = 30, defer_ai: bool = False):
+    """
+    Same result as get_channel_report, without blocking the event loop.
+    With defer_ai the metrics and financial analysis are returned as soon as
+    they are ready (ai=None, ai_status="pending"); poll get_insight_async for the rest.
+    The AI section runs as a task in this process, so defer_ai needs a
+    long-lived server; serverless clients use stream_channel_report instead.
+    """
+    timings = {}
+    try:
+        with stage_timer(timings, "resolve"):
+            cid = await resolve_channel_id_async(query)
+    except Exception as e:
+        return _error_report(e)
+
+    key = f"{cid}:{days}"
+    report = await _cache_get(key)
+    if report is not None:
+        return dict(report, cached=True, timings_ms=timings)
+
+    if not defer_ai:
+        # concurrent requests for one channel wait on a single build
+        built = await _report_flight_async.do(key, _build_report_async, key, cid, days, timings)
+        if "error" in built[0]:
+            return built[0]
+        return _with_build_timings(built, timings)
+
+    pending = _insight_tasks.get(key)
+    if pending is not None:
+        # an earlier deferred request is still generating this AI section
+        return dict(pending[1], ai_status="pending", cached=True, timings_ms=timings)
+    built = await _report_flight_async.do(("deferred", key), _build_deferred_async, key, cid, days, timings)
+    if "error" in built[0]:
+        return built[0]
+    return _with_build_timings(built, timings, ai_status="pending")
+
+_report_flight_async = AsyncSingleFlight("report_async")
+
+async def _build_deferred_async(key: str, cid: str, days: int, timings: Dict[str, float]):
+    """Metrics and financial analysis now; the AI section in a background task."""
+    try:
+        with stage_timer(timings, "youtube"):
+            metrics = await fetch_public_metrics_async(cid, days, timings)
+        with stage_timer(timings, "financial_analysis"):
+            est_rev, financial_report = _analyze(metrics, days, await _channel_features_async(cid))
+    except Exception as e:
+        return _error_report(e), timings
+    report = _report(cid, metrics, est_rev, financial_report, None)
+    _start_insight(key, report, metrics, est_rev, financial_report)
+    return report, timings
+
+async def _build_report_async(key: str, cid: str, days: int, timings: Dict[str, float]):
+    try:
+        with stage_timer(timings, "youtube"):
+            metrics = await fetch_public_metrics_async(cid, days, timings)
+        with stage_timer(timings, "financial_analysis"):
+            est_rev, financial_report = _analyze(metrics, days, await _channel_features_async(cid))
+        with stage_timer(timings, "ai"):
+            ai_response = await _insight_async(metrics, est_rev, financial_report)
+    except Exception as e:
+        return _error_report(e), timings
+
+    report = _report(cid, metrics, est_rev, financial_report, ai_response)
+    await _cache_set(key, report)
+    return report, timings
+
+async def get_insight_async(channel_id: str, days: int = 30) -> Dict:
+    """Status of a deferred AI section: pending, ready (with ai), error or unknown."""
+    key = f"{channel_id}:{days}"
+    if key in _insight_tasks:
+        return {"status": "pending"}
+    report = await _cache_get(key)
+    if report is not None:
+        return {"status": "ready", "ai": report["ai"], "insight": parse_insight(report["ai"])}
+    error = _insight_errors.get(key)
+    if error:
+        return {"status": "error", "error": error}
+    return {"status": "unknown"}
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_channel_report(query: str, days: int = 30) -> AsyncIterator[str]:
+    """
+    Server-sent events for one analysis: `report` (everything but the AI
+    section), then `token` events as the insight is generated, then `insight`
+    with the parsed JSON and `done`. Failures end the stream with `error`.
+    """
+    timings = {}
+    try:
+        with stage_timer(timings, "resolve"):
+            cid = await resolve_channel_id_async(query)
+        key = f"{cid}:{days}"
+        report = await _cache_get(key)
+        if report is not None:
+            yield _sse("report", dict(report, ai=None, insight=None, cached=True, timings_ms=timings))
+            yield _sse("insight", {"ai": report["ai"], "insight": report.get("insight") or parse_insight(report["ai"])})
+            yield _sse("done", {})
+            return
+
+        with stage_timer(timings, "youtube"):
+            metrics = await fetch_public_metrics_async(cid, days, timings)
+        with stage_timer(timings, "financial_analysis"):
+            est_rev, financial_report = _analyze(metrics, days, await _channel_features_async(cid))
+        yield _sse("report", dict(_report(cid, metrics, est_rev, financial_report, None),
+                                  cached=False, timings_ms=timings))
+
+        parts = []
+        async for delta in _insight_stream(metrics, est_rev, financial_report):
+            parts.append(delta)
+            yield _sse("token", {"delta": delta})
+        ai_response = "".join(parts)
+        report = _report(cid, metrics, est_rev, financial_report, ai_response)
+        await _cache_set(key, report)
+        yield _sse("insight", {"ai": ai_response, "insight": report["insight"]})
+        yield _sse("done", {})
     except Exception as e:
-        return {
-            "error": f"Failed to analyze channel: {str(e)}",
-            "message": "Please check the channel URL and try again. If the issue persists, the API keys may not be configured."
-        } 
\ No newline at end of file
+        yield _sse("error", _error_report(e))
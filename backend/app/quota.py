@@ -0,0 +1,278 @@
+"""
+Rate-limit and quota-aware execution of YouTube API calls.
+
+Every call goes through execute() (googleapiclient requests) or
+execute_async() (httpx coroutines), which
+  * waits on a token bucket holding this process's share of the rate limit,
+  * charges the method's quota cost (search=100, list=1) against the daily
+    budget (YOUTUBE_DAILY_QUOTA), refusing with QuotaExceeded once it is spent,
+  * retries 429 / 5xx / rateLimitExceeded with jittered exponential backoff.
+
+Daily usage is shared across workers through the api_quota_usage table. Local
+spend is flushed every QUOTA_FLUSH_UNITS units or QUOTA_FLUSH_SECONDS (off the
+event loop for async calls), so workers can overshoot the budget by at most one
+flush each. If the database is unavailable the tracker keeps counting
+in-process and retries the flush with backoff. YouTube quota days reset at
+midnight Pacific time.
+
+The rate limit is not shared at run time. YOUTUBE_MAX_QPS and YOUTUBE_BURST
+are deployment-wide figures, and each process's bucket gets 1/YOUTUBE_PROCESSES
+of them. YOUTUBE_PROCESSES should count every process that calls the API: web
+workers (it defaults to WEB_CONCURRENCY) plus job queue, batch and ingest
+processes. Threads within a process (JOB_WORKERS, ingest pools) share its bucket.
+"""
+import asyncio
+import datetime as _dt
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict
+from zoneinfo import ZoneInfo
+from sqlalchemy.exc import SQLAlchemyError
+from . import metrics
+from .db import SessionLocal
+from .models import ApiQuotaUsage
+
+QUOTA_COSTS = {
+    "search.list": 100,
+}
+DEFAULT_COST = 1  # every *.list call; see the YouTube Data API quota calculator
+
+DAILY_QUOTA         = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+MAX_QPS             = float(os.getenv("YOUTUBE_MAX_QPS", "20"))  # across all processes
+BURST               = int(os.getenv("YOUTUBE_BURST", "40"))
+PROCESSES           = max(1, int(os.getenv("YOUTUBE_PROCESSES", os.getenv("WEB_CONCURRENCY", "1"))))
+MAX_RETRIES         = int(os.getenv("YOUTUBE_MAX_RETRIES", "4"))
+BACKOFF_BASE        = float(os.getenv("YOUTUBE_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX         = float(os.getenv("YOUTUBE_BACKOFF_MAX", "16"))
+QUOTA_BACKEND       = os.getenv("QUOTA_BACKEND", "sql")
+QUOTA_FLUSH_UNITS   = int(os.getenv("QUOTA_FLUSH_UNITS", "50"))
+QUOTA_FLUSH_SECONDS = float(os.getenv("QUOTA_FLUSH_SECONDS", "5"))
+QUOTA_RETRY_MAX     = float(os.getenv("QUOTA_FLUSH_RETRY_MAX", "300"))  # seconds between failed flushes
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_REASONS  = {"rateLimitExceeded", "userRateLimitExceeded", "backendError"}
+QUOTA_REASONS  = {"quotaExceeded", "dailyLimitExceeded"}
+
+try:
+    _PACIFIC = ZoneInfo("America/Los_Angeles")
+except Exception:
+    _PACIFIC = _dt.timezone(_dt.timedelta(hours=-8))
+
+class QuotaExceeded(Exception):
+    """The daily YouTube Data API quota is spent (locally or according to Google)."""
+
+def quota_day() -> _dt.date:
+    return _dt.datetime.now(_PACIFIC).date()
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate     = rate
+        self.capacity = capacity
+        self._tokens  = float(capacity)
+        self._updated = time.monotonic()
+        self._lock    = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes one token and returns how long the caller must wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+class QuotaTracker:
+    def __init__(self, daily_limit: int = DAILY_QUOTA, backend: str = QUOTA_BACKEND,
+                 session_factory=SessionLocal):
+        self.daily_limit = daily_limit
+        self.counters    = Counter()  # requests/retries/errors by method
+        self._session    = session_factory if backend == "sql" else None
+        self._lock       = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flush at a time, so pending is added once
+        self._day        = quota_day()
+        self._shared     = 0   # units spent by all workers as of the last flush
+        self._pending    = 0   # units spent here since the last flush
+        self._flushed_at = time.monotonic()
+        self._failures   = 0   # consecutive failed flushes
+        self._retry_at   = 0.0
+        self._table_ready = False
+
+    def _roll_day(self):
+        today = quota_day()
+        if today != self._day:
+            self._day, self._shared, self._pending = today, 0, 0
+
+    def used(self) -> int:
+        with self._lock:
+            self._roll_day()
+            return self._shared + self._pending
+
+    def remaining(self) -> int:
+        return max(0, self.daily_limit - self.used())
+
+    def charge(self, method: str, api: str = "youtube") -> bool:
+        """
+        Reserves the method's quota cost or raises QuotaExceeded. Returns True
+        when the caller should flush() (in a thread if it is on an event loop).
+        """
+        if api != "youtube":  # e.g. youtubeAnalytics has its own, separate quota
+            self.counters[f"{method}.requests"] += 1
+            return False
+        cost = QUOTA_COSTS.get(method, DEFAULT_COST)
+        with self._lock:
+            self._roll_day()
+            if self._shared + self._pending + cost > self.daily_limit:
+                self.counters[f"{method}.refused"] += 1
+                raise QuotaExceeded(f"YouTube daily quota exhausted ({self.daily_limit} units); "
+                                    f"{method} needs {cost}")
+            self._pending += cost
+            self.counters[f"{method}.requests"] += 1
+            self.counters["units"] += cost
+            return self._flush_due()
+
+    def _flush_due(self) -> bool:
+        now = time.monotonic()
+        return (self._session is not None and now >= self._retry_at
+                and (self._pending >= QUOTA_FLUSH_UNITS or now - self._flushed_at >= QUOTA_FLUSH_SECONDS))
+
+    def exhaust(self):
+        """Google says the quota is gone: stop spending until the next quota day."""
+        with self._lock:
+            self._roll_day()
+            self._pending = max(self._pending, self.daily_limit - self._shared)
+        self.flush()
+
+    def flush(self):
+        if self._session is None or not self._flush_lock.acquire(blocking=False):
+            return  # units charged meanwhile stay pending for the next flush
+        try:
+            self._flush()
+        finally:
+            self._flush_lock.release()
+
+    def _flush(self):
+        with self._lock:
+            pending, day = self._pending, self._day
+            self._flushed_at = time.monotonic()
+        db = self._session()
+        try:
+            if not self._table_ready:
+                ApiQuotaUsage.__table__.create(bind=db.get_bind(), checkfirst=True)
+                self._table_ready = True
+            updated = (
+                db.query(ApiQuotaUsage).filter_by(day=day, api="youtube")
+                  .update({ApiQuotaUsage.units: ApiQuotaUsage.units + pending})
+            )
+            if not updated:
+                db.add(ApiQuotaUsage(day=day, api="youtube", units=pending))
+            db.commit()
+            shared = db.query(ApiQuotaUsage.units).filter_by(day=day, api="youtube").scalar() or 0
+            with self._lock:
+                self._failures, self._retry_at = 0, 0.0
+                if self._day == day:
+                    self._pending -= pending
+                    self._shared = shared
+        except SQLAlchemyError:
+            # e.g. database briefly unavailable or read-only: keep counting
+            # locally and retry later, backing off up to QUOTA_RETRY_MAX
+            db.rollback()
+            with self._lock:
+                self._failures += 1
+                self._retry_at = time.monotonic() + min(QUOTA_RETRY_MAX, QUOTA_FLUSH_SECONDS * 2 ** self._failures)
+            self.counters["flush_errors"] += 1
+        finally:
+            db.close()
+
+    def stats(self) -> Dict:
+        return {
+            "quota_day": self._day.isoformat(),
+            "daily_limit": self.daily_limit,
+            "used": self.used(),
+            "remaining": self.remaining(),
+            "shared": self._session is not None and not self._failures,
+            "counters": dict(self.counters),
+        }
+
+bucket  = TokenBucket(MAX_QPS / PROCESSES, max(1, BURST // PROCESSES))
+tracker = QuotaTracker()
+
+def _error_info(status: int, body) -> tuple:
+    """(status, reason) from a Google API error response body."""
+    try:
+        payload = json.loads(body) if isinstance(body, (bytes, str)) else body
+        errors  = payload["error"].get("errors") or []
+        reason  = errors[0].get("reason") if errors else payload["error"].get("status")
+    except Exception:
+        reason = None
+    return status, reason
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def _should_retry(method: str, status: int, reason, attempt: int, api: str = "youtube") -> bool:
+    if reason in QUOTA_REASONS:
+        if api == "youtube":  # other APIs' quotas don't spend the Data API budget
+            tracker.exhaust()
+        tracker.counters[f"{method}.quota_exceeded"] += 1
+        raise QuotaExceeded(f"{api} API refused {method}: {reason}")
+    retry = status in RETRY_STATUSES or reason in RETRY_REASONS
+    tracker.counters[f"{method}.{'retries' if retry and attempt < MAX_RETRIES else 'errors'}"] += 1
+    return retry and attempt < MAX_RETRIES
+
+def execute(request, method: str, api: str = "youtube"):
+    """Runs a googleapiclient request with rate limiting, quota accounting and retries."""
+    from googleapiclient.errors import HttpError
+
+    with metrics.track(metrics.api_seconds, metrics.api_requests, api=api, method=method):
+        for attempt in range(MAX_RETRIES + 1):
+            bucket.acquire()
+            if tracker.charge(method, api):
+                tracker.flush()
+            try:
+                return request.execute()
+            except HttpError as e:
+                status, reason = _error_info(e.resp.status, e.content)
+                if not _should_retry(method, status, reason, attempt, api):
+                    raise
+            time.sleep(_backoff(attempt))
+
+async def execute_async(call: Callable[[], Awaitable], method: str, api: str = "youtube"):
+    """
+    Async counterpart of execute(). `call` issues the request and returns an
+    httpx.Response; returns its parsed JSON body.
+    """
+    import httpx
+
+    with metrics.track(metrics.api_seconds, metrics.api_requests, api=api, method=method):
+        for attempt in range(MAX_RETRIES + 1):
+            await bucket.acquire_async()
+            if tracker.charge(method, api):
+                await asyncio.to_thread(tracker.flush)
+            resp = await call()
+            try:
+                resp.raise_for_status()
+                return resp.json()
+            except httpx.HTTPStatusError:
+                status, reason = _error_info(resp.status_code, resp.content)
+                # in a thread: a quota error flushes the exhausted budget to the database
+                if not await asyncio.to_thread(_should_retry, method, status, reason, attempt, api):
+                    raise
+            await asyncio.sleep(_backoff(attempt))
+
+def stats() -> Dict:
+    return dict(tracker.stats(), max_qps=bucket.rate, burst=bucket.capacity, processes=PROCESSES)
@@ -0,0 +1,183 @@
+"""
+Weekly and monthly rollups of channel_daily_stats.
+
+The ingest job calls update_rollups() with the day range it just wrote; only
+the weeks and months overlapping that range are re-summed from the daily rows
+(a few dozen rows on a normal run) and upserted. Range queries go through
+totals() and series(), which read the coarsest rollup that answers the
+request: whole months from channel_monthly_stats, whole weeks at the edges
+from channel_weekly_stats, and only the remaining days from the daily table.
+
+Run `python -m app.rollups` once to build rollups for history ingested before
+the tables existed.
+"""
+import argparse
+import datetime as _dt
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, or_, and_
+from sqlalchemy.orm import Session
+from .bulk import STAT_COLUMNS, upsert_rows
+from .models import ChannelDailyStats, ChannelMonthlyStats, ChannelWeeklyStats
+
+ONE_DAY = _dt.timedelta(days=1)
+
+def week_start(d: _dt.date) -> _dt.date:
+    return d - _dt.timedelta(days=d.weekday())
+
+def month_start(d: _dt.date) -> _dt.date:
+    return d.replace(day=1)
+
+def next_month(d: _dt.date) -> _dt.date:
+    return (d.replace(day=28) + _dt.timedelta(days=4)).replace(day=1)
+
+GRAINS = {
+    # grain: (model, start of the period holding a day)
+    "month": (ChannelMonthlyStats, month_start),
+    "week":  (ChannelWeeklyStats, week_start),
+}
+
+def ensure_schema(bind):
+    """Creates the rollup tables and the covering index on databases that predate them."""
+    ChannelWeeklyStats.__table__.create(bind=bind, checkfirst=True)
+    ChannelMonthlyStats.__table__.create(bind=bind, checkfirst=True)
+    for index in ChannelDailyStats.__table__.indexes:
+        if index.name == "ix_channel_daily_cover":
+            index.create(bind=bind, checkfirst=True)
+
+# ---------- maintenance ----------
+def update_rollups(db: Session, channel_id: str, start: _dt.date, end: _dt.date) -> Dict[str, int]:
+    """Re-sums every week and month overlapping [start, end] (does not commit)."""
+    first = min(week_start(start), month_start(start))
+    last  = max(week_start(end) + _dt.timedelta(days=6), next_month(month_start(end)) - ONE_DAY)
+    daily = (
+        db.query(ChannelDailyStats.date, *[getattr(ChannelDailyStats, c) for c in STAT_COLUMNS])
+          .filter(ChannelDailyStats.channel_id == channel_id,
+                  ChannelDailyStats.date >= first,
+                  ChannelDailyStats.date <= last)
+          .all()
+    )
+    written = {}
+    for grain, (model, period_of) in GRAINS.items():
+        lo, hi = period_of(start), period_of(end)
+        sums: Dict[_dt.date, Dict] = defaultdict(lambda: dict({c: 0 for c in STAT_COLUMNS}, days=0))
+        for row in daily:
+            period = period_of(row[0])
+            if lo <= period <= hi:
+                acc = sums[period]
+                acc["days"] += 1
+                for c, v in zip(STAT_COLUMNS, row[1:]):
+                    acc[c] += v or 0
+        rows = [dict(acc, channel_id=channel_id, period_start=p) for p, acc in sums.items()]
+        upsert_rows(db, model, rows, keys=("channel_id", "period_start"), columns=("days",) + STAT_COLUMNS)
+        written[grain] = len(rows)
+    return written
+
+def rebuild_rollups(db: Session, channel_id: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+    """Builds rollups from all daily rows (for one channel or every channel). Does not commit."""
+    q = db.query(ChannelDailyStats.channel_id, func.min(ChannelDailyStats.date),
+                 func.max(ChannelDailyStats.date)).group_by(ChannelDailyStats.channel_id)
+    if channel_id:
+        q = q.filter(ChannelDailyStats.channel_id == channel_id)
+    return {cid: update_rollups(db, cid, lo, hi) for cid, lo, hi in q.all()}
+
+# ---------- queries ----------
+def plan(start: _dt.date, end: _dt.date) -> Dict[str, List]:
+    """
+    Splits [start, end] into whole months, then whole weeks in the leftover
+    edges, then single-day ranges: {"month": [starts], "week": [starts], "day": [(a, b)]}.
+    """
+    out = {"month": [], "week": [], "day": []}
+
+    def weeks_then_days(a: _dt.date, b: _dt.date):
+        if a > b:
+            return
+        w = a if a.weekday() == 0 else week_start(a) + _dt.timedelta(days=7)
+        if w + _dt.timedelta(days=6) > b:
+            out["day"].append((a, b))
+            return
+        if a < w:
+            out["day"].append((a, w - ONE_DAY))
+        while w + _dt.timedelta(days=6) <= b:
+            out["week"].append(w)
+            w += _dt.timedelta(days=7)
+        if w <= b:
+            out["day"].append((w, b))
+
+    m = start if start.day == 1 else next_month(start)
+    if next_month(m) - ONE_DAY <= end:
+        weeks_then_days(start, m - ONE_DAY)
+        while next_month(m) - ONE_DAY <= end:
+            out["month"].append(m)
+            m = next_month(m)
+        weeks_then_days(m, end)
+    else:
+        weeks_then_days(start, end)
+    return out
+
+def _sum_columns(model):
+    return [func.coalesce(func.sum(getattr(model, c)), 0) for c in STAT_COLUMNS]
+
+def totals(db: Session, channel_id: str, start: _dt.date, end: _dt.date) -> Dict:
+    """Sums of every stat over [start, end], read from the coarsest rollups that fit."""
+    parts = plan(start, end)
+    result = {c: 0 for c in STAT_COLUMNS}
+    result["days"] = 0
+
+    def add(row):
+        for c, v in zip(("days",) + STAT_COLUMNS, row):
+            result[c] += v or 0
+
+    for grain in ("month", "week"):
+        if parts[grain]:
+            model = GRAINS[grain][0]
+            add(db.query(func.coalesce(func.sum(model.days), 0), *_sum_columns(model))
+                  .filter(model.channel_id == channel_id, model.period_start.in_(parts[grain]))
+                  .one())
+    if parts["day"]:
+        add(db.query(func.count(ChannelDailyStats.id), *_sum_columns(ChannelDailyStats))
+              .filter(ChannelDailyStats.channel_id == channel_id,
+                      or_(*[and_(ChannelDailyStats.date >= a, ChannelDailyStats.date <= b)
+                            for a, b in parts["day"]]))
+              .one())
+    result["plan"] = {grain: len(v) for grain, v in parts.items()}
+    return result
+
+def coarsest_grain(start: _dt.date, end: _dt.date) -> str:
+    """The coarsest grain whose period boundaries line up with [start, end]."""
+    if start.day == 1 and (end + ONE_DAY).day == 1:
+        return "month"
+    if start.weekday() == 0 and end.weekday() == 6:
+        return "week"
+    return "day"
+
+def series(db: Session, channel_id: str, start: _dt.date, end: _dt.date,
+           grain: Optional[str] = None) -> Tuple[str, List[Dict]]:
+    """Per-period rows over [start, end]; grain=None picks coarsest_grain()."""
+    grain = grain or coarsest_grain(start, end)
+    if grain == "day":
+        model, period = ChannelDailyStats, ChannelDailyStats.date
+    else:
+        model, period_of = GRAINS[grain]
+        period, start = model.period_start, period_of(start)  # include the period holding start
+    rows = (
+        db.query(period, *[getattr(model, c) for c in STAT_COLUMNS])
+          .filter(model.channel_id == channel_id, period >= start, period <= end)
+          .order_by(period)
+          .all()
+    )
+    return grain, [dict(zip(("period_start",) + STAT_COLUMNS, r)) for r in rows]
+
+if __name__ == "__main__":
+    from .db import SessionLocal, engine
+    parser = argparse.ArgumentParser(description="Rebuild weekly/monthly rollups from channel_daily_stats")
+    parser.add_argument("--channel", help="only this channel id")
+    args = parser.parse_args()
+    ensure_schema(engine)
+    db = SessionLocal()
+    try:
+        built = rebuild_rollups(db, args.channel)
+        db.commit()
+    finally:
+        db.close()
+    print(f"✅  Rebuilt rollups for {len(built)} channels")
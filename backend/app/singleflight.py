@@ -0,0 +1,81 @@
+"""
+Single-flight call coalescing within one process.
+
+When several callers ask for the same key at once, only the first runs the
+function; the rest wait for it and receive the same result (or exception).
+Nothing is cached: once the call finishes the next caller runs it again, so
+this complements the TTL caches rather than replacing them.
+
+SingleFlight is for threads (sync endpoints, batch, job workers);
+AsyncSingleFlight for coroutines on one event loop. Every flight registers
+itself so /health can report how many requests were coalesced.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+_registry: Dict[str, "SingleFlight"] = {}
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done   = threading.Event()
+        self.result = None
+        self.error  = None
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name      = name
+        self.executed  = 0
+        self.coalesced = 0
+        self._calls: Dict[Hashable, Any] = {}
+        self._lock     = threading.Lock()
+        _registry[name] = self
+
+    def _join(self, key: Hashable, new: Callable):
+        """Returns (call, leader)."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = new()
+                self.executed += 1
+                return call, True
+            self.coalesced += 1
+            return call, False
+
+    def _leave(self, key: Hashable):
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        call, leader = self._join(key, _Call)
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._leave(key)
+            call.done.set()
+
+    def stats(self) -> Dict:
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+class AsyncSingleFlight(SingleFlight):
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable], *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        task, leader = self._join((id(loop), key), lambda: loop.create_task(fn(*args, **kwargs)))
+        if leader:
+            task.add_done_callback(lambda _: self._leave((id(loop), key)))
+        # shield: a waiter that gets cancelled must not cancel the shared call
+        return await asyncio.shield(task)
+
+def stats() -> Dict[str, Dict]:
+    return {name: flight.stats() for name, flight in _registry.items()}
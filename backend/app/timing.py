@@ -0,0 +1,21 @@
+"""
+Per-stage wall-clock timings for the report pipeline (reported as timings_ms,
+and recorded in metrics.report_stage_seconds and the Server-Timing header).
+"""
+import time
+from contextlib import contextmanager
+from typing import Dict
+from . import metrics
+
+@contextmanager
+def stage_timer(timings: Dict[str, float], stage: str):
+    """Adds the elapsed milliseconds of the block to timings[stage]."""
+    started = time.perf_counter()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        elapsed = time.perf_counter() - started
+        timings[stage] = round(timings.get(stage, 0.0) + elapsed * 1000, 1)
+        metrics.record_stage(stage, elapsed, failed)
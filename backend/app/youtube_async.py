@@ -0,0 +1,153 @@
+"""
+Non-blocking variants of youtube_public.resolve_channel_id / fetch_public_metrics.
+
+Requests go straight to the YouTube Data API REST endpoints over one shared
+httpx.AsyncClient, so a single worker can keep many analyses in flight while
+reusing pooled keep-alive connections.
+"""
+import asyncio
+import os
+from typing import TYPE_CHECKING, Dict
+from .youtube_public import (
+    API_KEY, MAX_BATCH, UPLOADS_MAX_PAGES, _cached_resolution, _remember, _channel_summary,
+    _window_start, _recent_ids, _view_count, _metrics, uploads_playlist_id,
+)
+from . import etag, quota
+from .singleflight import AsyncSingleFlight
+from .timing import stage_timer
+
+API_BASE        = os.getenv("YOUTUBE_API_BASE_URL", "https://www.googleapis.com/youtube/v3")
+MAX_CONNECTIONS = int(os.getenv("YOUTUBE_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_TIMEOUT    = float(os.getenv("YOUTUBE_HTTP_TIMEOUT", "20"))
+
+if TYPE_CHECKING:
+    import httpx
+
+_client: "httpx.AsyncClient | None" = None
+
+def get_http_client() -> "httpx.AsyncClient":
+    """Shared connection pool for every async upstream call in this process."""
+    global _client
+    if _client is None or _client.is_closed:
+        import httpx  # deferred: only needed once a request is made
+        _client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                max_keepalive_connections=MAX_CONNECTIONS),
+        )
+    return _client
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def _get(resource: str, **params) -> Dict:
+    if not API_KEY:
+        raise EnvironmentError("YouTube API key not configured. Please add YOUTUBE_API_KEY to your environment variables.")
+    return await quota.execute_async(
+        lambda: etag.conditional_get(get_http_client(), f"{API_BASE}/{resource}", {**params, "key": API_KEY}),
+        f"{resource}.list",
+    )
+
+async def _search_channel(q: str) -> str | None:
+    resp = await _get("search", part="snippet", q=q, type="channel", maxResults=1)
+    if resp["items"]:
+        return resp["items"][0]["snippet"]["channelId"]
+    return None
+
+async def resolve_channel_id_async(text: str) -> str:
+    """Accepts URL, @handle, or plain name – returns UC-id."""
+    if not API_KEY:
+        raise EnvironmentError("YouTube API key not configured. Please add YOUTUBE_API_KEY to your environment variables.")
+
+    text = text.strip()
+    key, cid = await asyncio.to_thread(_cached_resolution, text)
+    if cid:
+        return cid
+    return await _resolve_flight.do(key, _search_and_remember, key, text)
+
+_resolve_flight = AsyncSingleFlight("resolve_async")
+
+async def _search_and_remember(key: str, text: str) -> str:
+    cid = None
+    if key.startswith("@"):
+        cid = await _search_channel(key)
+    if not cid:
+        cid = await _search_channel(text)
+    await asyncio.to_thread(_remember, key, cid)
+    if cid:
+        return cid
+    raise ValueError("Could not resolve channel ID.")
+
+_metrics_flight = AsyncSingleFlight("public_metrics_async")
+
+async def fetch_public_metrics_async(channel_id: str, days: int = 30,
+                                     timings: Dict[str, float] | None = None) -> Dict[str, int]:
+    """Returns subs, total views, video count, recent views."""
+    return dict(await _metrics_flight.do((channel_id, days), _fetch_public_metrics_async,
+                                         channel_id, days, timings))
+
+async def _fetch_public_metrics_async(channel_id: str, days: int,
+                                      timings: Dict[str, float] | None) -> Dict[str, int]:
+    timings = {} if timings is None else timings
+
+    async def timed(stage, resource, **params):
+        with stage_timer(timings, stage):
+            return await _get(resource, **params)
+
+    # channels.list and the first uploads page are independent once the uploads
+    # playlist id is derived from the channel id, so both go out together.
+    pl = uploads_playlist_id(channel_id)
+    c, first = await asyncio.gather(
+        timed("channels_list", "channels", id=channel_id, part="statistics,contentDetails"),
+        timed("playlist_items_list", "playlistItems", playlistId=pl, part="contentDetails", maxResults=MAX_BATCH),
+        return_exceptions=True,
+    )
+    if isinstance(c, BaseException):
+        raise c
+    s, real_pl = _channel_summary(c)
+    if real_pl != pl:
+        pl, first = real_pl, None
+    elif isinstance(first, BaseException):
+        raise first
+
+    async def pages():
+        page = first
+        for _ in range(UPLOADS_MAX_PAGES):
+            if page is None:
+                page = await timed("playlist_items_list", "playlistItems", playlistId=pl,
+                                   part="contentDetails", maxResults=MAX_BATCH)
+            yield page.get("items", [])
+            token = page.get("nextPageToken")
+            if not token:
+                return
+            page = await timed("playlist_items_list", "playlistItems", playlistId=pl,
+                               part="contentDetails", maxResults=MAX_BATCH, pageToken=token)
+
+    async def batch_views(ids):
+        v = await timed("videos_list", "videos", id=",".join(ids), part="statistics")
+        return _view_count(v["items"])
+
+    # price each full batch of 50 ids while the next playlist page is fetched
+    cutoff, batch, pricing = _window_start(days), [], []
+    try:
+        async for items in pages():
+            ids, done = _recent_ids(items, cutoff)
+            batch.extend(ids)
+            while len(batch) >= MAX_BATCH:
+                pricing.append(asyncio.create_task(batch_views(batch[:MAX_BATCH])))
+                batch = batch[MAX_BATCH:]
+            if done:
+                break
+        if batch:
+            pricing.append(asyncio.create_task(batch_views(batch)))
+        recent = sum(await asyncio.gather(*pricing))
+    finally:
+        # after a failed page or batch, stop the remaining videos.list calls
+        # rather than leave them spending quota with nobody awaiting them
+        for task in pricing:
+            task.cancel()
+        await asyncio.gather(*pricing, return_exceptions=True)
+    return _metrics(s, recent, days)
@@ -1,72 +1,271 @@
-import os, re, datetime as _dt
-from typing import Dict
-from googleapiclient.discovery import build
-from dotenv import load_dotenv
+import os, re, threading, contextvars, datetime as _dt
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List
+from sqlalchemy.exc import SQLAlchemyError
+from . import clients, quota
+from .etag import ETagHttp
+from .cache import MemoryCache
+from .config import YOUTUBE_API_KEY as API_KEY
+from .db import SessionLocal, engine
+from .models import ChannelResolution
+from .singleflight import SingleFlight
+from .timing import stage_timer
 
-load_dotenv(".env")
-API_KEY = os.getenv("YOUTUBE_API_KEY")
+# YouTube API clients are built on first use so importing this module stays
+# cheap. Set yt to pin one client for every thread (tests use a stand-in).
+yt = None
 
-# Initialize YouTube API client if key is available
-if API_KEY:
-    yt = build("youtube", "v3", developerKey=API_KEY)
-else:
-    yt = None
+def get_youtube():
+    """
+    This thread's public-key client, or None if no API key is configured.
+    googleapiclient services share one httplib2.Http and are not thread-safe,
+    so job workers, batch runs and threadpool endpoints each get their own.
+    """
+    if yt is not None or not API_KEY:
+        return yt
+    return clients.get_service("youtube", "v3", developer_key=API_KEY,
+                               cache_key=f"public:{threading.get_ident()}", wrap=ETagHttp)
 
 def _search_channel(q: str) -> str | None:
+    yt = get_youtube()
     if not yt:
         raise EnvironmentError("YouTube API key not configured. Please add YOUTUBE_API_KEY to your environment variables.")
     
-    resp = yt.search().list(part="snippet", q=q, type="channel", maxResults=1).execute()
+    resp = quota.execute(yt.search().list(part="snippet", q=q, type="channel", maxResults=1), "search.list")
     if resp["items"]:
         return resp["items"][0]["snippet"]["channelId"]
     return None
 
+# ---------- handle/name resolution cache ----------
+# Handle -> UC-id mappings practically never change, but each search costs 100
+# quota units, so answers are kept in channel_resolutions with a memory front.
+RESOLVE_NEGATIVE_TTL = float(os.getenv("RESOLVE_NEGATIVE_TTL", "600"))
+_NOT_FOUND = ""  # cached marker for unresolvable queries
+_resolutions = MemoryCache("resolution", maxsize=int(os.getenv("RESOLVE_CACHE_SIZE", "4096")),
+                           ttl=float(os.getenv("RESOLVE_CACHE_TTL", "86400")))
+_resolution_table_ready = False
+
+def normalize_query(text: str) -> str:
+    """
+    Maps URL/handle/name variants onto one cache key:
+    youtube.com/@X, https://m.youtube.com/@X/videos, @X and @x -> "@x".
+    """
+    text = text.strip()
+    m = re.search(r"@([A-Za-z0-9_\-.]+)", text)
+    if m:
+        return "@" + m.group(1).rstrip(".").lower()
+    text = re.sub(r"^(https?://)?(www\.|m\.)?", "", text, flags=re.I)
+    return "q:" + " ".join(text.lower().split()).rstrip("/")
+
+def _db_lookup(key: str):
+    global _resolution_table_ready
+    db = SessionLocal()
+    try:
+        if not _resolution_table_ready:
+            ChannelResolution.__table__.create(bind=engine, checkfirst=True)
+            _resolution_table_ready = True
+        row = db.query(ChannelResolution).filter_by(query_key=key).first()
+        if row and (row.expires_at is None or row.expires_at > _dt.datetime.utcnow()):
+            return row.channel_id or _NOT_FOUND
+    except SQLAlchemyError:
+        pass  # e.g. read-only filesystem: fall back to the memory cache only
+    finally:
+        db.close()
+    return None
+
+def _db_store(key: str, cid: str | None):
+    now = _dt.datetime.utcnow()
+    db = SessionLocal()
+    try:
+        row = (
+            db.query(ChannelResolution).filter_by(query_key=key).first()
+            or ChannelResolution(query_key=key)
+        )
+        row.channel_id  = cid
+        row.resolved_at = now
+        row.expires_at  = None if cid else now + _dt.timedelta(seconds=RESOLVE_NEGATIVE_TTL)
+        db.add(row)
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+    finally:
+        db.close()
+
+def _remember(key: str, cid: str | None):
+    if cid:
+        _resolutions.set(key, cid)
+    else:
+        _resolutions.set(key, _NOT_FOUND, ttl=RESOLVE_NEGATIVE_TTL)
+    _db_store(key, cid)
+
+def _cached_resolution(text: str):
+    """
+    Returns (key, UC-id) from the URL itself or the resolution cache;
+    UC-id is None when a search is needed. Raises ValueError for cached misses.
+    """
+    text = text.strip()
+    # 1) UC…
+    m = re.search(r"(UC[0-9A-Za-z_-]{22})", text)
+    if m:
+        return None, m.group(1)
+
+    key = normalize_query(text)
+    cid = _resolutions.get(key)
+    if cid is None:
+        cid = _db_lookup(key)
+        if cid is not None:
+            _resolutions.set(key, cid, ttl=None if cid else RESOLVE_NEGATIVE_TTL)
+    if cid == _NOT_FOUND:
+        raise ValueError("Could not resolve channel ID.")
+    return key, cid
+
 def resolve_channel_id(text: str) -> str:
     """Accepts URL, @handle, or plain name – returns UC-id."""
-    if not yt:
+    if not get_youtube():
         raise EnvironmentError("YouTube API key not configured. Please add YOUTUBE_API_KEY to your environment variables.")
     
     text = text.strip()
-    # 1) UC…
-    m = re.search(r"(UC[0-9A-Za-z_-]{22})", text)
-    if m:
-        return m.group(1)
-    # 2) @handle
-    m = re.search(r"@([A-Za-z0-9_\-.]+)", text)
-    if m and (cid := _search_channel(f"@{m.group(1)}")):
+    key, cid = _cached_resolution(text)
+    if cid:
         return cid
+    # concurrent misses for the same handle/name share one search
+    return _resolve_flight.do(key, _search_and_remember, key, text)
+
+_resolve_flight = SingleFlight("resolve")
+
+def _search_and_remember(key: str, text: str) -> str:
+    cid = None
+    # 2) @handle
+    if key.startswith("@"):
+        cid = _search_channel(key)
     # 3) fallback search
-    cid = _search_channel(text)
+    if not cid:
+        cid = _search_channel(text)
+    _remember(key, cid)
     if cid:
         return cid
     raise ValueError("Could not resolve channel ID.")
 
-def fetch_public_metrics(channel_id: str, days: int = 30) -> Dict[str, int]:
-    """Returns subs, total views, video count, recent views."""
-    if not yt:
-        raise EnvironmentError("YouTube API key not configured. Please add YOUTUBE_API_KEY to your environment variables.")
-    
-    c = yt.channels().list(id=channel_id, part="statistics,contentDetails").execute()
-    if not c["items"]:
+def _channel_summary(resp: Dict):
+    """Returns (statistics, uploads playlist id) from a channels.list response."""
+    if not resp.get("items"):
         raise ValueError("Channel not found.")
-    s  = c["items"][0]["statistics"]
-    pl = c["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
-    vids = yt.playlistItems().list(playlistId=pl, part="snippet", maxResults=50).execute()
-    ids  = [v["snippet"]["resourceId"]["videoId"] for v in vids["items"]]
-    cutoff = _dt.datetime.now(_dt.timezone.utc) - _dt.timedelta(days=days)
-    recent = 0
-    if ids:
-        chunks = [ids[i:i+50] for i in range(0, len(ids), 50)]
-        for ch in chunks:
-            v = yt.videos().list(id=",".join(ch), part="statistics,snippet").execute()
-            for it in v["items"]:
-                views = int(it["statistics"].get("viewCount", 0))
-                pub   = _dt.datetime.fromisoformat(it["snippet"]["publishedAt"].replace("Z","+00:00"))
-                if pub >= cutoff.replace(tzinfo=_dt.timezone.utc):
-                    recent += views
+    item = resp["items"][0]
+    return item["statistics"], item["contentDetails"]["relatedPlaylists"]["uploads"]
+
+# ---------- uploads traversal ----------
+# The uploads playlist is newest-first, so paging stops at the first item older
+# than the window. Ids flow through generators and are priced 50 at a time by
+# videos.list, so only one page and one batch are ever held in memory.
+MAX_BATCH         = 50  # videos.list / channels.list id limit
+UPLOADS_MAX_PAGES = int(os.getenv("UPLOADS_MAX_PAGES", "200"))
+
+def _window_start(days: int) -> _dt.datetime:
+    return _dt.datetime.now(_dt.timezone.utc) - _dt.timedelta(days=days)
+
+def _published_at(item: Dict) -> _dt.datetime | None:
+    """videoPublishedAt, or None for private/deleted videos (only contentDetails is requested)."""
+    ts = item.get("contentDetails", {}).get("videoPublishedAt")
+    return _dt.datetime.fromisoformat(ts.replace("Z", "+00:00")) if ts else None
+
+def _recent_ids(items: List[Dict], cutoff: _dt.datetime):
+    """Returns (ids published on/after cutoff, whether the window ended on this page)."""
+    ids = []
+    for it in items:
+        published = _published_at(it)
+        if published is None:
+            continue  # private or deleted: no public views to count
+        if published < cutoff:
+            return ids, True
+        ids.append(it["contentDetails"]["videoId"] if "contentDetails" in it
+                   else it["snippet"]["resourceId"]["videoId"])
+    return ids, False
+
+def _view_count(videos: List[Dict]) -> int:
+    return sum(int(it["statistics"].get("viewCount", 0)) for it in videos)
+
+def batched(iterable: Iterable, n: int = MAX_BATCH) -> Iterator[List]:
+    it = iter(iterable)
+    while batch := list(islice(it, n)):
+        yield batch
+
+def _playlist_page(playlist_id: str, token: str | None, timings: Dict[str, float]) -> Dict:
+    with stage_timer(timings, "playlist_items_list"):
+        return quota.execute(get_youtube().playlistItems().list(
+            playlistId=playlist_id, part="contentDetails", maxResults=MAX_BATCH, pageToken=token,
+        ), "playlistItems.list")
+
+def upload_pages(playlist_id: str, timings: Dict[str, float] | None = None,
+                 first: Dict | None = None) -> Iterator[List[Dict]]:
+    """Yields the uploads playlist one page of items at a time, from `first` if already fetched."""
+    timings = {} if timings is None else timings
+    page = first
+    for _ in range(UPLOADS_MAX_PAGES):
+        if page is None:
+            page = _playlist_page(playlist_id, None, timings)
+        yield page.get("items", [])
+        token = page.get("nextPageToken")
+        if not token:
+            return
+        page = _playlist_page(playlist_id, token, timings)
+
+def recent_upload_ids(pages: Iterable[List[Dict]], cutoff: _dt.datetime) -> Iterator[str]:
+    """Video ids published on/after cutoff; stops pulling pages once the window ends."""
+    for items in pages:
+        ids, done = _recent_ids(items, cutoff)
+        yield from ids
+        if done:
+            return
+
+def _metrics(s: Dict, recent: int, days: int) -> Dict[str, int]:
     return {
         "subscriber_count": int(s.get("subscriberCount", 0)),
         "total_views": int(s.get("viewCount", 0)),
         f"views_last_{days}d": recent,
         "video_count": int(s.get("videoCount", 0)),
-    } 
\ No newline at end of file
+    }
+
+def uploads_playlist_id(channel_id: str) -> str:
+    """A channel's uploads playlist is its UC-id with the UC prefix swapped for UU."""
+    return "UU" + channel_id[2:]
+
+_metrics_flight = SingleFlight("public_metrics")
+# fetches the first uploads page next to channels.list; each pool thread uses
+# its own client (see get_youtube)
+_prefetch = ThreadPoolExecutor(max_workers=int(os.getenv("YOUTUBE_PREFETCH_THREADS", "8")),
+                               thread_name_prefix="youtube-prefetch")
+
+def fetch_public_metrics(channel_id: str, days: int = 30, timings: Dict[str, float] | None = None) -> Dict[str, int]:
+    """Returns subs, total views, video count, recent views."""
+    # concurrent lookups of one channel share a single set of API calls
+    return dict(_metrics_flight.do((channel_id, days), _fetch_public_metrics, channel_id, days, timings))
+
+def _fetch_public_metrics(channel_id: str, days: int, timings: Dict[str, float] | None) -> Dict[str, int]:
+    yt = get_youtube()
+    if not yt:
+        raise EnvironmentError("YouTube API key not configured. Please add YOUTUBE_API_KEY to your environment variables.")
+    timings = {} if timings is None else timings
+    
+    # channels.list and the first uploads page are independent once the uploads
+    # playlist id is derived from the channel id, so both go out together.
+    pl = uploads_playlist_id(channel_id)
+    first = _prefetch.submit(contextvars.copy_context().run, _playlist_page, pl, None, timings)
+    try:
+        with stage_timer(timings, "channels_list"):
+            c = quota.execute(yt.channels().list(id=channel_id, part="statistics,contentDetails"), "channels.list")
+        s, real_pl = _channel_summary(c)
+    except Exception:
+        first.cancel()
+        raise
+    if real_pl != pl:
+        first.cancel()
+        pl, page = real_pl, None
+    else:
+        page = first.result()
+    recent = 0
+    for batch in batched(recent_upload_ids(upload_pages(pl, timings, page), _window_start(days))):
+        with stage_timer(timings, "videos_list"):
+            v = quota.execute(yt.videos().list(id=",".join(batch), part="statistics"), "videos.list")
+        recent += _view_count(v["items"])
+    return _metrics(s, recent, days)
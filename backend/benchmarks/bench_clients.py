@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark: googleapiclient build() per call vs the cached client factory.
+
+Run with:  python backend/benchmarks/bench_clients.py [--calls 50] [--min-speedup 10]
+Measures service construction (build() vs clients.build_service/get_service)
+and request latency over a fresh vs a kept-alive httplib2 connection against a
+local HTTP/1.1 server. Everything is offline. Exits non-zero if the cached
+factory is not at least --min-speedup times faster than build().
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import httplib2
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from app import clients
+
+def _median_ms(fn, calls: int) -> float:
+    timings = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b'{"items": []}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def construction(calls: int) -> dict:
+    creds = Credentials("token", refresh_token="refresh")
+    clients.clear()
+    return {
+        "build_analytics_ms": _median_ms(lambda: build("youtubeAnalytics", "v2", credentials=creds), calls),
+        "build_youtube_ms": _median_ms(lambda: build("youtube", "v3", developerKey="key"), calls),
+        "factory_uncached_analytics_ms": _median_ms(
+            lambda: clients.build_service("youtubeAnalytics", "v2", credentials=creds), calls),
+        "factory_cached_analytics_ms": _median_ms(
+            lambda: clients.get_service("youtubeAnalytics", "v2", credentials=creds, cache_key="bench"), calls),
+    }
+
+def connections(calls: int) -> dict:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/youtube/v3/channels"
+    shared = httplib2.Http()
+    try:
+        return {
+            "fresh_connection_ms": _median_ms(lambda: httplib2.Http().request(url), calls),
+            "keep_alive_ms": _median_ms(lambda: shared.request(url), calls),
+        }
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--min-speedup", type=float, default=10.0)
+    args = parser.parse_args()
+
+    result = {"calls": args.calls, **construction(args.calls), **connections(args.calls)}
+    result["speedup"] = result["build_analytics_ms"] / max(result["factory_cached_analytics_ms"], 1e-6)
+    result["min_speedup"] = args.min_speedup
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["speedup"] >= args.min_speedup else 1)
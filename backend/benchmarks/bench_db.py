@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Benchmark: dashboard read latency while daily_job is writing.
+
+Run with:  python backend/benchmarks/bench_db.py [--channels 8] [--url postgresql://...]
+Seeds connected channels, then runs jobs.daily_job (full backfill against a
+fake Analytics API) in a separate process, as in production, while reader
+threads issue the /api/channels/{id}/stats queries. Reports read latency
+percentiles and failed reads for each mode:
+  legacy  create_engine(url, check_same_thread=False) for both: rollback journal
+  tuned   db.make_engine(url) for writes, db.make_engine(url, read_only=True) for reads
+SQLite runs use a fresh temporary file per mode; --url benchmarks the tuned
+engines against an existing (empty, disposable) database instead. Everything
+else is offline. Exits non-zero if any tuned read failed.
+"""
+import argparse
+import contextlib
+import datetime as _dt
+import io
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import auth, db as dbmod, jobs, rollups
+from app.models import Base, ChannelCredentials
+
+def _fake_refresh(creds):
+    creds.token  = "bench-token"
+    creds.expiry = _dt.datetime.utcnow() + _dt.timedelta(hours=1)
+
+class FakeAnalytics:
+    """Returns one row per requested day and metric, like reports().query(dimensions="day")."""
+    def reports(self):
+        return self
+
+    def query(self, **kw):
+        return SimpleNamespace(execute=lambda: self._execute(kw))
+
+    def _execute(self, kw):
+        metrics = kw["metrics"].split(",")
+        day = _dt.date.fromisoformat(kw["startDate"])
+        end = _dt.date.fromisoformat(kw["endDate"])
+        rows = []
+        while day <= end:
+            rows.append([day.isoformat()] + [random.randint(0, 50_000) for _ in metrics])
+            day += _dt.timedelta(days=1)
+        headers = [{"name": "day"}] + [{"name": m} for m in metrics]
+        return {"columnHeaders": headers, "rows": rows}
+
+def _percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"reads": len(ordered), "p50_ms": statistics.median(ordered),
+            "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": ordered[-1]}
+
+def _dashboard_read(read_factory, channel_ids):
+    """What /api/channels/{id}/stats does for a 90-day window."""
+    end = _dt.date.today()
+    start = end - _dt.timedelta(days=89)
+    db = read_factory()
+    try:
+        cid = random.choice(channel_ids)
+        rollups.series(db, cid, start, end, "day")
+        rollups.totals(db, cid, start, end)
+    finally:
+        db.close()
+
+def _read_until(stop, read_factory, channel_ids, latencies, errors):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            _dashboard_read(read_factory, channel_ids)
+            latencies.append((time.perf_counter() - started) * 1000)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {str(e).splitlines()[0]}")
+        time.sleep(0.005)
+
+def _engines(mode: str, url: str):
+    if mode == "legacy":
+        write_engine = create_engine(url, connect_args={"check_same_thread": False})
+        return write_engine, write_engine
+    return dbmod.make_engine(url), dbmod.make_engine(url, read_only=True)
+
+def _ingest(mode: str, url: str, channels: int, out):
+    """The writer side, in its own process like the real ingest job."""
+    write_engine, _ = _engines(mode, url)
+    jobs.SessionLocal = sessionmaker(bind=write_engine)
+    jobs.get_service  = lambda *a, **kw: FakeAnalytics()
+    auth._refresh     = _fake_refresh
+    with contextlib.redirect_stdout(io.StringIO()):  # daily_job logs every response
+        out.put(jobs.daily_job(full_backfill=True, concurrency=min(4, channels)))
+    write_engine.dispose()
+
+def run(mode: str, url: str, channels: int, readers: int) -> dict:
+    write_engine, read_engine = _engines(mode, url)
+    Base.metadata.create_all(bind=write_engine)
+    rollups.ensure_schema(write_engine)
+    read_factory = sessionmaker(bind=read_engine)
+
+    channel_ids = [f"UCbench{i:017d}" for i in range(channels)]
+    db = sessionmaker(bind=write_engine)()
+    for cid in channel_ids:
+        db.add(ChannelCredentials(channel_id=cid, refresh_token="r", client_id="c",
+                                  client_secret="s", scopes="a b"))
+    db.commit()
+    db.close()
+
+    idle = []
+    for _ in range(50):
+        started = time.perf_counter()
+        _dashboard_read(read_factory, channel_ids)
+        idle.append((time.perf_counter() - started) * 1000)
+    write_engine.dispose()
+    read_engine.dispose()  # don't hand open connections to the forked writer
+
+    ctx = multiprocessing.get_context("fork")
+    out = ctx.Queue()
+    writer = ctx.Process(target=_ingest, args=(mode, url, channels, out))
+    stop, latencies, errors = threading.Event(), [], []
+    threads = [threading.Thread(target=_read_until, args=(stop, read_factory, channel_ids, latencies, errors))
+               for _ in range(readers)]
+    writer.start()
+    for t in threads:
+        t.start()
+    try:
+        summary = out.get()
+        writer.join()
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+        read_engine.dispose()
+
+    return {
+        "mode": mode,
+        "rows_written": summary["rows"],
+        "channels_failed": summary["channels_failed"],
+        "write_seconds": round(summary["wall_seconds"], 2),
+        "idle_read": _percentiles(idle),
+        "read_during_write": _percentiles(latencies),
+        "failed_reads": len(errors),
+        "read_errors": sorted(set(errors))[:3],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--channels", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--url", help="benchmark this database (tuned engines only)")
+    args = parser.parse_args()
+
+    results = []
+    if args.url:
+        results.append(run("tuned", args.url, args.channels, args.readers))
+    else:
+        for mode in ("legacy", "tuned"):
+            with tempfile.TemporaryDirectory() as tmp:
+                url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+                results.append(run(mode, url, args.channels, args.readers))
+    print(json.dumps(results, indent=2))
+    tuned = [r for r in results if r["mode"] == "tuned"]
+    sys.exit(0 if all(r["failed_reads"] == 0 and r["channels_failed"] == 0 for r in tuned) else 1)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark: scalar FinancialAnalyzer loop vs. columnar score_batch.
+
+Run with:  python backend/benchmarks/bench_financial.py [--channels 50000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from app.financial_analysis import FinancialAnalyzer, FinancialMetrics
+
+def make_book(n: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    return {
+        "subscriber_count": rng.integers(0, 50_000_000, n),
+        "total_views": rng.integers(0, 20_000_000_000, n),
+        "video_count": rng.integers(0, 5000, n),
+        "estimated_revenue_usd": rng.lognormal(8, 2.5, n),
+    }
+
+def score_scalar(analyzer: FinancialAnalyzer, book):
+    out = []
+    cols = [book[k].tolist() for k in ("subscriber_count", "total_views", "video_count", "estimated_revenue_usd")]
+    for subs, views, videos, rev in zip(*cols):
+        m = FinancialMetrics(subs, views, 0, videos, rev)
+        sens = analyzer.calculate_sensitivity_analysis(m)
+        out.append(analyzer.generate_loan_recommendation(m, sens))
+    return out
+
+def run(n: int) -> dict:
+    analyzer = FinancialAnalyzer()
+    book = make_book(n)
+
+    started = time.perf_counter()
+    scalar = score_scalar(analyzer, book)
+    scalar_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = analyzer.score_batch(book)
+    batch_s = time.perf_counter() - started
+
+    identical = all(
+        batch["monthly_payment"][i] == rec.monthly_payment
+        and batch["recommended_advance"][i] == rec.recommended_advance
+        for i, rec in enumerate(scalar)
+    )
+    return {
+        "channels": n,
+        "scalar_seconds": scalar_s,
+        "batch_seconds": batch_s,
+        "scalar_channels_per_sec": n / scalar_s,
+        "batch_channels_per_sec": n / batch_s,
+        "speedup": scalar_s / batch_s,
+        "identical": identical,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--channels", type=int, default=50000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.channels), indent=2))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-channel cost of the Monte Carlo revenue simulation.
+
+Run with:  python backend/benchmarks/bench_simulation.py [--paths 5000] [--budget-ms 25]
+Exits non-zero if the median per-channel time exceeds the budget.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from app.financial_analysis import FinancialAnalyzer
+from app.simulation import simulate_revenue
+
+def run(channels: int, paths: int, horizon: int) -> dict:
+    rpm = FinancialAnalyzer().rpm_scenarios
+    rng = np.random.default_rng(1)
+    history = rng.lognormal(10, 0.4, size=730)  # two years of daily views
+
+    results = {}
+    for label, daily in (("no_history", None), ("with_history", history)):
+        timings = []
+        for seed in range(channels):
+            started = time.perf_counter()
+            simulate_revenue(25_000.0, rpm, daily, horizon_months=horizon, n_paths=paths,
+                             monthly_payment=15_000.0, seed=seed)
+            timings.append((time.perf_counter() - started) * 1000)
+        results[label] = {
+            "median_ms": statistics.median(timings),
+            "p99_ms": float(np.percentile(timings, 99)),
+        }
+    return {"channels": channels, "paths": paths, "horizon_months": horizon, **results}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--channels", type=int, default=200)
+    parser.add_argument("--paths", type=int, default=5000)
+    parser.add_argument("--horizon", type=int, default=24)
+    parser.add_argument("--budget-ms", type=float, default=25.0)
+    args = parser.parse_args()
+
+    result = run(args.channels, args.paths, args.horizon)
+    result["budget_ms"] = args.budget_ms
+    print(json.dumps(result, indent=2))
+    worst = max(result["no_history"]["median_ms"], result["with_history"]["median_ms"])
+    sys.exit(1 if worst > args.budget_ms else 0)
@@ -0,0 +1,262 @@
+"""
+Local stand-ins for the YouTube Data API, YouTube Analytics API, Google's
+OAuth token endpoint and OpenAI chat completions, for offline benchmarks.
+
+Responses are deterministic functions of the request (channel statistics,
+uploads and view counts are derived from a hash of the channel or video id),
+so runs are comparable across commits. Latency, error rate and payload sizes
+come from FakeConfig; errors are drawn from a seeded RNG and use the upstream
+error formats, so the app's retry paths are exercised too.
+
+    with running(FakeConfig(latency_ms=40)) as urls:
+        os.environ.update(urls.env())   # before importing app modules
+"""
+import datetime as _dt
+import hashlib
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator
+from urllib.parse import parse_qs, urlparse
+
+@dataclass
+class FakeConfig:
+    latency_ms: float = 30.0         # YouTube / Analytics / token responses
+    report_row_ms: float = 0.2       # extra Analytics latency per returned day
+    openai_latency_ms: float = 400.0
+    jitter: float = 0.2              # +/- fraction of the latency
+    error_rate: float = 0.0          # share of requests answered 503 (OpenAI: 500)
+    uploads: int = 200               # uploads per channel (playlistItems payload)
+    upload_interval_hours: int = 12  # spacing of uploads, newest first from now
+    completion_chars: int = 1200     # size of the OpenAI answer
+    seed: int = 0
+
+def _digest(*parts) -> int:
+    return int.from_bytes(hashlib.sha256(":".join(map(str, parts)).encode()).digest()[:8], "big")
+
+def channel_stats(channel_id: str) -> Dict[str, str]:
+    h = _digest("channel", channel_id)
+    return {
+        "subscriberCount": str(1_000 + h % 20_000_000),
+        "viewCount":       str(100_000 + h % 5_000_000_000),
+        "videoCount":      str(10 + h % 2_000),
+    }
+
+def video_views(video_id: str) -> int:
+    return _digest("video", video_id) % 2_000_000
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "_Server"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload, headers: Dict[str, str] = None):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json_etag(self, payload):
+        """200 with an ETag, or 304 when the client already holds this body."""
+        body = json.dumps(payload).encode()
+        tag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.headers.get("If-None-Match") == tag:
+            self.send_response(304)
+            self.send_header("ETag", tag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._send(200, body, {"ETag": tag})
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, config: FakeConfig, latency_ms: float):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.config     = config
+        self.latency_ms = latency_ms
+        self.requests: Dict[str, int] = {}
+        self._rng  = random.Random(config.seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def admit(self, route: str) -> bool:
+        """Counts the request, waits out the simulated latency; False means answer with an error."""
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+            jitter = 1 + self.config.jitter * (2 * self._rng.random() - 1)
+            failed = self._rng.random() < self.config.error_rate
+        time.sleep(max(0.0, self.latency_ms * jitter) / 1000)
+        return not failed
+
+# ---------- Google ----------
+class GoogleHandler(_Handler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        route = url.path.rstrip("/").rsplit("/", 1)[-1]
+        if not self.server.admit(route):
+            return self._send(503, {"error": {"code": 503, "message": "Backend Error",
+                                              "errors": [{"reason": "backendError"}]}})
+        handler = {
+            "channels": self._channels,
+            "playlistItems": self._playlist_items,
+            "videos": self._videos,
+            "search": self._search,
+            "reports": self._reports,
+        }.get(route)
+        if handler is None:
+            return self._send(404, {"error": {"code": 404, "message": f"No fake for {url.path}"}})
+        handler(q)
+
+    def do_POST(self):
+        self._read_body()
+        if not self.server.admit("token"):
+            return self._send(503, {"error": "temporarily_unavailable"})
+        if urlparse(self.path).path != "/token":
+            return self._send(404, {"error": "not_found"})
+        self._send(200, {"access_token": f"fake-{_digest('token', time.time_ns()):x}",
+                         "expires_in": 3600, "token_type": "Bearer"})
+
+    def _channels(self, q):
+        items = []
+        for cid in filter(None, q.get("id", "").split(",")):
+            items.append({"id": cid, "statistics": channel_stats(cid),
+                          "contentDetails": {"relatedPlaylists": {"uploads": "UU" + cid[2:]}}})
+        self._json_etag({"kind": "youtube#channelListResponse", "items": items})
+
+    def _playlist_items(self, q):
+        cfg = self.server.config
+        playlist = q["playlistId"]
+        offset = int(q.get("pageToken") or 0)
+        size = min(int(q.get("maxResults", 5)), 50)
+        newest = _dt.datetime.now(_dt.timezone.utc).replace(minute=0, second=0, microsecond=0)
+        items = []
+        for i in range(offset, min(offset + size, cfg.uploads)):
+            published = newest - _dt.timedelta(hours=i * cfg.upload_interval_hours)
+            items.append({"contentDetails": {
+                "videoId": f"{playlist[2:13]}{i:08d}",
+                "videoPublishedAt": published.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }})
+        page = {"kind": "youtube#playlistItemListResponse", "items": items,
+                "pageInfo": {"totalResults": cfg.uploads, "resultsPerPage": size}}
+        if offset + size < cfg.uploads:
+            page["nextPageToken"] = str(offset + size)
+        self._json_etag(page)
+
+    def _videos(self, q):
+        items = [{"id": vid, "statistics": {"viewCount": str(video_views(vid))}}
+                 for vid in filter(None, q.get("id", "").split(","))]
+        self._json_etag({"kind": "youtube#videoListResponse", "items": items})
+
+    def _search(self, q):
+        cid = "UC" + hashlib.sha256(q.get("q", "").lower().encode()).hexdigest()[:22]
+        self._json_etag({"items": [{"snippet": {"channelId": cid}}]})
+
+    def _reports(self, q):
+        """reports.query with dimensions=day: one row per day, one column per metric."""
+        channel = q["ids"].split("==", 1)[-1]
+        metrics = [m.strip() for m in q["metrics"].split(",") if m.strip()]
+        day = _dt.date.fromisoformat(q["startDate"])
+        end = min(_dt.date.fromisoformat(q["endDate"]), _dt.date.today())
+        rows = []
+        while day <= end:
+            h = _digest(channel, day)
+            rows.append([day.isoformat()] + [(h >> (3 * i)) % 50_000 for i in range(len(metrics))])
+            day += _dt.timedelta(days=1)
+        time.sleep(len(rows) * self.server.config.report_row_ms / 1000)  # big ranges are slow upstream
+        headers = [{"name": "day", "columnType": "DIMENSION", "dataType": "STRING"}]
+        headers += [{"name": m, "columnType": "METRIC", "dataType": "INTEGER"} for m in metrics]
+        self._send(200, {"kind": "youtubeAnalytics#resultTable", "columnHeaders": headers, "rows": rows})
+
+# ---------- OpenAI ----------
+def insight_text(chars: int) -> str:
+    insight = {
+        "summary": "Steady channel with room to grow.",
+        "opportunities": ["Post on a fixed schedule", "Bundle shorts into series", "Sponsor integrations"],
+        "risk_factors": ["Revenue concentrated in few videos"],
+        "financial_recommendations": ["Advance sized to six months of revenue"],
+    }
+    pad = max(0, chars - len(json.dumps(insight)))
+    insight["summary"] += " " + ("lorem " * (pad // 6 + 1))[:pad]
+    return json.dumps(insight)
+
+class OpenAIHandler(_Handler):
+    def do_POST(self):
+        request = json.loads(self._read_body() or b"{}")
+        if not self.server.admit("chat.completions"):
+            return self._send(500, {"error": {"message": "The server had an error", "type": "server_error"}})
+        if urlparse(self.path).path.rstrip("/") != "/v1/chat/completions":
+            return self._send(404, {"error": {"message": "not found"}})
+        text = insight_text(self.server.config.completion_chars)
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": request.get("model", "fake")}
+        if not request.get("stream"):
+            return self._send(200, dict(base, object="chat.completion", choices=[{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": text}}],
+                usage={"prompt_tokens": 0, "completion_tokens": len(text) // 4, "total_tokens": len(text) // 4}))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for i in range(0, len(text), 40):
+            chunk = dict(base, object="chat.completion.chunk",
+                         choices=[{"index": 0, "delta": {"content": text[i:i + 40]}, "finish_reason": None}])
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+# ---------- lifecycle ----------
+@dataclass
+class FakeUrls:
+    google: str
+    openai: str
+    google_server: _Server
+    openai_server: _Server
+
+    def env(self) -> Dict[str, str]:
+        """Environment that points the app at the fakes (set before importing app modules)."""
+        return {
+            "YOUTUBE_API_KEY": "fake-key",
+            "YOUTUBE_API_BASE_URL": f"{self.google}/youtube/v3",
+            "GOOGLE_API_ROOT_URL": f"{self.google}/",
+            "OPENAI_API_KEY": "fake-key",
+            "OPENAI_BASE_URL": f"{self.openai}/v1",
+        }
+
+    @property
+    def token_uri(self) -> str:
+        return f"{self.google}/token"
+
+    def requests(self) -> Dict[str, int]:
+        return {**self.google_server.requests, **self.openai_server.requests}
+
+@contextmanager
+def running(config: FakeConfig = FakeConfig()) -> Iterator[FakeUrls]:
+    google = _Server(GoogleHandler, config, config.latency_ms)
+    openai = _Server(OpenAIHandler, config, config.openai_latency_ms)
+    for server in (google, openai):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield FakeUrls(google.url, openai.url, google, openai)
+    finally:
+        for server in (google, openai):
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite: /api/analyze, daily_job ingest and FinancialAnalyzer
+scoring against local fakes of YouTube, YouTube Analytics and OpenAI.
+
+Run with:  python backend/benchmarks/run_benchmarks.py [--requests 200] [--concurrency 20]
+           [--latency-ms 30] [--openai-latency-ms 400] [--error-rate 0.01]
+           [--compare backend/benchmarks/results/<earlier>.json]
+
+  analyze    /api/analyze through the ASGI app (middleware, routing, caches,
+             single-flight, quota limiter, real httpx/OpenAI clients), first
+             for distinct channels (cold), then repeating them (warm).
+  ingest     jobs.daily_job full backfill for --channels connected channels,
+             token refresh and Analytics calls included.
+  financial  scalar vs columnar FinancialAnalyzer scoring (bench_financial).
+
+Results, with the commit and the fake settings, are written to
+benchmarks/results/<UTC time>-<commit>.json; --compare prints each headline
+number next to an earlier file's.
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime as _dt
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..'))
+
+import fakes
+
+RESULTS_DIR = os.path.join(HERE, "results")
+
+# headline numbers and whether bigger is better, for --compare
+HEADLINES = {
+    ("analyze_cold", "requests_per_sec"): True,
+    ("analyze_cold", "p50_ms"): False,
+    ("analyze_cold", "p99_ms"): False,
+    ("analyze_warm", "requests_per_sec"): True,
+    ("analyze_warm", "p99_ms"): False,
+    ("ingest", "rows_per_sec"): True,
+    ("financial", "batch_channels_per_sec"): True,
+}
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def _latency_summary(latencies, failures, wall):
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies) + failures,
+        "failures": failures,
+        "wall_seconds": round(wall, 3),
+        "requests_per_sec": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(statistics.median(ordered), 2) if ordered else None,
+        "p99_ms": round(_percentile(ordered, 0.99), 2) if ordered else None,
+        "max_ms": round(ordered[-1], 2) if ordered else None,
+    }
+
+def channel_id(i: int) -> str:
+    return f"UCbench{i:017d}"
+
+async def _analyze(app, ids, concurrency: int):
+    import httpx
+
+    latencies, failures = [], 0
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(client, cid):
+        nonlocal failures
+        async with limit:
+            started = time.perf_counter()
+            resp = await client.get("/api/analyze", params={"url": f"https://youtube.com/channel/{cid}"})
+            elapsed = (time.perf_counter() - started) * 1000
+        if resp.status_code == 200 and "error" not in resp.json():
+            latencies.append(elapsed)
+        else:
+            failures += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, cid) for cid in ids))
+        wall = time.perf_counter() - started
+    return _latency_summary(latencies, failures, wall)
+
+def bench_analyze(requests: int, concurrency: int) -> dict:
+    from app.main import app
+    from app import youtube_async
+
+    ids = [channel_id(i) for i in range(requests)]
+
+    async def both():
+        try:
+            cold = await _analyze(app, ids, concurrency)
+            warm = await _analyze(app, ids, concurrency)
+        finally:
+            await youtube_async.aclose()
+        return cold, warm
+
+    cold, warm = asyncio.run(both())
+    return {"analyze_cold": cold, "analyze_warm": warm}
+
+def bench_ingest(channels: int, concurrency: int, token_uri: str) -> dict:
+    from app import jobs
+    from app.db import SessionLocal
+    from app.models import ChannelCredentials
+
+    db = SessionLocal()
+    for i in range(channels):
+        db.add(ChannelCredentials(channel_id=channel_id(i), refresh_token=f"refresh-{i}", token_uri=token_uri,
+                                  client_id="bench", client_secret="bench", scopes="a b"))
+    db.commit()
+    db.close()
+
+    with contextlib.redirect_stdout(io.StringIO()):  # daily_job logs a line per channel
+        summary = jobs.daily_job(full_backfill=True, concurrency=concurrency)
+    return {"ingest": {
+        "channels": channels,
+        "concurrency": concurrency,
+        "channels_failed": summary["channels_failed"],
+        "rows": summary["rows"],
+        "api_calls": summary["api_calls"],
+        "wall_seconds": round(summary["wall_seconds"], 3),
+        "rows_per_sec": round(summary["rows"] / summary["wall_seconds"], 1) if summary["wall_seconds"] else 0.0,
+    }}
+
+def bench_financial(channels: int) -> dict:
+    import bench_financial
+
+    result = bench_financial.run(channels)
+    return {"financial": {k: round(v, 4) if isinstance(v, float) else v for k, v in result.items()}}
+
+def _commit() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=HERE, capture_output=True, text=True,
+                                   check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+    return {"commit": git("rev-parse", "--short", "HEAD") or "unknown",
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+def compare(result: dict, baseline: dict) -> str:
+    lines = [f"{'metric':<38}{'baseline':>12}{'current':>12}{'change':>10}"]
+    for (section, key), higher_is_better in HEADLINES.items():
+        old = baseline.get("results", {}).get(section, {}).get(key)
+        new = result["results"].get(section, {}).get(key)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        better = (change >= 0) == higher_is_better
+        lines.append(f"{section + '.' + key:<38}{old:>12.1f}{new:>12.1f}{change:>+9.1f}%"
+                     + ("" if abs(change) < 5 else ("  better" if better else "  WORSE")))
+    return "\n".join(lines)
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", default="analyze,ingest,financial",
+                        help="comma-separated subset of analyze,ingest,financial")
+    parser.add_argument("--requests", type=int, default=200, help="distinct channels analysed")
+    parser.add_argument("--concurrency", type=int, default=20, help="analyses in flight at once")
+    parser.add_argument("--channels", type=int, default=8, help="connected channels ingested")
+    parser.add_argument("--ingest-concurrency", type=int, default=4)
+    parser.add_argument("--financial-channels", type=int, default=50000)
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="fake Google API latency")
+    parser.add_argument("--report-row-ms", type=float, default=0.2, help="extra Analytics latency per day returned")
+    parser.add_argument("--openai-latency-ms", type=float, default=400.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake responses that fail")
+    parser.add_argument("--uploads", type=int, default=200, help="uploads per fake channel")
+    parser.add_argument("--completion-chars", type=int, default=1200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--youtube-max-qps", type=float, default=1000.0,
+                        help="client-side rate limit during the run (production default is 20)")
+    parser.add_argument("--out", help="result file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args(argv)
+    only = set(args.only.split(","))
+
+    config = fakes.FakeConfig(latency_ms=args.latency_ms, report_row_ms=args.report_row_ms,
+                              openai_latency_ms=args.openai_latency_ms,
+                              error_rate=args.error_rate, uploads=args.uploads,
+                              completion_chars=args.completion_chars, seed=args.seed)
+    tmp = tempfile.TemporaryDirectory()
+    with fakes.running(config) as urls:
+        # app modules read these at import time, so nothing from app is imported above
+        os.environ.update(urls.env())
+        os.environ.update({
+            "DATABASE_URL": f"sqlite:///{os.path.join(tmp.name, 'bench.db')}",
+            "YOUTUBE_MAX_QPS": str(args.youtube_max_qps),
+            "YOUTUBE_BURST": str(int(args.youtube_max_qps)),
+            "YOUTUBE_DAILY_QUOTA": "1000000",
+            "YOUTUBE_BACKOFF_BASE": "0.05",
+            "JOB_WORKERS": "0",
+        })
+        results = {}
+        if "analyze" in only:
+            results.update(bench_analyze(args.requests, args.concurrency))
+        if "ingest" in only:
+            results.update(bench_ingest(args.channels, args.ingest_concurrency, urls.token_uri))
+        upstream = urls.requests()
+    if "financial" in only:
+        results.update(bench_financial(args.financial_channels))
+    tmp.cleanup()
+
+    now = _dt.datetime.now(_dt.timezone.utc)
+    result = {
+        **_commit(),
+        "timestamp": now.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "fakes": vars(config),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "results": results,
+        "upstream_requests": upstream,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{now:%Y%m%dT%H%M%SZ}-{result['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(json.dumps(result["results"], indent=2))
+    print(f"📁  {out}")
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(result, json.load(f)))
+    return result
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+#!/usr/bin/env bash
+export PYTHONPATH=./backend
+python3 -m app.batch "$@"
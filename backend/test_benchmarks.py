@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Smoke test for the offline benchmark suite: the fakes answer every upstream
+call the app makes, and a tiny run produces a complete result file.
+"""
+import sys
+import os
+import json
+import subprocess
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+def _run(*args):
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "result.json")
+        # a subprocess: the harness must set the fakes' URLs before app modules are imported
+        subprocess.run([sys.executable, os.path.join(BACKEND, "benchmarks", "run_benchmarks.py"),
+                        "--out", out, *args], check=True, capture_output=True, text=True)
+        with open(out) as f:
+            return json.load(f)
+
+def test_tiny_run_covers_every_scenario():
+    result = _run("--requests", "6", "--concurrency", "3", "--channels", "2",
+                  "--financial-channels", "200", "--latency-ms", "1", "--openai-latency-ms", "1")
+    r = result["results"]
+    assert r["analyze_cold"]["failures"] == 0 and r["analyze_cold"]["requests"] == 6
+    assert r["analyze_warm"]["p50_ms"] < r["analyze_cold"]["p50_ms"]
+    assert r["ingest"]["channels_failed"] == 0 and r["ingest"]["rows"] > 0
+    assert r["financial"]["identical"]
+    upstream = result["upstream_requests"]
+    assert upstream["channels"] == 6 and upstream["chat.completions"] == 6  # warm pass is cached
+    assert upstream["token"] == 2 and upstream["reports"] == r["ingest"]["api_calls"] - 2
+    assert result["commit"] and result["fakes"]["latency_ms"] == 1
+
+if __name__ == "__main__":
+    test_tiny_run_covers_every_scenario()
+    print("✅ Benchmark suite smoke test passed")
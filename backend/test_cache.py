@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the caching layers (report cache, channel resolution, ETags, API clients)
+"""
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import asyncio
+import httpx
+import httplib2
+
+from app.cache import MemoryCache, SQLCache
+from google.oauth2.credentials import Credentials
+from app import clients, etag, youtube_public
+
+def _check_backend(cache):
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}      # touches "a", so "b" is now least recent
+    cache.set("c", {"v": 3})               # evicts "b"
+    assert cache.get("b") is None
+    assert cache.get("c") == {"v": 3}
+    cache.set("short", {"v": 4}, ttl=0.05)
+    time.sleep(0.1)
+    assert cache.get("short") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+
+def test_memory_cache():
+    _check_backend(MemoryCache("test", maxsize=2, ttl=60))
+
+def test_sql_cache_shared_between_instances():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    factory = sessionmaker(bind=engine)
+    _check_backend(SQLCache("test", maxsize=2, ttl=60, session_factory=factory, touch_interval=0))
+
+    # a second "worker" sees the first one's entries
+    other = SQLCache("test", maxsize=2, ttl=60, session_factory=factory)
+    assert other.get("c") == {"v": 3}
+
+def test_sql_cache_hits_are_read_only_and_sets_upsert():
+    from sqlalchemy import event
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    factory = sessionmaker(bind=engine)
+    first  = SQLCache("test", maxsize=10, ttl=60, session_factory=factory)
+    second = SQLCache("test", maxsize=10, ttl=60, session_factory=factory)
+    first.set("k", {"v": 1})
+    second.set("k", {"v": 2})  # same key from another "worker": no IntegrityError
+    assert first.get("k") == {"v": 2}
+
+    writes = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, stmt, *a: writes.append(stmt) if stmt.lstrip().upper().startswith("UPDATE") else None)
+    for _ in range(5):
+        assert first.get("k") == {"v": 2}
+    assert writes == []
+
+class FakeSearch:
+    """Stands in for the YouTube client; counts search().list calls."""
+    def __init__(self):
+        self.calls = []
+
+    def search(self):
+        return self
+
+    def list(self, q, **kw):
+        self.calls.append(q)
+        self._q = q
+        return self
+
+    def execute(self):
+        if self._q == "@mrbeast":
+            return {"items": [{"snippet": {"channelId": "UCX6OQ3DkcsbYNE6H8uQQuVA"}}]}
+        return {"items": []}
+
+def test_resolution_cache_normalizes_and_caches_misses():
+    saved = youtube_public.yt
+    try:
+        _resolution_cache_normalizes_and_caches_misses()
+    finally:
+        youtube_public.yt = saved
+
+def _resolution_cache_normalizes_and_caches_misses():
+    fake = FakeSearch()
+    youtube_public.yt = fake
+    youtube_public._resolutions.clear()
+    youtube_public.ChannelResolution.__table__.drop(bind=youtube_public.engine, checkfirst=True)
+    youtube_public._resolution_table_ready = False
+
+    for text in ("https://www.youtube.com/@MrBeast", "youtube.com/@MrBeast/videos",
+                 "@MrBeast", "@mrbeast"):
+        assert youtube_public.normalize_query(text) == "@mrbeast"
+        assert youtube_public.resolve_channel_id(text) == "UCX6OQ3DkcsbYNE6H8uQQuVA"
+    assert fake.calls == ["@mrbeast"]
+
+    for _ in range(2):
+        try:
+            youtube_public.resolve_channel_id("no such channel anywhere")
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+    assert fake.calls == ["@mrbeast", "no such channel anywhere"]
+
+    # the persistent table answers after the memory front is dropped
+    youtube_public._resolutions.clear()
+    assert youtube_public.resolve_channel_id("@MRBEAST") == "UCX6OQ3DkcsbYNE6H8uQQuVA"
+    assert len(fake.calls) == 2
+
+def test_sql_cache_evicts_every_n_writes():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    cache = SQLCache("test", maxsize=2, ttl=60, session_factory=sessionmaker(bind=engine), evict_every=3)
+    for i in range(5):
+        cache.set(str(i), i)
+    assert len(cache) == 4  # evicted down to 2 on the third write, then two more
+    cache.set("5", 5)
+    assert len(cache) == 2
+
+BODY = '{"items": [{"id": "UC1", "statistics": {"viewCount": "42"}}]}'
+
+class FakeHttp:
+    """httplib2 stand-in: 304 when If-None-Match matches the current ETag."""
+    def __init__(self):
+        self.sent = []
+
+    def request(self, uri, method="GET", body=None, headers=None, **kw):
+        self.sent.append(headers.get("if-none-match"))
+        if headers.get("if-none-match") == '"v1"':
+            return httplib2.Response({"status": "304"}), b""
+        return httplib2.Response({"status": "200", "etag": '"v1"'}), BODY.encode()
+
+def test_etag_revalidation_sync_and_async():
+    saved, etag._store = etag._store, MemoryCache("etag", maxsize=10, ttl=60)
+    try:
+        _etag_revalidation_sync_and_async()
+    finally:
+        etag._store = saved
+
+def _etag_revalidation_sync_and_async():
+    inner = FakeHttp()
+    http  = etag.ETagHttp(inner)
+    uri   = "https://youtube.googleapis.com/youtube/v3/channels?id=UC1&part=statistics&key=k1&alt=json"
+
+    first  = http.request(uri)
+    second = http.request(uri.replace("key=k1", "key=k2"))  # same resource, other key
+    assert inner.sent == [None, '"v1"']
+    assert second[0].status == 200 and second[1] == first[1] == BODY.encode()
+
+    # the async path shares entries with the sync one
+    seen = []
+    def handler(request):
+        seen.append(request.headers.get("if-none-match"))
+        return httpx.Response(304)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await etag.conditional_get(client, "https://www.googleapis.com/youtube/v3/channels",
+                                              {"part": "statistics", "id": "UC1", "key": "k3"})
+    resp = asyncio.run(run())
+    assert seen == ['"v1"']
+    assert resp.status_code == 200 and resp.json()["items"][0]["id"] == "UC1"
+    assert etag.counters["revalidated"] == 2
+
+def test_sql_etag_store_is_used_off_the_event_loop():
+    import threading
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    saved, etag._store = etag._store, SQLCache("etag", maxsize=10, ttl=60, session_factory=sessionmaker(bind=engine))
+    threads = []
+    get, set_ = etag._store.get, etag._store.set
+    etag._store.get = lambda *a: threads.append(threading.current_thread()) or get(*a)
+    etag._store.set = lambda *a: threads.append(threading.current_thread()) or set_(*a)
+
+    def handler(request):
+        return httpx.Response(200, text=BODY, headers={"etag": '"v1"'})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await etag.conditional_get(client, "https://www.googleapis.com/youtube/v3/channels",
+                                              {"part": "statistics", "id": "UC2"})
+    try:
+        assert asyncio.run(run()).status_code == 200
+    finally:
+        etag._store = saved
+    assert len(threads) == 2 and threading.main_thread() not in threads
+
+def test_client_factory_reuses_services_per_credential():
+    clients.clear()
+    creds = Credentials(None, refresh_token="r1")
+    first = clients.get_service("youtubeAnalytics", "v2", credentials=creds, cache_key="UC1")
+    again = clients.get_service("youtubeAnalytics", "v2", credentials=Credentials(None, refresh_token="r1"),
+                                cache_key="UC1")
+    other = clients.get_service("youtubeAnalytics", "v2", credentials=creds, cache_key="UC2")
+    reconnected = clients.get_service("youtubeAnalytics", "v2", credentials=Credentials(None, refresh_token="r2"),
+                                      cache_key="UC1")
+    assert first is again
+    assert other is not first and reconnected is not first
+    assert hasattr(first, "reports")
+
+if __name__ == "__main__":
+    test_memory_cache()
+    test_sql_cache_shared_between_instances()
+    test_sql_cache_hits_are_read_only_and_sets_upsert()
+    test_resolution_cache_normalizes_and_caches_misses()
+    test_sql_cache_evicts_every_n_writes()
+    test_etag_revalidation_sync_and_async()
+    test_sql_etag_store_is_used_off_the_event_loop()
+    test_client_factory_reuses_services_per_credential()
+    print("✅ Cache tests passed")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Cold-start budget for the Vercel entry point. Importing api/index.py must not
+pull in the OpenAI SDK, googleapiclient, numpy, httpx or SQLAlchemy (endpoints
+import what they use), and must stay within COLD_START_BUDGET_MS as measured by
+`python -X importtime` in a fresh interpreter. The analysis module it loads on
+the first /api/analyze request has the same budget and defers all but
+SQLAlchemy. numpy is not in api/requirements.txt, so a report must also build
+without it.
+
+Run directly to print the slowest imports:  python backend/test_cold_start.py
+"""
+import os
+import subprocess
+import sys
+
+BACKEND   = os.path.dirname(os.path.abspath(__file__))
+API       = os.path.join(os.path.dirname(BACKEND), "api")
+BUDGET_MS = float(os.getenv("COLD_START_BUDGET_MS", "1500"))
+DEFERRED  = ("openai", "googleapiclient", "numpy", "httpx", "google_auth_oauthlib")
+
+PROBE = "import sys, json, %s; print(json.dumps([m for m in %r if m in sys.modules]))"
+
+def _measure(module: str = "index"):
+    deferred = DEFERRED + ("sqlalchemy",) if module == "index" else DEFERRED
+    env = dict(os.environ, DATABASE_URL="sqlite://", YOUTUBE_API_KEY="cold-start-test",
+               OPENAI_API_KEY="cold-start-test")
+    cwd = API if module == "index" else BACKEND
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE % (module, deferred)],
+                          cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cum, name = line[len("import time:"):].split("|")
+            if cum.strip().isdigit():
+                cumulative[name.strip()] = int(cum) / 1000.0  # us -> ms
+    return proc.stdout.strip().splitlines()[-1], cumulative
+
+def test_vercel_entry_import_is_lazy_and_within_budget():
+    loaded, cumulative = _measure()
+    assert loaded == "[]", f"eagerly imported: {loaded}"
+    total = cumulative["index"]
+    assert total <= BUDGET_MS, f"import index took {total:.0f} ms (budget {BUDGET_MS:.0f} ms)"
+
+def test_public_analysis_import_is_lazy_and_within_budget():
+    loaded, cumulative = _measure("app.public_analysis")
+    assert loaded == "[]", f"eagerly imported: {loaded}"
+    total = cumulative["app.public_analysis"]
+    assert total <= BUDGET_MS, f"import app.public_analysis took {total:.0f} ms (budget {BUDGET_MS:.0f} ms)"
+
+def test_analyze_request_without_numpy():
+    """GET /api/analyze on the Vercel entry with numpy not installed."""
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    sys.path.insert(0, API)
+    saved_modules = {name: sys.modules.pop(name, None) for name in ("numpy", "app.features")}
+    sys.modules["numpy"] = None  # import numpy -> ImportError
+    from fastapi.testclient import TestClient
+    import index
+    from app import public_analysis as pa
+    saved = (pa.openai_api_key, pa.resolve_channel_id_async, pa.fetch_public_metrics_async)
+
+    async def resolve(query):
+        return "UCnonumpy"
+
+    async def fetch(cid, days, timings):
+        return {"subscriber_count": 1200, "total_views": 450_000, "views_last_30d": 30_000, "video_count": 40}
+
+    pa.openai_api_key, pa.resolve_channel_id_async, pa.fetch_public_metrics_async = None, resolve, fetch
+    try:
+        body = TestClient(index.app).get("/api/analyze", params={"url": "@nonumpy"}).json()
+    finally:
+        pa.openai_api_key, pa.resolve_channel_id_async, pa.fetch_public_metrics_async = saved
+        pa.report_cache.clear()
+        sys.path.remove(API)
+        for name, module in saved_modules.items():
+            sys.modules.pop(name, None)
+            if module is not None:
+                sys.modules[name] = module
+    assert "error" not in body, body
+    assert body["channel_id"] == "UCnonumpy" and body["financial_analysis"]["loan_recommendation"]
+
+if __name__ == "__main__":
+    for module in ("index", "app.public_analysis"):
+        loaded, cumulative = _measure(module)
+        print(f"import {module}:")
+        for name, ms in sorted(cumulative.items(), key=lambda kv: kv[1])[-15:]:
+            print(f"{ms:9.1f} ms  {name}")
+        print(f"deferred modules loaded: {loaded}")
+    test_vercel_entry_import_is_lazy_and_within_budget()
+    test_public_analysis_import_is_lazy_and_within_budget()
+    test_analyze_request_without_numpy()
+    print("✅ Cold-start budget met")
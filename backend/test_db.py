@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Offline tests for dialect-aware engine settings and the read-only session factory
+"""
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import db as dbmod
+
+def _pragma(conn, name):
+    return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+def test_sqlite_file_engine_uses_wal_and_read_only_engine_rejects_writes():
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'wal.db')}"
+        writer = dbmod.make_engine(url)
+        reader = dbmod.make_engine(url, read_only=True)
+        try:
+            with writer.begin() as conn:
+                assert _pragma(conn, "journal_mode") == "wal"
+                assert _pragma(conn, "synchronous") == 1  # NORMAL
+                assert _pragma(conn, "busy_timeout") == dbmod.SQLITE_BUSY_TIMEOUT_MS
+                conn.execute(text("CREATE TABLE t (x INTEGER)"))
+                conn.execute(text("INSERT INTO t VALUES (1)"))
+            with reader.connect() as conn:
+                assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 1
+                try:
+                    conn.execute(text("INSERT INTO t VALUES (2)"))
+                    raise AssertionError("read-only engine accepted a write")
+                except OperationalError:
+                    pass
+        finally:
+            writer.dispose()
+            reader.dispose()
+
+def test_writer_commits_while_a_dashboard_read_is_open():
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'wal.db')}"
+        writer = dbmod.make_engine(url)
+        reader = dbmod.make_engine(url, read_only=True)
+        try:
+            with writer.begin() as conn:
+                conn.execute(text("CREATE TABLE t (x INTEGER)"))
+                conn.execute(text("INSERT INTO t VALUES (1), (2), (3)"))
+            with reader.connect() as conn:
+                rows = conn.execute(text("SELECT x FROM t"))
+                rows.fetchone()  # the read is still open, holding its snapshot
+                started = time.perf_counter()
+                # under a rollback journal this commit waits for the reader, then fails as "locked"
+                with writer.begin() as wconn:
+                    wconn.execute(text("INSERT INTO t VALUES (4)"))
+                assert time.perf_counter() - started < 1.0
+                assert [r[0] for r in rows] == [2, 3]  # the reader keeps its snapshot
+                rows.close()
+                assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 4
+        finally:
+            writer.dispose()
+            reader.dispose()
+
+def test_memory_database_shares_engine_for_reads():
+    assert dbmod.is_memory_sqlite("sqlite://")
+    assert dbmod.is_memory_sqlite("sqlite:///:memory:")
+    assert not dbmod.is_memory_sqlite("sqlite:///./data.db")
+    assert not dbmod.is_memory_sqlite("postgresql://u:p@localhost/app")
+    if dbmod.is_memory_sqlite(dbmod.DATABASE_URL) and not dbmod.DATABASE_READ_URL:
+        assert dbmod.read_engine is dbmod.engine
+
+if __name__ == "__main__":
+    test_sqlite_file_engine_uses_wal_and_read_only_engine_rejects_writes()
+    test_writer_commits_while_a_dashboard_read_is_open()
+    test_memory_database_shares_engine_for_reads()
+    print("✅ Database engine tests passed")
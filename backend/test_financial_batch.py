@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Offline test: FinancialAnalyzer.score_batch must match the scalar path exactly
+"""
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+
+import numpy as np
+from app.financial_analysis import FinancialAnalyzer, FinancialMetrics
+
+SCALAR_FIELDS = {
+    "sensitivity": ("base_revenue", "optimistic_revenue", "pessimistic_revenue",
+                    "revenue_volatility", "growth_rate", "risk_score"),
+    "loan": ("recommended_advance", "max_loan_amount", "risk_adjusted_amount",
+             "repayment_period_months", "interest_rate_percent", "monthly_payment",
+             "risk_level", "confidence_score"),
+}
+
+def sample_book(n: int = 5000, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    book = {
+        "subscriber_count": rng.integers(0, 50_000_000, n),
+        "total_views": rng.integers(0, 20_000_000_000, n),
+        "video_count": rng.integers(0, 5000, n),
+        "estimated_revenue_usd": rng.lognormal(8, 2.5, n),
+    }
+    # values sitting exactly on every branch threshold
+    edges = {
+        "subscriber_count": [10000000, 1000000, 100000, 0],
+        "total_views": [100000000, 10000000, 0, 5],
+        "video_count": [100, 50, 1, 0],
+        "estimated_revenue_usd": [100000.0, 10000.0, 0.01, 1e9],
+    }
+    for k, v in edges.items():
+        book[k] = np.concatenate([book[k], np.asarray(v, dtype=book[k].dtype)])
+    return book
+
+def test_score_batch_identical_to_scalar():
+    analyzer = FinancialAnalyzer()
+    book = sample_book()
+    batch = analyzer.score_batch(book)
+
+    for i in range(len(book["video_count"])):
+        m = FinancialMetrics(
+            subscriber_count=int(book["subscriber_count"][i]),
+            total_views=int(book["total_views"][i]),
+            views_last_30d=0,
+            video_count=int(book["video_count"][i]),
+            estimated_revenue_usd=float(book["estimated_revenue_usd"][i]),
+        )
+        sens = analyzer.calculate_sensitivity_analysis(m)
+        loan = analyzer.generate_loan_recommendation(m, sens)
+        for obj, fields in ((sens, SCALAR_FIELDS["sensitivity"]), (loan, SCALAR_FIELDS["loan"])):
+            for f in fields:
+                assert batch[f][i] == getattr(obj, f), (i, f, batch[f][i], getattr(obj, f))
+
+if __name__ == "__main__":
+    test_score_batch_identical_to_scalar()
+    print("✅ score_batch matches the scalar path")
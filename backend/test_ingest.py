@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Offline test for the analytics ingest job (no Google credentials needed)
+"""
+import sys
+import os
+import datetime as _dt
+import functools
+import threading
+from types import SimpleNamespace as NS
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import httplib2
+from googleapiclient.errors import HttpError
+
+from app import auth, jobs
+from app.bulk import upsert_daily_stats
+from app.features import get_features, update_features
+from app import rollups
+from app.models import Base, ChannelCredentials, ChannelDailyStats, IngestWatermark
+
+CHANNEL = "UC" + "x" * 22
+
+TOKEN_REQUESTS = []
+
+def _fake_refresh(creds):
+    """Stands in for the OAuth token endpoint."""
+    TOKEN_REQUESTS.append(creds.refresh_token)
+    if creds.refresh_token == "revoked":
+        raise RuntimeError("invalid_grant")
+    creds.token  = f"token-{len(TOKEN_REQUESTS)}"
+    creds.expiry = _dt.datetime.utcnow() + _dt.timedelta(hours=1)
+
+def _with_fakes(test):
+    """
+    Runs a test with the OAuth token endpoint faked. Whatever it points
+    jobs.get_service / jobs.SessionLocal at is restored afterwards, so other
+    test modules see the real ones.
+    """
+    @functools.wraps(test)
+    def run():
+        saved = (auth._refresh, jobs.get_service, jobs.SessionLocal)
+        auth._refresh = _fake_refresh
+        try:
+            return test()
+        finally:
+            auth._refresh, jobs.get_service, jobs.SessionLocal = saved
+    return run
+
+def _values(day: _dt.date):
+    """Deterministic stats for one day, by Analytics metric name."""
+    views = day.toordinal() % 1000
+    return {"views": views, "estimatedMinutesWatched": 2 * views, "estimatedRevenue": views / 100,
+            "subscribersGained": day.toordinal() % 7, "subscribersLost": day.toordinal() % 3}
+
+class FakeAnalytics:
+    """Stands in for get_service("youtubeAnalytics", "v2") and records each query."""
+    def __init__(self):
+        self.queries = []
+        self.until = None             # pretend data only exists up to this day
+        self.forbid_revenue = False   # answer 403 to monetary metrics, like a non-partner channel
+        self._lock = threading.Lock()
+
+    def reports(self):
+        return self
+
+    def query(self, **kw):
+        with self._lock:  # chunks are queried from several threads
+            self.queries.append(kw)
+        return NS(execute=lambda: self._execute(kw))
+
+    def _execute(self, kw):
+        if kw["ids"].endswith("broken"):
+            raise RuntimeError("quotaExceeded")
+        metrics = kw["metrics"].split(",")
+        if self.forbid_revenue and "estimatedRevenue" in metrics:
+            raise HttpError(httplib2.Response({"status": 403}),
+                            b'{"error": {"code": 403, "errors": [{"reason": "forbidden"}]}}')
+        start = _dt.date.fromisoformat(kw["startDate"])
+        end   = _dt.date.fromisoformat(kw["endDate"])
+        if self.until:
+            end = min(end, self.until)
+        rows, day = [], start
+        while day <= end:
+            values = _values(day)
+            rows.append([day.isoformat()] + [values[m] for m in metrics])
+            day += _dt.timedelta(days=1)
+        headers = [{"name": "day", "columnType": "DIMENSION"}] + [{"name": m, "columnType": "METRIC"} for m in metrics]
+        return {"columnHeaders": headers, "rows": rows}
+
+def _sessionmaker():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+def _session():
+    return _sessionmaker()()
+
+@_with_fakes
+def test_incremental_ingest():
+    db = _session()
+    fake = FakeAnalytics()
+    jobs.get_service = lambda *a, **kw: fake
+    today = _dt.date.today()
+
+    # 1) first run backfills from HISTORY_START
+    db.add(IngestWatermark(channel_id=CHANNEL, last_date=today - _dt.timedelta(days=10)))
+    db.commit()
+    jobs.fetch_all_time_stats(db, CHANNEL, creds=None, full_backfill=True)
+    assert min(q["startDate"] for q in fake.queries) == jobs.HISTORY_START.isoformat()
+
+    # 2) later runs only ask for the late-data window behind the watermark
+    jobs.fetch_all_time_stats(db, CHANNEL, creds=None)
+    expected = today + _dt.timedelta(days=1 - jobs.LATE_DATA_DAYS)
+    assert fake.queries[-1]["startDate"] == expected.isoformat()
+
+    wm = db.query(IngestWatermark).filter_by(channel_id=CHANNEL).one()
+    assert wm.last_date == today
+    days = (today - jobs.HISTORY_START).days + 1
+    assert db.query(ChannelDailyStats).filter_by(channel_id=CHANNEL).count() == days
+    db.close()
+
+@_with_fakes
+def test_all_metrics_in_one_query_per_chunk():
+    db = _session()
+    fake = FakeAnalytics()
+    jobs.get_service = lambda *a, **kw: fake
+    today = _dt.date.today()
+    chunks = jobs.date_chunks(jobs.HISTORY_START, today)
+    assert chunks[0][0] == jobs.HISTORY_START and chunks[-1][1] == today
+    assert all(b + _dt.timedelta(days=1) == c for (_, b), (c, _) in zip(chunks, chunks[1:]))
+
+    written = jobs.fetch_all_time_stats(db, CHANNEL, creds=None, full_backfill=True)
+    assert written["api_calls"] == len(chunks) == len(fake.queries) > 1
+    assert all(q["metrics"] == jobs.METRICS for q in fake.queries)
+    assert written["rows"] == (today - jobs.HISTORY_START).days + 1
+
+    day = _dt.date(2016, 2, 29)
+    row = db.query(ChannelDailyStats).filter_by(channel_id=CHANNEL, date=day).one()
+    expected = _values(day)
+    assert (row.views, row.minutes_watched, row.revenue, row.subs_gained, row.subs_lost) == (
+        expected["views"], expected["estimatedMinutesWatched"], expected["estimatedRevenue"],
+        expected["subscribersGained"], expected["subscribersLost"])
+
+    # a channel without monetary access still gets every other metric; the
+    # refusal is remembered, so later queries skip straight to them
+    jobs._no_monetary.clear()
+    fake.forbid_revenue = True
+    del fake.queries[:]
+    written = jobs.fetch_all_time_stats(db, "UCnotmonetised", creds=None, full_backfill=True)
+    assert len(chunks) < written["api_calls"] <= len(chunks) + jobs.CHUNK_CONCURRENCY
+    row = db.query(ChannelDailyStats).filter_by(channel_id="UCnotmonetised", date=day).one()
+    assert row.revenue is None and row.minutes_watched == expected["estimatedMinutesWatched"]
+    written = jobs.fetch_all_time_stats(db, "UCnotmonetised", creds=None, full_backfill=True)
+    assert written["api_calls"] == len(chunks)
+
+    # losing monetary access never overwrites revenue already stored
+    jobs.fetch_all_time_stats(db, CHANNEL, creds=None, full_backfill=True)
+    row = db.query(ChannelDailyStats).filter_by(channel_id=CHANNEL, date=day).one()
+    db.refresh(row)
+    assert row.revenue == expected["estimatedRevenue"] and row.views == expected["views"]
+    jobs._no_monetary.clear()
+    db.close()
+
+@_with_fakes
+def test_other_403s_are_not_retried_without_revenue():
+    fake = FakeAnalytics()
+    jobs.get_service = lambda *a, **kw: fake
+    fake._execute = lambda kw: (_ for _ in ()).throw(HttpError(
+        httplib2.Response({"status": 403}),
+        b'{"error": {"code": 403, "errors": [{"reason": "accessNotConfigured"}]}}'))
+    try:
+        jobs._query_range(fake, CHANNEL, _dt.date(2020, 1, 1), _dt.date(2020, 1, 2))
+        assert False, "expected HttpError"
+    except HttpError:
+        pass
+    assert len(fake.queries) == 1 and not jobs._no_monetary.get(CHANNEL)
+
+def test_bulk_upsert_matches_per_row():
+    rows = [
+        {"channel_id": CHANNEL, "date": _dt.date(2020, 1, 1) + _dt.timedelta(days=i),
+         "views": i, "minutes_watched": 2 * i, "revenue": i / 10,
+         "subs_gained": 1, "subs_lost": 0}
+        for i in range(2500)
+    ]
+    results = {}
+    for method in ("per_row", "bulk"):
+        db = _session()
+        upsert_daily_stats(db, rows, method=method)
+        # re-upserting the same keys updates in place instead of violating _channel_date_uc
+        stats = upsert_daily_stats(db, [dict(r, views=r["views"] + 1) for r in rows],
+                                   batch_size=700, method=method)
+        db.commit()
+        assert stats["method"] == method and stats["rows"] == len(rows)
+        results[method] = [
+            (s.date, s.views, s.minutes_watched, s.revenue)
+            for s in db.query(ChannelDailyStats).order_by(ChannelDailyStats.date)
+        ]
+        db.close()
+    assert results["bulk"] == results["per_row"]
+    assert results["bulk"][0][1] == 1
+
+@_with_fakes
+def test_daily_job_isolates_channel_failures():
+    jobs.SessionLocal = _sessionmaker()
+    jobs.get_service = lambda *a, **kw: FakeAnalytics()
+    db = jobs.SessionLocal()
+    for cid in (CHANNEL, "UCbroken"):
+        db.add(ChannelCredentials(channel_id=cid, refresh_token="r", client_id="c",
+                                  client_secret="s", scopes="a b"))
+        db.add(IngestWatermark(channel_id=cid, last_date=_dt.date.today()))
+    db.commit()
+    db.close()
+
+    summary = jobs.daily_job(concurrency=2)
+    assert summary["channels_ok"] == 1
+    assert summary["channels_failed"] == 1
+    assert summary["failures"][0]["channel_id"] == "UCbroken"
+    assert summary["rows"] == jobs.LATE_DATA_DAYS
+
+@_with_fakes
+def test_features_incremental_matches_rebuild():
+    db = _session()
+    fake = FakeAnalytics()
+    jobs.get_service = lambda *a, **kw: fake
+    today = _dt.date.today()
+
+    # backfill, then daily runs that each bring new days past the settle lag
+    for back in (40, 25, 9, 0):
+        fake.until = today - _dt.timedelta(days=back)
+        jobs.fetch_all_time_stats(db, CHANNEL, creds=None, full_backfill=(back == 40))
+    incremental = get_features(db, CHANNEL)
+
+    update_features(db, CHANNEL, jobs.LATE_DATA_DAYS, rebuild=True)
+    db.commit()
+    assert get_features(db, CHANNEL) == incremental
+    assert incremental["views_30d"] == sum(
+        (today - _dt.timedelta(days=i)).toordinal() % 1000 for i in range(30)
+    )
+    assert incremental["lifetime_days"] == (today - jobs.HISTORY_START).days + 1 - jobs.LATE_DATA_DAYS
+    assert len(incremental["weekday_seasonality"]) == 7
+    db.close()
+
+@_with_fakes
+def test_tokens_persisted_cached_and_refreshed_ahead():
+    factory = _sessionmaker()
+    db = factory()
+    soon = _dt.datetime.utcnow() + _dt.timedelta(minutes=2)
+    later = _dt.datetime.utcnow() + _dt.timedelta(hours=1)
+    for cid, refresh, token, expiry in (("UCsoon", "r-soon", "old", soon), ("UClater", "r-later", "live", later),
+                                        ("UCnew", "r-new", None, None), ("UCgone", "revoked", None, None)):
+        db.add(ChannelCredentials(channel_id=cid, refresh_token=refresh, client_id="c", client_secret="s",
+                                  scopes="a b", access_token=token, expiry=expiry))
+    db.commit()
+
+    # a stored live token is used as-is, and the same object is handed out again
+    creds = auth.load_credentials("UClater", db)
+    assert creds.valid and creds.token == "live"
+    assert auth.load_credentials("UClater", db) is creds
+    del TOKEN_REQUESTS[:]
+    assert not auth.ensure_fresh("UClater", creds, db) and TOKEN_REQUESTS == []
+
+    soon_creds = auth.load_credentials("UCsoon", db)
+    summary = auth.refresh_expiring(margin_seconds=600, batch_size=1, session_factory=factory)
+    assert summary["refreshed"] == 2 and summary["failed"] == 1
+    assert sorted(TOKEN_REQUESTS) == ["r-new", "r-soon", "revoked"]
+
+    # the refreshed token reached both the DB row and the live object
+    db.expire_all()
+    row = db.query(ChannelCredentials).filter_by(channel_id="UCsoon").one()
+    assert row.access_token == soon_creds.token != "old"
+    assert row.expiry > later - _dt.timedelta(minutes=5)
+    db.close()
+
+@_with_fakes
+def test_rollups_answer_ranges_like_daily_rows():
+    db = _session()
+    fake = FakeAnalytics()
+    jobs.get_service = lambda *a, **kw: fake
+    today = _dt.date.today()
+    fake.until = today - _dt.timedelta(days=30)
+    jobs.fetch_all_time_stats(db, CHANNEL, creds=None, full_backfill=True)
+    fake.until = None
+    jobs.fetch_all_time_stats(db, CHANNEL, creds=None)  # incremental: new days + late-data window
+
+    def daily_sum(a, b):
+        return sum(v for (v,) in db.query(ChannelDailyStats.views)
+                                   .filter(ChannelDailyStats.channel_id == CHANNEL,
+                                           ChannelDailyStats.date >= a, ChannelDailyStats.date <= b))
+
+    for a, b in ((_dt.date(2012, 3, 17), _dt.date(2015, 11, 4)),
+                 (today - _dt.timedelta(days=75), today),
+                 (_dt.date(2020, 2, 3), _dt.date(2020, 2, 9)),
+                 (_dt.date(2021, 6, 2), _dt.date(2021, 6, 4))):
+        t = rollups.totals(db, CHANNEL, a, b)
+        assert t["views"] == daily_sum(a, b)
+        assert t["days"] == (b - a).days + 1
+    assert rollups.totals(db, CHANNEL, _dt.date(2012, 3, 17), _dt.date(2015, 11, 4))["plan"]["day"] <= 4
+
+    grain, rows = rollups.series(db, CHANNEL, _dt.date(2019, 1, 1), _dt.date(2019, 12, 31))
+    assert grain == "month" and len(rows) == 12
+    assert rows[1]["views"] == daily_sum(_dt.date(2019, 2, 1), _dt.date(2019, 2, 28))
+    db.close()
+
+if __name__ == "__main__":
+    test_incremental_ingest()
+    test_all_metrics_in_one_query_per_chunk()
+    test_other_403s_are_not_retried_without_revenue()
+    test_bulk_upsert_matches_per_row()
+    test_daily_job_isolates_channel_failures()
+    test_features_incremental_matches_rebuild()
+    test_tokens_persisted_cached_and_refreshed_ahead()
+    test_rollups_answer_ranges_like_daily_rows()
+    print("✅ Ingest tests passed")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the AI insight stage: content-addressed cache, SSE streaming, parsing
+"""
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import asyncio
+import json
+import threading
+from types import SimpleNamespace as NS
+
+from app import public_analysis as pa
+
+INSIGHT = {"summary": "ok", "opportunities": ["a", "b", "c"],
+           "risk_factors": ["r"], "financial_recommendations": ["f"]}
+
+class FakeCompletions:
+    """AsyncOpenAI stand-in that streams INSIGHT in three chunks."""
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, stream=False, **kw):
+        self.calls += 1
+        text = json.dumps(INSIGHT)
+        pieces = [text[:10], text[10:40], text[40:]]
+
+        async def chunks():
+            for piece in pieces:
+                yield NS(choices=[NS(delta=NS(content=piece))])
+        return chunks()
+
+def _metrics(views):
+    return {"subscriber_count": 1_234_567, "total_views": 98_765_432,
+            "views_last_30d": views, "video_count": 321}
+
+def _events(body: str):
+    out = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        out.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return out
+
+def test_parse_insight_tolerates_fences():
+    fenced = pa._fallback_insight(dict(_metrics(1000), estimated_revenue_usd=5.0), 5.0,
+                                  pa._analyze(dict(_metrics(1000)), 30)[1])
+    assert pa.parse_insight(fenced)["opportunities"]
+    assert pa.parse_insight("Sure! " + json.dumps(INSIGHT) + " Hope this helps.") == INSIGHT
+    assert pa.parse_insight("not json") is None
+
+def test_bucketed_key_ignores_small_drift():
+    def key(views):
+        metrics = _metrics(views)
+        _, report = pa._analyze(metrics, 30)
+        return pa._insight_request(metrics, report)[0]
+    assert key(6_012_345) == key(6_031_999)
+    assert key(6_012_345) != key(9_500_000)
+
+def test_prompt_carries_real_figures():
+    metrics = _metrics(6_012_345)
+    _, report = pa._analyze(metrics, 30)
+    prompt = pa._insight_request(metrics, report)[1]["messages"][0]["content"]
+    assert "6012345" in prompt and "1234567" in prompt
+
+def test_stream_forwards_tokens_and_reuses_cached_insight():
+    saved = (pa.openai_api_key, pa._async_client, pa.resolve_channel_id_async, pa.fetch_public_metrics_async,
+             pa._channel_features)
+    try:
+        _stream_forwards_tokens_and_reuses_cached_insight()
+    finally:
+        (pa.openai_api_key, pa._async_client, pa.resolve_channel_id_async, pa.fetch_public_metrics_async,
+         pa._channel_features) = saved
+        pa.report_cache.clear()
+
+def _stream_forwards_tokens_and_reuses_cached_insight():
+    completions = FakeCompletions()
+    pa.openai_api_key = "test"
+    pa._async_client = NS(chat=NS(completions=completions))
+    pa.report_cache.clear()
+    pa.insight_cache.clear()
+
+    async def resolve(query):
+        return query
+
+    async def fetch(cid, days, timings):
+        return _metrics({"UCa": 6_012_345, "UCb": 6_031_999}[cid])
+
+    pa.resolve_channel_id_async = resolve
+    pa.fetch_public_metrics_async = fetch
+    feature_threads = []
+    pa._channel_features = lambda cid: feature_threads.append(threading.current_thread()) or None
+
+    async def collect(query):
+        return "".join([chunk async for chunk in pa.stream_channel_report(query)])
+
+    first = _events(asyncio.run(collect("UCa")))
+    names = [name for name, _ in first]
+    assert names == ["report", "token", "token", "token", "insight", "done"]
+    assert first[0][1]["channel_id"] == "UCa" and first[0][1]["ai"] is None
+    assert first[-2][1]["insight"] == INSIGHT
+
+    # another channel whose numbers round the same is answered from the insight cache
+    second = _events(asyncio.run(collect("UCb")))
+    assert [name for name, _ in second] == ["report", "token", "insight", "done"]
+    assert second[-2][1]["insight"] == INSIGHT
+    assert completions.calls == 1
+    # the features query runs in a worker thread, never on the event loop
+    assert len(feature_threads) == 2 and threading.main_thread() not in feature_threads
+
+def test_deferred_requests_share_one_build():
+    saved = (pa.openai_api_key, pa._async_client, pa.resolve_channel_id_async, pa.fetch_public_metrics_async,
+             pa._channel_features)
+    try:
+        asyncio.run(_deferred_requests_share_one_build())
+    finally:
+        (pa.openai_api_key, pa._async_client, pa.resolve_channel_id_async, pa.fetch_public_metrics_async,
+         pa._channel_features) = saved
+        pa.report_cache.clear()
+
+async def _deferred_requests_share_one_build():
+    gate, fetches = asyncio.Event(), []
+
+    async def create(**kw):
+        await gate.wait()
+        return NS(choices=[NS(message=NS(content=json.dumps(INSIGHT)))])
+
+    async def resolve(query):
+        return query
+
+    async def fetch(cid, days, timings):
+        fetches.append(cid)
+        await asyncio.sleep(0.01)
+        return _metrics(7_000_000)
+
+    pa.openai_api_key = "test"
+    pa._async_client = NS(chat=NS(completions=NS(create=create)))
+    pa.resolve_channel_id_async, pa.fetch_public_metrics_async = resolve, fetch
+    pa._channel_features = lambda cid: None
+    pa.report_cache.clear()
+    pa.insight_cache.clear()
+
+    first = await asyncio.gather(*[pa.get_channel_report_async("UCd", defer_ai=True) for _ in range(3)])
+    # a later request while the AI section is still pending reuses the partial report
+    later = await pa.get_channel_report_async("UCd", defer_ai=True)
+    assert fetches == ["UCd"]
+    assert all(r["ai_status"] == "pending" and r["ai"] is None for r in first + [later])
+    # requests that joined the build report its stage timings
+    assert [r.get("coalesced", False) for r in first] == [False, True, True]
+    assert all({"resolve", "youtube", "financial_analysis"} <= set(r["timings_ms"]) for r in first)
+    assert (await pa.get_insight_async("UCd"))["status"] == "pending"
+
+    gate.set()
+    while (await pa.get_insight_async("UCd"))["status"] == "pending":
+        await asyncio.sleep(0.01)
+    assert (await pa.get_insight_async("UCd"))["insight"] == INSIGHT
+    assert fetches == ["UCd"]
+
+def test_sync_followers_get_the_build_timings():
+    saved = (pa.resolve_channel_id, pa.build_channel_report)
+    gate = threading.Event()
+
+    def build(cid, days, timings):
+        timings["youtube"] = 12.5
+        gate.wait(2)
+        return {"channel_id": cid}
+
+    pa.resolve_channel_id, pa.build_channel_report = (lambda q: q), build
+    pa.report_cache.clear()
+    results, joined = [], pa._report_flight.coalesced
+    try:
+        threads = [threading.Thread(target=lambda: results.append(pa.get_channel_report("UCs"))) for _ in range(3)]
+        for t in threads:
+            t.start()
+        while pa._report_flight.coalesced - joined < len(threads) - 1:
+            threading.Event().wait(0.01)
+        gate.set()
+        for t in threads:
+            t.join()
+    finally:
+        pa.resolve_channel_id, pa.build_channel_report = saved
+        pa.report_cache.clear()
+    assert sorted(r.get("coalesced", False) for r in results) == [False, True, True]
+    assert all(r["timings_ms"]["youtube"] == 12.5 and "resolve" in r["timings_ms"] for r in results)
+
+def test_features_load_only_for_connected_channels():
+    from app.db import Base, SessionLocal, engine
+    from app.models import ChannelCredentials
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.merge(ChannelCredentials(channel_id="UCconnected", refresh_token="r",
+                               client_id="c", client_secret="s", scopes="yt"))
+    db.commit()
+    db.close()
+
+    saved = {name: sys.modules.pop(name, None) for name in ("numpy", "app.features")}
+    sys.modules["numpy"] = None  # import numpy -> ImportError
+    try:
+        # public channels never reach the features module (or numpy)
+        assert pa._channel_features("UCpublic") is None
+        assert sys.modules.get("app.features") is None
+        # a deploy without numpy degrades to no features instead of failing the report
+        assert pa._channel_features("UCconnected") is None
+    finally:
+        for name, module in saved.items():
+            sys.modules.pop(name, None)
+            if module is not None:
+                sys.modules[name] = module
+
+if __name__ == "__main__":
+    test_parse_insight_tolerates_fences()
+    test_bucketed_key_ignores_small_drift()
+    test_prompt_carries_real_figures()
+    test_stream_forwards_tokens_and_reuses_cached_insight()
+    test_deferred_requests_share_one_build()
+    test_sync_followers_get_the_build_timings()
+    test_features_load_only_for_connected_channels()
+    print("✅ Insight tests passed")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the SQL-backed analysis job queue
+"""
+import sys
+import os
+import datetime as _dt
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import jobqueue, public_analysis
+from app.models import AnalysisJob, Base
+
+def _sessionmaker():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+MRBEAST = "UCX6OQ3DkcsbYNE6H8uQQuVA"
+
+def _fake_resolve(query):
+    """resolve_channel_id stand-in: MrBeast's handle and id forms resolve, nothing else does."""
+    if MRBEAST in query or jobqueue.normalize_query(query) == "@mrbeast":
+        return MRBEAST
+    raise ValueError("Could not resolve channel ID.")
+
+def test_duplicates_coalesce_and_worker_stores_report():
+    factory = _sessionmaker()
+    calls = []
+    original = (public_analysis.get_channel_report, jobqueue.resolve_channel_id)
+    public_analysis.get_channel_report = lambda q, days: calls.append(q) or {"channel_id": "UC1", "timings_ms": {}}
+    jobqueue.resolve_channel_id = _fake_resolve
+    try:
+        first  = jobqueue.enqueue("https://youtube.com/@MrBeast", 30, session_factory=factory)
+        second = jobqueue.enqueue("@mrbeast", 30, session_factory=factory)
+        other  = jobqueue.enqueue("@mrbeast", 90, session_factory=factory)
+        assert second["job_id"] == first["job_id"] and second["coalesced"]
+        # every form of the channel's URL joins the same job
+        for form in (f"https://www.youtube.com/channel/{MRBEAST}", MRBEAST):
+            assert jobqueue.enqueue(form, 30, session_factory=factory)["job_id"] == first["job_id"]
+        assert other["job_id"] != first["job_id"] and not first["coalesced"]
+
+        assert jobqueue.run_one("w1", session_factory=factory)
+        assert jobqueue.run_one("w1", session_factory=factory)
+        assert not jobqueue.run_one("w1", session_factory=factory)
+        assert len(calls) == 2
+
+        done = jobqueue.get_job(first["job_id"], session_factory=factory)
+        assert done["status"] == "done" and done["result"] == {"channel_id": "UC1"}
+
+        # once finished, the same analysis can be queued again
+        again = jobqueue.enqueue("@MrBeast", 30, session_factory=factory)
+        assert again["job_id"] != first["job_id"] and not again["coalesced"]
+    finally:
+        public_analysis.get_channel_report, jobqueue.resolve_channel_id = original
+
+def test_stale_running_job_is_requeued():
+    factory = _sessionmaker()
+    original, jobqueue.resolve_channel_id = jobqueue.resolve_channel_id, _fake_resolve
+    try:
+        job = jobqueue.enqueue("@somebody", 30, session_factory=factory)  # unresolved: keyed by its text
+    finally:
+        jobqueue.resolve_channel_id = original
+    claimed = jobqueue.claim("dead-worker", session_factory=factory)
+    assert claimed.id == job["job_id"] and jobqueue.claim("w2", session_factory=factory) is None
+
+    db = factory()
+    db.query(AnalysisJob).update({AnalysisJob.started_at: _dt.datetime.utcnow()
+                                  - _dt.timedelta(seconds=jobqueue.JOB_TIMEOUT + 1)})
+    db.commit()
+    db.close()
+    reclaimed = jobqueue.claim("w2", session_factory=factory)
+    assert reclaimed.id == job["job_id"] and reclaimed.worker == "w2" and reclaimed.attempts == 2
+
+def test_worker_threads_get_their_own_youtube_client():
+    import threading
+    from app import clients, youtube_public
+    clients.clear()
+    saved = (youtube_public.yt, youtube_public.API_KEY)
+    youtube_public.yt, youtube_public.API_KEY = None, "test"
+    try:
+        seen, together = [], threading.Barrier(2)
+
+        def worker():
+            seen.append(youtube_public.get_youtube())
+            together.wait()  # both alive at once, so their thread idents differ
+        workers = [threading.Thread(target=worker) for _ in range(2)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        assert seen[0] is not seen[1]
+        assert youtube_public.get_youtube() is youtube_public.get_youtube()
+    finally:
+        youtube_public.yt, youtube_public.API_KEY = saved
+        clients.clear()
+
+if __name__ == "__main__":
+    test_duplicates_coalesce_and_worker_stores_report()
+    test_stale_running_job_is_requeued()
+    test_worker_threads_get_their_own_youtube_client()
+    print("✅ Job queue tests passed")
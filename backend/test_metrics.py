@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the metrics registry, /metrics exposition and timing headers
+"""
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.timing import stage_timer
+
+def test_histogram_renders_cumulative_buckets():
+    h = metrics.Histogram("test_latency_seconds", "test", ("route",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 0.5, 3.0):
+        h.observe(v, route='/a"b')
+    lines = [l for l in metrics.render().splitlines() if l.startswith("test_latency_seconds")]
+    assert lines == [
+        'test_latency_seconds_bucket{route="/a\\"b",le="0.1"} 1',
+        'test_latency_seconds_bucket{route="/a\\"b",le="1"} 3',
+        'test_latency_seconds_bucket{route="/a\\"b",le="+Inf"} 4',
+        'test_latency_seconds_sum{route="/a\\"b"} 4.05',
+        'test_latency_seconds_count{route="/a\\"b"} 4',
+    ]
+
+def test_stage_timer_counts_failed_stages():
+    before = metrics.stage_seconds.count(stage="test_stage")
+    timings = {}
+    try:
+        with stage_timer(timings, "test_stage"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    with stage_timer(timings, "test_stage"):
+        pass
+    assert "test_stage" in timings
+    assert metrics.stage_seconds.count(stage="test_stage") == before + 2
+    assert metrics.stage_errors.value(stage="test_stage") >= 1
+
+def test_middleware_adds_timing_headers_and_route_label():
+    app = FastAPI()
+    app.add_middleware(metrics.TimingMiddleware)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: str):
+        with stage_timer({}, "lookup"):
+            time.sleep(0.002)
+        return {"id": item_id}
+
+    @app.get("/metrics")
+    def scrape():
+        from fastapi import Response
+        return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    client = TestClient(app)
+    resp = client.get("/items/abc")
+    assert resp.status_code == 200
+    assert float(resp.headers["x-response-time-ms"]) >= 2
+    timing = resp.headers["server-timing"]
+    assert timing.startswith("lookup;dur=") and "total;dur=" in timing
+
+    body = client.get("/metrics").text
+    assert 'http_request_seconds_count{method="GET",route="/items/{item_id}",status="200"} 1' in body
+    assert "report_stage_seconds_bucket{stage=\"lookup\"" in body
+
+def test_observation_overhead_is_microseconds():
+    h = metrics.Histogram("test_overhead_seconds", "test", ("stage",))
+    n = 20000
+    started = time.perf_counter()
+    for _ in range(n):
+        h.observe(0.01, stage="x")
+    per_call_us = (time.perf_counter() - started) / n * 1e6
+    assert per_call_us < 20, f"{per_call_us:.1f} µs per observation"
+
+if __name__ == "__main__":
+    test_histogram_renders_cumulative_buckets()
+    test_stage_timer_counts_failed_stages()
+    test_middleware_adds_timing_headers_and_route_label()
+    test_observation_overhead_is_microseconds()
+    print("✅ Metrics tests passed")
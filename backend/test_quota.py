@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the rate-limit / quota-aware YouTube client wrapper
+"""
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import json
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from googleapiclient.errors import HttpError
+
+from app import quota
+
+class FakeResp(dict):
+    def __init__(self, status):
+        super().__init__(status=str(status))
+        self.status = status
+        self.reason = "error"
+
+class FakeRequest:
+    """Fails with the given (status, reason) pairs, then succeeds."""
+    def __init__(self, *failures):
+        self.failures = list(failures)
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        if self.failures:
+            status, reason = self.failures.pop(0)
+            body = json.dumps({"error": {"errors": [{"reason": reason}]}}).encode()
+            raise HttpError(FakeResp(status), body)
+        return {"items": []}
+
+def _install(tracker):
+    """Swaps the module tracker for the duration of a test."""
+    previous, quota.tracker = quota.tracker, tracker
+    return previous
+
+def _tracker(limit, backend="memory", factory=None):
+    if factory:
+        return quota.QuotaTracker(limit, backend, session_factory=factory)
+    return quota.QuotaTracker(limit, backend)
+
+def test_retries_then_charges_and_refuses():
+    previous = _install(_tracker(250))
+    backoff, quota.BACKOFF_BASE = quota.BACKOFF_BASE, 0.001
+    try:
+        _retries_then_charges_and_refuses()
+    finally:
+        quota.tracker, quota.BACKOFF_BASE = previous, backoff
+
+def _retries_then_charges_and_refuses():
+    req = FakeRequest((503, "backendError"), (403, "rateLimitExceeded"))
+    assert quota.execute(req, "videos.list") == {"items": []}
+    assert req.calls == 3
+    assert quota.tracker.used() == 3
+    assert quota.tracker.counters["videos.list.retries"] == 2
+
+    quota.execute(FakeRequest(), "search.list")
+    quota.execute(FakeRequest(), "search.list")
+    try:
+        quota.execute(FakeRequest(), "search.list")  # 203 + 100 > 250
+        assert False, "expected QuotaExceeded"
+    except quota.QuotaExceeded:
+        pass
+    quota.execute(FakeRequest(), "channels.list")  # cheap calls still fit
+    assert quota.tracker.remaining() == 250 - 204
+
+def test_quota_exceeded_from_google_stops_spending():
+    previous = _install(_tracker(10_000))
+    try:
+        quota.execute(FakeRequest((403, "quotaExceeded")), "channels.list")
+        assert False, "expected QuotaExceeded"
+    except quota.QuotaExceeded:
+        assert quota.tracker.remaining() == 0
+    finally:
+        quota.tracker = previous
+
+def test_usage_shared_between_workers():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    factory = sessionmaker(bind=engine)
+    a, b = _tracker(1000, "sql", factory), _tracker(1000, "sql", factory)
+    a.charge("search.list")
+    a.flush()
+    b.charge("channels.list")
+    b.flush()
+    assert b.used() == 101
+    a.flush()
+    assert a.used() == 101
+
+def test_concurrent_flushes_count_units_once():
+    import threading
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    factory = sessionmaker(bind=engine)
+    t = _tracker(1000, "sql", factory)
+    for _ in range(10):
+        t.charge("channels.list")
+    threads = [threading.Thread(target=t.flush) for _ in range(8)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    t.flush()
+    assert t.used() == 10
+    assert factory().query(quota.ApiQuotaUsage.units).scalar() == 10
+
+def test_failed_flush_is_retried():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    factory = sessionmaker(bind=engine)
+    unreachable = sessionmaker(bind=create_engine("sqlite:////nonexistent/dir/quota.db"))
+    down = [True]
+
+    t = _tracker(1000, "sql", lambda: unreachable() if down[0] else factory())
+    t.charge("search.list")
+    t.flush()  # fails: keeps counting locally
+    assert not t.stats()["shared"] and t.used() == 100
+    down[0] = False
+    t.flush()
+    assert t.stats()["shared"] and t.used() == 100
+    assert factory().query(quota.ApiQuotaUsage.units).scalar() == 100
+
+def test_analytics_quota_error_keeps_data_api_budget():
+    previous = _install(_tracker(10_000))
+    try:
+        quota.execute(FakeRequest((403, "quotaExceeded")), "reports.query", api="youtubeAnalytics")
+        assert False, "expected QuotaExceeded"
+    except quota.QuotaExceeded:
+        assert quota.tracker.remaining() == 10_000
+    finally:
+        quota.tracker = previous
+
+def test_rate_limit_is_split_across_processes():
+    import subprocess
+    probe = "from app import quota; s = quota.stats(); print(s['max_qps'], s['burst'], s['processes'])"
+    env = dict(os.environ, DATABASE_URL="sqlite://", YOUTUBE_MAX_QPS="20", YOUTUBE_BURST="40",
+               WEB_CONCURRENCY="4")
+    env.pop("YOUTUBE_PROCESSES", None)
+    run = lambda env: subprocess.run([sys.executable, "-c", probe], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                     env=env, capture_output=True, text=True, check=True).stdout.split()
+    assert run(env) == ["5.0", "10", "4"]
+    # job queue / ingest processes are counted explicitly
+    assert run(dict(env, YOUTUBE_PROCESSES="5")) == ["4.0", "8", "5"]
+
+if __name__ == "__main__":
+    test_retries_then_charges_and_refuses()
+    test_quota_exceeded_from_google_stops_spending()
+    test_usage_shared_between_workers()
+    test_concurrent_flushes_count_units_once()
+    test_failed_flush_is_retried()
+    test_analytics_quota_error_keeps_data_api_budget()
+    test_rate_limit_is_split_across_processes()
+    print("✅ Quota tests passed")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Offline test for the Monte Carlo revenue simulation mode
+"""
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import numpy as np
+from app.financial_analysis import FinancialAnalyzer
+from app.simulation import simulate_revenue, monthly_log_growth
+
+METRICS = {
+    "subscriber_count": 2_500_000,
+    "total_views": 900_000_000,
+    "views_last_30d": 6_000_000,
+    "video_count": 420,
+    "estimated_revenue_usd": 30_000.0,
+}
+
+def test_simulation_is_seeded_and_uses_history():
+    rpm = FinancialAnalyzer().rpm_scenarios
+    growing = np.linspace(1_000, 4_000, 360)  # steadily rising daily views
+    a = simulate_revenue(30_000.0, rpm, growing, n_paths=2000, monthly_payment=20_000.0, seed=3)
+    b = simulate_revenue(30_000.0, rpm, growing, n_paths=2000, monthly_payment=20_000.0, seed=3)
+    assert a == b
+    assert a["growth_source"] == "history" and a["monthly_growth_mu"] > 0
+    assert len(monthly_log_growth(growing)) == 11
+
+    flat = simulate_revenue(30_000.0, rpm, None, n_paths=2000, seed=3)
+    assert flat["growth_source"] == "default" and flat["default_probability"] is None
+    bands = flat["total_revenue_bands"]
+    assert bands["p5"] < bands["p50"] < bands["p95"]
+
+def test_simulated_report_feeds_loan_recommendation():
+    analyzer = FinancialAnalyzer()
+    plain = analyzer.generate_financial_report(METRICS)
+    sim   = analyzer.generate_financial_report(METRICS, simulate=True, n_paths=2000)
+
+    p = sim["loan_recommendation"]["default_probability"]
+    assert 0.0 <= p <= 1.0
+    assert plain["loan_recommendation"]["default_probability"] is None
+    assert sim["loan_recommendation"]["recommended_advance"] == \
+        plain["loan_recommendation"]["recommended_advance"] * (1 - p)
+    assert sim["simulation"]["horizon_months"] == plain["loan_recommendation"]["repayment_period_months"]
+
+if __name__ == "__main__":
+    test_simulation_is_seeded_and_uses_history()
+    test_simulated_report_feeds_loan_recommendation()
+    print("✅ Simulation tests passed")
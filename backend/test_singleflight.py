@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Offline tests for single-flight coalescing of concurrent channel lookups
+"""
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import asyncio
+from app.singleflight import AsyncSingleFlight, SingleFlight
+from app import youtube_async
+
+def test_threads_share_one_execution():
+    flight = SingleFlight("test_threads")
+    calls, results = [], []
+    gate = threading.Event()
+
+    def slow(x):
+        calls.append(x)
+        gate.wait(2)
+        return {"x": x}
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow, 1))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while flight.executed + flight.coalesced < 8:
+        time.sleep(0.01)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert calls == [1] and len(results) == 8 and all(r is results[0] for r in results)
+    assert flight.stats() == {"executed": 1, "coalesced": 7, "in_flight": 0}
+
+    # errors reach every waiter, and the next call runs again
+    def boom():
+        raise RuntimeError("upstream down")
+    try:
+        flight.do("k", boom)
+        assert False, "expected RuntimeError"
+    except RuntimeError:
+        pass
+    assert flight.do("k", lambda: 2) == 2
+
+def test_coroutines_share_one_execution():
+    flight = AsyncSingleFlight("test_coroutines")
+    calls = []
+
+    async def slow(x):
+        calls.append(x)
+        await asyncio.sleep(0.05)
+        return {"x": x}
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        results = await asyncio.gather(*[flight.do("k", slow, 1) for _ in range(5)], flight.do("j", slow, 2))
+        assert calls == [1, 2] and all(r is results[0] for r in results[:5])
+        assert flight.stats() == {"executed": 2, "coalesced": 4, "in_flight": 0}
+
+        # errors reach every waiter
+        errors = await asyncio.gather(flight.do("k", boom), flight.do("k", boom), return_exceptions=True)
+        assert all(isinstance(e, RuntimeError) for e in errors)
+
+        # a cancelled waiter does not cancel the call the others are waiting on
+        first = asyncio.create_task(flight.do("k", slow, 3))
+        second = asyncio.create_task(flight.do("k", slow, 3))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == {"x": 3} and calls == [1, 2, 3]
+
+    asyncio.run(run())
+
+def test_concurrent_async_metrics_lookups_coalesce():
+    calls = []
+
+    async def fake_fetch(channel_id, days, timings):
+        calls.append(channel_id)
+        await asyncio.sleep(0.05)
+        return {"views_last_30d": 7}
+
+    original = youtube_async._fetch_public_metrics_async
+    youtube_async._fetch_public_metrics_async = fake_fetch
+    try:
+        async def run():
+            return await asyncio.gather(*[youtube_async.fetch_public_metrics_async("UC1", 30) for _ in range(5)],
+                                        youtube_async.fetch_public_metrics_async("UC2", 30))
+        results = asyncio.run(run())
+    finally:
+        youtube_async._fetch_public_metrics_async = original
+    assert sorted(calls) == ["UC1", "UC2"]
+    assert all(r == {"views_last_30d": 7} for r in results)
+    assert results[0] is not results[1]  # each caller gets its own copy to mutate
+    assert youtube_async._metrics_flight.coalesced >= 4
+
+if __name__ == "__main__":
+    test_threads_share_one_execution()
+    test_coroutines_share_one_execution()
+    test_concurrent_async_metrics_lookups_coalesce()
+    print("✅ Single-flight tests passed")
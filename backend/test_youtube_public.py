@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Offline tests for uploads pagination in fetch_public_metrics (sync and async)
+and for the packed batch screening in app.batch
+"""
+import sys
+import os
+import asyncio
+import datetime as _dt
+import functools
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import httpx
+from app import youtube_public, youtube_async
+from app.batch import analyze_batch
+
+CHANNEL = "UC" + "p" * 22
+UPLOADS = 120  # one per day, newest first
+NOW = _dt.datetime.now(_dt.timezone.utc)
+
+def _api(resource: str, params: dict, calls: list) -> dict:
+    """Fake YouTube Data API: 50-item pages over UPLOADS daily uploads."""
+    calls.append(resource)
+    if resource == "channels":
+        return {"items": [
+            {"id": cid,
+             "statistics": {"subscriberCount": "10", "viewCount": "999", "videoCount": str(UPLOADS)},
+             "contentDetails": {"relatedPlaylists": {"uploads": "UU" + cid[2:]}}}
+            for cid in params["id"].split(",")
+        ]}
+    if resource == "playlistItems":
+        start = int(params.get("pageToken") or 0)
+        items = [
+            {"contentDetails": {"videoId": f"{params['playlistId']}-{i}",
+                                "videoPublishedAt": (NOW - _dt.timedelta(days=i, hours=1)).isoformat()}}
+            for i in range(start, min(start + 50, UPLOADS))
+        ]
+        if start == 0:  # a private video: contentDetails without videoPublishedAt
+            items.insert(1, {"contentDetails": {"videoId": "private"}})
+        page = {"items": items}
+        if start + 50 < UPLOADS:
+            page["nextPageToken"] = str(start + 50)
+        return page
+    if resource == "videos":
+        ids = params["id"].split(",")
+        assert len(ids) <= 50
+        return {"items": [{"id": i, "statistics": {"viewCount": "10"}} for i in ids]}
+    raise AssertionError(resource)
+
+class FakeYouTube:
+    def __init__(self, api=_api):
+        self.calls = []
+        self.api = api
+
+    def __getattr__(self, resource):
+        fake = self
+
+        class Resource:
+            def list(self, **params):
+                self.params = params
+                return self
+
+            def execute(self):
+                return fake.api(resource, self.params, fake.calls)
+        return Resource
+
+def _restoring_clients(test):
+    """Puts back youtube_public.yt and youtube_async.API_KEY after a test replaces them."""
+    @functools.wraps(test)
+    def run():
+        saved = (youtube_public.yt, youtube_async.API_KEY)
+        try:
+            return test()
+        finally:
+            youtube_public.yt, youtube_async.API_KEY = saved
+    return run
+
+@_restoring_clients
+def test_pagination_stops_at_window():
+    fake = FakeYouTube()
+    youtube_public.yt = fake
+    m = youtube_public.fetch_public_metrics(CHANNEL, days=30)
+    assert m["views_last_30d"] == 30 * 10
+    # channels.list and the first uploads page go out together, in either order
+    assert sorted(fake.calls[:2]) == ["channels", "playlistItems"] and fake.calls[2:] == ["videos"]
+
+    fake.calls.clear()
+    m = youtube_public.fetch_public_metrics(CHANNEL, days=90)
+    assert m["views_last_90d"] == 90 * 10
+    assert sorted(fake.calls[:2]) == ["channels", "playlistItems"]
+    assert fake.calls[2:] == ["videos", "playlistItems", "videos"]
+
+@_restoring_clients
+def test_async_pagination_matches_sync():
+    calls = []
+
+    def handler(request):
+        resource = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(200, json=_api(resource, dict(request.url.params), calls))
+
+    async def run():
+        youtube_async.API_KEY = "test"
+        youtube_async._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await youtube_async.fetch_public_metrics_async(CHANNEL, days=365)
+        finally:
+            await youtube_async.aclose()
+
+    m = asyncio.run(run())
+    assert m["views_last_365d"] == UPLOADS * 10
+    assert calls.count("playlistItems") == 3 and calls.count("videos") == 3
+
+@_restoring_clients
+def test_async_failed_page_cancels_pricing():
+    videos_started = []
+
+    async def handler(request):
+        resource = request.url.path.rsplit("/", 1)[-1]
+        if resource == "videos":
+            videos_started.append(request)
+            await asyncio.sleep(30)  # still pricing when the next page fails
+        if request.url.params.get("pageToken"):
+            return httpx.Response(404, json={"error": {"code": 404, "errors": [{"reason": "notFound"}]}})
+        return httpx.Response(200, json=_api(resource, dict(request.url.params), []))
+
+    async def run():
+        youtube_async.API_KEY = "test"
+        youtube_async._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            await youtube_async._fetch_public_metrics_async(CHANNEL, 365, None)
+            assert False, "expected the second page to fail"
+        except httpx.HTTPStatusError:
+            pass
+        finally:
+            await youtube_async.aclose()
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == [] and len(videos_started) == 1
+
+@_restoring_clients
+def test_batch_dedupes_and_packs_requests():
+    fake = FakeYouTube()
+    youtube_public.yt = fake
+    other = "UC" + "q" * 22
+    queries = [f"https://www.youtube.com/channel/{CHANNEL}", CHANNEL, other, ""]
+
+    results = list(analyze_batch(queries, days=30))
+    assert [r["channel_id"] for r in results] == [CHANNEL, other]
+    assert results[0]["queries"] == queries[:2]
+    assert all(r["metrics"]["views_last_30d"] == 300 for r in results)
+    assert "loan_recommendation" in results[1]["financial_analysis"]
+    # one channels.list for both channels, 60 recent ids packed into 2 videos.list calls
+    assert fake.calls.count("channels") == 1
+    assert fake.calls.count("videos") == 2
+
+@_restoring_clients
+def test_batch_reports_failed_pricing_per_channel():
+    def flaky(resource, params, calls):
+        if resource == "videos" and calls.count("videos") == 1:  # the final, partial batch
+            calls.append(resource)
+            raise RuntimeError("videos.list failed")
+        return _api(resource, params, calls)
+
+    youtube_public.yt = FakeYouTube(flaky)
+    other = "UC" + "q" * 22
+    results = list(analyze_batch([CHANNEL, other], days=30))
+    # the first 50 ids (30 of CHANNEL, 20 of other) were priced; other's last 10 were not
+    assert [r["channel_id"] for r in results] == [CHANNEL, other]
+    assert results[0]["metrics"]["views_last_30d"] == 300
+    assert results[1]["error"] == "videos.list failed"
+
+if __name__ == "__main__":
+    test_pagination_stops_at_window()
+    test_async_pagination_matches_sync()
+    test_async_failed_page_cancels_pricing()
+    test_batch_dedupes_and_packs_requests()
+    test_batch_reports_failed_pricing_per_channel()
+    print("✅ Uploads pagination and batch tests passed")